@@ -0,0 +1,221 @@
+# ann_index.py
+"""
+IVF-flat approximate nearest-neighbour index, pure numpy.
+
+Vectors are L2-normalized, so inner product is cosine similarity. A spherical
+k-means partitions them into `nlist` cells; a query scans only the `nprobe`
+cells whose centroids are closest to it, which gives sub-linear search at a
+small recall cost (see benchmarks/bench_ann_recall.py). Below `min_train`
+vectors the index keeps a single cell, i.e. exact search.
+
+Vectors are held in the configured embedding format (embedding_codec.py):
+float32, float16, or int8 with a per-vector scale. Only the rows a query probes
+are widened to float32 while scoring.
+
+Inserts and removals are incremental: new vectors go to their nearest existing
+centroid. train() re-partitions everything and is meant for the writer side
+(the scrape job) once the index has grown well past its last training size.
+"""
+import os
+import time
+import numpy as np
+from embedding_codec import check_format, dequantize, dot, quantize, storage_dtype
+from logger_config import get_logger
+
+logger = get_logger("ann_index")
+
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 4))
+ANN_MIN_TRAIN = int(os.getenv("ANN_MIN_TRAIN", 2048))
+# Re-train once the index has grown by this factor since the last training
+ANN_RETRAIN_GROWTH = float(os.getenv("ANN_RETRAIN_GROWTH", 2.0))
+KMEANS_ITERATIONS = 12
+# Rows per matmul chunk when assigning vectors to centroids
+_ASSIGN_CHUNK = 16384
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-9)
+
+
+def _nearest(vectors, centroids):
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        out[start:start + _ASSIGN_CHUNK] = (vectors[start:start + _ASSIGN_CHUNK] @ centroids.T).argmax(axis=1)
+    return out
+
+
+def spherical_kmeans(vectors, nlist, iterations=KMEANS_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty cells so every list stays in use
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFFlatIndex:
+    def __init__(self, dim=None, nprobe=ANN_NPROBE, min_train=ANN_MIN_TRAIN, fmt="float32"):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.fmt = check_format(fmt)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dim or 0), dtype=storage_dtype(fmt))   # codes in self.fmt
+        self.scales = np.empty(0, dtype=np.float32)
+        self.assign = np.empty(0, dtype=np.int32)
+        self.centroids = None           # None = untrained, single exact cell
+        self.trained_size = 0
+        self._position = None
+        self._lists = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nlist(self):
+        return 1 if self.centroids is None else len(self.centroids)
+
+    def needs_training(self):
+        if len(self) < self.min_train:
+            return False
+        return self.centroids is None or len(self) >= self.trained_size * ANN_RETRAIN_GROWTH
+
+    def train(self, nlist=None):
+        """(Re)partition all vectors; nlist defaults to ~sqrt(N)."""
+        if len(self) < self.min_train:
+            self.centroids, self.trained_size = None, 0
+            self.assign = np.zeros(len(self), dtype=np.int32)
+        else:
+            nlist = nlist or max(1, int(np.sqrt(len(self))))
+            vectors = dequantize(self.vectors, self.scales)
+            self.centroids = spherical_kmeans(vectors, nlist)
+            self.assign = _nearest(vectors, self.centroids)
+            self.trained_size = len(self)
+            logger.info(f"Trained IVF index: {len(self)} vectors in {nlist} lists")
+        self._lists = None
+
+    def add(self, ids, vectors):
+        """Insert or replace vectors by id."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        vectors = _normalize(vectors)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self.vectors = self.vectors.reshape(0, self.dim)
+        self.remove(ids)
+        assign = np.zeros(len(ids), dtype=np.int32) if self.centroids is None else _nearest(vectors, self.centroids)
+        codes, scales = quantize(vectors, self.fmt)
+        self.ids = np.concatenate([self.ids, ids])
+        self.vectors = np.vstack([self.vectors, codes])
+        self.scales = np.concatenate([self.scales, scales])
+        self.assign = np.concatenate([self.assign, assign])
+        self._position, self._lists = None, None
+
+    def remove(self, ids):
+        if not len(self) or not len(ids):
+            return
+        keep = ~np.isin(self.ids, np.asarray(ids, dtype=np.int64))
+        if keep.all():
+            return
+        self.ids, self.vectors, self.assign = self.ids[keep], self.vectors[keep], self.assign[keep]
+        self.scales = self.scales[keep]
+        self._position, self._lists = None, None
+
+    def position(self):
+        """{id: row} for looking up stored vectors."""
+        if self._position is None:
+            self._position = {post_id: row for row, post_id in enumerate(self.ids.tolist())}
+        return self._position
+
+    def score_rows(self, rows, queries):
+        """Exact inner products of stored rows against queries (M, dim) -> (len(rows), M)."""
+        return dot(self.vectors[rows], self.scales[rows], _normalize(np.atleast_2d(queries)))
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assign, kind="stable")
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(self.assign, minlength=self.nlist))])
+            self._lists = (order, bounds)
+        return self._lists
+
+    def search(self, queries, k):
+        """
+        Top-k per query -> (ids (M, k), scores (M, k)), best first. Rows with
+        fewer than k candidates are padded with id -1 and score -inf.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if not len(self) or k <= 0:
+            return out_ids, out_scores
+
+        order, bounds = self._inverted_lists()
+        if self.centroids is None:
+            probes = np.zeros((len(queries), 1), dtype=np.int64)
+        else:
+            nprobe = min(self.nprobe, self.nlist)
+            probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        for q, query in enumerate(queries):
+            rows = np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probes[q]])
+            if not len(rows):
+                continue
+            scores = dot(self.vectors[rows], self.scales[rows], query[None, :])[:, 0]
+            n = min(k, len(rows))
+            best = np.argpartition(-scores, n - 1)[:n]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            out_ids[q, :n] = self.ids[rows[best]]
+            out_scores[q, :n] = scores[best]
+        return out_ids, out_scores
+
+    def save(self, path, **extra):
+        """
+        Atomically write the index (plus any extra scalar metadata) to `path`.
+        The vector matrix goes to its own .npy so load() can memory-map it.
+        """
+        vectors_file = f"{os.path.basename(path)}.{time.time_ns()}.vectors.npy"
+        directory = os.path.dirname(path) or "."
+        tmp = os.path.join(directory, f"{vectors_file}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors))
+        os.replace(tmp, os.path.join(directory, vectors_file))
+
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, ids=self.ids, assign=self.assign, vectors_file=vectors_file, scales=self.scales, fmt=self.fmt,
+                 centroids=self.centroids if self.centroids is not None else np.empty((0, self.dim or 0), np.float32),
+                 trained_size=self.trained_size, **extra)
+        os.replace(tmp, path)
+
+        # Earlier matrices; processes that still map one keep it alive until they reload
+        prefix = f"{os.path.basename(path)}."
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(".vectors.npy") and name != vectors_file:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """-> (index, extra metadata dict). Vectors are a read-only shared memory map."""
+        with np.load(path) as data:
+            vectors = np.load(os.path.join(os.path.dirname(path) or ".", str(data["vectors_file"])), mmap_mode="r")
+            # Files written before quantization support hold float32 and no scales
+            fmt = str(data["fmt"]) if "fmt" in data.files else "float32"
+            index = cls(dim=vectors.shape[1] or None, fmt=fmt, **kwargs)
+            index.ids, index.vectors, index.assign = data["ids"], vectors, data["assign"]
+            index.scales = data["scales"] if "scales" in data.files else np.ones(len(vectors), np.float32)
+            index.centroids = data["centroids"] if len(data["centroids"]) else None
+            index.trained_size = int(data["trained_size"])
+            extra = {key: data[key].item() for key in data.files
+                     if key not in ("ids", "assign", "vectors_file", "scales", "fmt", "centroids", "trained_size")}
+        return index, extra
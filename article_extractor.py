@@ -0,0 +1,289 @@
+# article_extractor.py
+"""
+Generic article extraction: fetch a post's page and turn it into reader-ready
+HTML with readability, keeping the images, figures and SVGs it tends to drop.
+Publisher handlers can bypass this with BaseScraper.extract_article().
+
+The page is parsed once into an lxml tree. Lazy-image and URL fixes are applied
+to that tree, readability runs on it directly (_TreeDocument), and the summary
+comes back as an element, so the SVG, figure, <pre> and UI-artifact fixes are
+tree operations too; the only serialization is the final one.
+benchmarks/bench_article_extraction.py compares speed and output against the
+previous BeautifulSoup-based extractor.
+
+Callers go through article_store.get_article(), which caches the result.
+"""
+import copy
+import re
+from urllib.parse import urljoin
+import lxml.html
+import requests
+import urllib3
+from readability import Document
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+USER_AGENT = ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+FETCH_TIMEOUT = 20
+
+
+def fetch_article_page(url, etag=None, last_modified=None):
+    """
+    GET an article page, conditionally when validators from an earlier fetch are
+    given. Returns None if the origin answered 304 Not Modified, else
+    (html, etag, last_modified).
+    """
+    headers = {'User-Agent': USER_AGENT}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    response = requests.get(url, verify=False, timeout=FETCH_TIMEOUT, headers=headers)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    # requests defaults to ISO-8859-1 for text/html with no declared charset,
+    # which corrupts UTF-8 characters. Force UTF-8, fall back to detected encoding.
+    response.encoding = response.apparent_encoding or 'utf-8'
+    return response.text, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+
+_LAZY_SRC_ATTRS    = ['data-src', 'data-lazy-src', 'data-original', 'data-lazy',
+                       'data-url', 'data-image-src', 'data-hi-res-src', 'data-delayed-url']
+_LAZY_SRCSET_ATTRS = ['data-srcset', 'data-lazy-srcset', 'data-original-set']
+
+_ABSOLUTE_PREFIXES = ('http://', 'https://', 'data:', '#', 'mailto:')
+_MEDIA_SRC = ('img', 'source', 'video', 'audio')
+
+# Attributes readability strips from its output (readability.cleaners.bad_attrs)
+_PRESENTATION_ATTR = re.compile(r'^(?:width|height|style|[-a-z]*color|background[-a-z]*|on*)$')
+
+# UI-only accessibility artifacts (Medium, Substack, etc.)
+_UI_TEXT = re.compile(r'press enter|click to view|full size|zoom in', re.IGNORECASE)
+
+
+class _Summary:
+    """readability's summary as an element; len() is what readability measures for its retry check."""
+
+    def __init__(self, node):
+        self.node = node
+
+    def __len__(self):
+        return len(lxml.html.tostring(self.node, encoding='unicode', method='html'))
+
+
+class _TreeDocument(Document):
+    """readability over an already-parsed tree, returning the summary element instead of a string."""
+
+    def get_clean_html(self):
+        for el in self.html.iter():
+            if isinstance(el.tag, str):
+                for name in [name for name in el.attrib if _PRESENTATION_ATTR.match(name)]:
+                    del el.attrib[name]
+        return _Summary(self.html)
+
+
+def _first(el, attrs):
+    for attr in attrs:
+        val = el.get(attr)
+        if val:
+            return val
+    return None
+
+
+def _resolve_lazy_images(doc):
+    """Promote data-src / data-srcset to real src/srcset so readability keeps images."""
+    for img in doc.iter('img'):
+        if not img.get('src') or img.get('src').startswith('data:'):
+            val = _first(img, _LAZY_SRC_ATTRS)
+            if val:
+                img.set('src', val)
+        if not img.get('srcset'):
+            val = _first(img, _LAZY_SRCSET_ATTRS)
+            if val:
+                img.set('srcset', val)
+
+    # <picture><source> elements
+    for source in doc.iter('source'):
+        if not source.get('srcset'):
+            val = _first(source, _LAZY_SRCSET_ATTRS)
+            if val:
+                source.set('srcset', val)
+        if not source.get('src'):
+            val = _first(source, _LAZY_SRC_ATTRS)
+            if val:
+                source.set('src', val)
+
+
+def _absolutize_srcset(el, base_url):
+    """Make every URL inside a srcset attribute absolute."""
+    srcset = el.get('srcset', '')
+    if not srcset:
+        return
+    parts = []
+    for entry in srcset.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        pieces = entry.split()
+        if pieces and not pieces[0].startswith(('http://', 'https://', 'data:')):
+            pieces[0] = urljoin(base_url, pieces[0])
+        parts.append(' '.join(pieces))
+    el.set('srcset', ', '.join(parts))
+
+
+def _absolutize(root, base_url, attrs):
+    """attrs: (tag, attribute) pairs whose relative URLs are resolved against base_url."""
+    for tag, attr in attrs:
+        for el in root.iter(tag):
+            val = el.get(attr)
+            if val and not val.startswith(_ABSOLUTE_PREFIXES):
+                el.set(attr, urljoin(base_url, val))
+    for el in root.iter('img', 'source'):
+        _absolutize_srcset(el, base_url)
+
+
+def _restore_svg_sizes(summary, doc):
+    """Put back SVG width/height that readability strips, from the page or else from the viewBox."""
+    # html parsing lowercases attributes, so viewBox is viewbox here
+    originals = {svg.get('viewbox'): svg for svg in doc.iter('svg') if svg.get('viewbox')}
+    for svg in summary.iter('svg'):
+        vb = svg.get('viewbox')
+        if not vb:
+            continue
+        orig = originals.get(vb)
+        if orig is not None:
+            if orig.get('width') and not svg.get('width'):
+                svg.set('width', orig.get('width'))
+            if orig.get('height') and not svg.get('height'):
+                svg.set('height', orig.get('height'))
+        # Fallback: derive dimensions from viewBox (e.g. "0 0 26 37" → 26×37)
+        if not svg.get('width') or not svg.get('height'):
+            parts = vb.split()
+            if len(parts) == 4:
+                try:
+                    svg.set('width', str(int(float(parts[2]))))
+                    svg.set('height', str(int(float(parts[3]))))
+                except ValueError:
+                    pass
+
+
+def _figure_media(doc):
+    """Copy of each figure's <picture> (or else <img>), in document order; readability strips them."""
+    media = []
+    for fig in doc.iter('figure'):
+        el = fig.find('.//picture')
+        if el is None:
+            el = fig.find('.//img')
+        if el is not None:
+            el = copy.deepcopy(el)
+            el.tail = None
+            media.append(el)
+    return media
+
+
+def _reinject_figure_media(summary, media):
+    empty_figs = [fig for fig in summary.iter('figure') if fig.find('.//img') is None]
+    for fig, el in zip(empty_figs, media):
+        figcap = fig.find('.//figcaption')
+        if figcap is not None:
+            figcap.addprevious(el)
+        else:
+            fig.insert(0, el)
+            # Text before the first child belongs after the inserted media
+            el.tail, fig.text = fig.text, None
+
+
+def _flatten_newlines(el):
+    for node in el.iter():
+        if node.text:
+            node.text = node.text.replace('\n', ' ')
+        if node is not el and node.tail:
+            node.tail = node.tail.replace('\n', ' ')
+
+
+def _pre_to_paragraphs(pre):
+    """
+    Prose <pre> (no <code>) -> <div> of <p>, one per blank-line separated block,
+    keeping inline markup such as <a>.
+    """
+    chunks = [[]]
+
+    def add_text(text):
+        blocks = (text or '').split('\n\n')
+        chunks[-1].append(blocks[0])
+        chunks.extend([block] for block in blocks[1:])
+
+    add_text(pre.text)
+    for child in list(pre):
+        tail, child.tail = child.tail, None
+        chunks[-1].append(child)
+        add_text(tail)
+
+    div = lxml.html.Element('div')
+    for chunk in chunks:
+        if all(isinstance(part, str) and not part.strip() for part in chunk):
+            continue
+        p = lxml.html.Element('p')
+        last = None
+        for i, part in enumerate(chunk):
+            if isinstance(part, str):
+                text = part.replace('\n', ' ')
+                if i == 0:
+                    text = text.lstrip()
+                if i == len(chunk) - 1:
+                    text = text.rstrip()
+                if last is None:
+                    p.text = (p.text or '') + text
+                else:
+                    last.tail = (last.tail or '') + text
+            else:
+                _flatten_newlines(part)
+                p.append(part)
+                last = part
+        div.append(p)
+    div.tail = pre.tail
+    pre.getparent().replace(pre, div)
+
+
+def extract_article_html(html, url):
+    """Readability extraction of a fetched page -> reader-ready article HTML, or None."""
+    if not html or not html.strip():
+        return None
+    # One parse, with readability's own parser settings
+    doc = lxml.html.document_fromstring(html.encode('utf-8', 'replace'),
+                                        parser=lxml.html.HTMLParser(encoding='utf-8'))
+
+    # ── Pre-process: fix lazy-loaded images and URLs BEFORE readability strips them ──
+    _resolve_lazy_images(doc)
+    _absolutize(doc, url, [(tag, 'src') for tag in _MEDIA_SRC])
+    figure_media = _figure_media(doc)
+
+    summary = _TreeDocument(doc).summary(html_partial=True)
+    if not summary:
+        return None
+    node = summary.node
+
+    _restore_svg_sizes(node, doc)
+    # Absolutize all relative src / href / srcset in readability output
+    _absolutize(node, url, [('a', 'href')] + [(tag, 'src') for tag in _MEDIA_SRC])
+    _reinject_figure_media(node, figure_media)
+
+    for pre in list(node.iter('pre')):
+        if pre.find('.//code') is None and pre.getparent() is not None:
+            _pre_to_paragraphs(pre)
+
+    # collect first, then modify — avoids tree-iteration side effects
+    for span in list(node.iter('span')):
+        text = span.text_content().strip()
+        if text and _UI_TEXT.search(text) and span.find('.//img') is None \
+                and span.find('.//picture') is None and span.find('.//video') is None:
+            span.drop_tree()
+
+    # Unwrap <div role="button"> wrappers around images (keep children)
+    for div in list(node.iter('div')):
+        if div.get('role') == 'button':
+            div.drop_tag()
+
+    return lxml.html.tostring(node, encoding='unicode', method='html')
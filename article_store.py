@@ -0,0 +1,142 @@
+# article_store.py
+"""
+Shared, persistent article content for the reader, TTS and chat endpoints.
+
+get_article() reads through the article_content table, so an article is
+fetched from its origin and extracted once and then served to every gunicorn
+worker and every feature, across restarts. Stored content is fresh for
+ARTICLE_CONTENT_TTL seconds; after that the next reader revalidates it.
+Generic extractions are revalidated with a conditional GET (If-None-Match /
+If-Modified-Since) and a 304 only renews fetched_at. Publisher
+extract_article() overrides fetch the page themselves, so those are re-run.
+If revalidation fails, the stale copy is served.
+
+Refreshes are single-flight per post (single_flight.py): concurrent readers of
+a missing or stale article, in this worker or another, wait for the one fetch
+in progress and then read its result instead of each hitting the origin.
+"""
+import hashlib
+import os
+import time
+import lxml.html
+from bs4 import BeautifulSoup
+from article_extractor import extract_article_html, fetch_article_page
+from handlers.base import BaseScraper
+from handlers.factory import ScraperFactory
+from logger_config import get_logger
+from single_flight import SingleFlight
+
+logger = get_logger("article_store")
+
+ARTICLE_CONTENT_TTL = int(os.getenv("ARTICLE_CONTENT_TTL", 24 * 3600))
+
+_flights = SingleFlight()
+
+
+class ArticleNotFoundError(Exception):
+    pass
+
+
+class ArticleFetchError(Exception):
+    """The origin could not be fetched and nothing is stored for the post."""
+
+
+class ArticleExtractionError(Exception):
+    """The page was fetched but no article content could be extracted."""
+
+
+def html_to_text(html):
+    root = lxml.html.fragment_fromstring(html, create_parent="div")
+    return " ".join(text.strip() for text in root.itertext() if text.strip())
+
+
+def content_hash(html):
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def get_article(db, post_id, max_age=ARTICLE_CONTENT_TTL):
+    """
+    {url, title, publisher_name, html, text, ...} for a post: from the store when
+    fresh, otherwise fetched (or revalidated) and stored first.
+    """
+    article = _stored(db, post_id)
+    if _is_fresh(article, max_age):
+        return article
+    return _flights.do(f"article:{post_id}", lambda: _load(db, post_id),
+                       recheck=lambda: _fresh_stored(db, post_id, max_age))
+
+
+def _stored(db, post_id):
+    with db.reader() as conn:
+        article = db.get_article_content(conn, post_id)
+    if article is None:
+        raise ArticleNotFoundError(f"Post {post_id} not found")
+    return article
+
+
+def _is_fresh(article, max_age):
+    return article["html"] is not None and time.time() - article["fetched_at"] < max_age
+
+
+def _fresh_stored(db, post_id, max_age):
+    # Another worker may have refreshed the article while we waited for it
+    article = _stored(db, post_id)
+    return article if _is_fresh(article, max_age) else None
+
+
+def _load(db, post_id):
+    article = _stored(db, post_id)
+    try:
+        return _refresh(db, post_id, article)
+    except (ArticleFetchError, ArticleExtractionError) as e:
+        if article["html"] is None:
+            raise
+        logger.warning(f"Serving stale content for post {post_id}: {e}")
+        return article
+
+
+def _refresh(db, post_id, article):
+    url = article["url"]
+    scraper = ScraperFactory.get_scraper(article["publisher_name"]) if article["publisher_name"] else None
+    html, source, etag, last_modified = None, "publisher", None, None
+
+    # Publisher-specific extraction first; falls back to generic readability
+    if scraper:
+        try:
+            html = scraper.extract_article(url)
+        except Exception as e:
+            logger.warning(f"Publisher extraction failed for {url}: {e}")
+
+    if not html:
+        source = "generic"
+        validators = ((article["etag"], article["last_modified"])
+                      if article["html"] is not None and article["source"] == "generic" else ())
+        try:
+            page = fetch_article_page(url, *validators)
+        except Exception as e:
+            raise ArticleFetchError(f"Could not fetch article: {e}") from e
+        if page is None:
+            logger.info(f"Article for post {post_id} not modified at origin")
+            with db.writer() as conn:
+                db.touch_article_content(conn, post_id)
+            return article
+        page_html, etag, last_modified = page
+        html = extract_article_html(page_html, url)
+        if not html:
+            raise ArticleExtractionError("Could not extract article content")
+        # Publisher-specific cleanup only applies to the generic readability path
+        if scraper and type(scraper).clean_article is not BaseScraper.clean_article:
+            soup = BeautifulSoup(html, "html.parser")
+            scraper.clean_article(soup)
+            html = str(soup)
+
+    digest = content_hash(html)
+    with db.writer() as conn:
+        if digest == article["content_hash"]:
+            db.touch_article_content(conn, post_id, etag, last_modified)
+        else:
+            article["text"] = html_to_text(html)
+            db.save_article_content(conn, post_id, html, article["text"], digest, source, etag, last_modified)
+    article.update(html=html, content_hash=digest, source=source, etag=etag, last_modified=last_modified,
+                   fetched_at=int(time.time()))
+    return article
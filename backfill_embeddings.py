@@ -1,44 +1,81 @@
 """
 One-time script to compute and store embeddings for existing posts that have none.
 Run once: python backfill_embeddings.py
+Pass --all to re-encode every post. Embeddings encoded from an older post text
+(EMBEDDING_TEXT_VERSION) are re-encoded by every scrape run as well; see reencode_stale.
+Pass --convert to rewrite stored embeddings in EMBEDDING_FORMAT without re-encoding
+(migration 13 does this once on deploy; use it after changing the format later).
+Either way, finishes by exporting new vectors to the memory-mapped embedding store.
 """
 from dotenv import load_dotenv
 load_dotenv()
+import os
+import sys
 
 from db import get_database
-from classifier import get_embedding
+from classifier import EMBEDDING_TEXT_VERSION, post_text, encode_posts
+from embedding_store import EmbeddingStore, store_path
+from embedding_codec import EMBEDDING_FORMAT, encode_blob
+from db.migrations import convert_embeddings
 from logger_config import get_logger
 
 logger = get_logger("backfill_embeddings")
 
-def backfill(db, conn):
+BATCH_SIZE = 50
+# Stale embeddings re-encoded per scrape run
+EMBEDDING_REENCODE_LIMIT = int(os.getenv("EMBEDDING_REENCODE_LIMIT", 5000))
+
+def convert(db, conn):
+    converted = convert_embeddings(conn, EMBEDDING_FORMAT)
+    logger.info(f"Converted {converted} stored embeddings to {EMBEDDING_FORMAT}.")
+    written = EmbeddingStore(store_path(db.db_path)).sync(db, conn)
+    logger.info(f"{written} vectors exported to the embedding store.")
+
+def backfill(db, conn, reencode_all=False):
     c = conn.cursor()
-    c.execute("SELECT id, title, tags FROM posts WHERE embedding IS NULL")
+    where = "" if reencode_all else " WHERE embedding IS NULL"
+    c.execute(f"SELECT id, title, tags FROM posts{where}")
     rows = c.fetchall()
     total = len(rows)
 
     if total == 0:
-        logger.info("No posts missing embeddings — nothing to do.")
-        return
+        logger.info("No posts missing embeddings — nothing to encode.")
+    else:
+        logger.info(f"Backfilling embeddings for {total} posts...")
 
-    logger.info(f"Backfilling embeddings for {total} posts...")
+    for start in range(0, total, BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        _encode_and_save(db, conn, batch)
+        logger.info(f"  {start + len(batch)}/{total} done")
 
-    for i, row in enumerate(rows, 1):
-        post_id, title, tags = row["id"], row["title"], row["tags"] or ""
-        text = f"{title} {tags}".strip()
-        embedding = get_embedding(text)
-        db.save_post_embedding(conn, post_id, embedding.tobytes())
+    written = EmbeddingStore(store_path(db.db_path)).sync(db, conn)
+    logger.info(f"Backfill complete; {written} vectors exported to the embedding store.")
 
-        if i % 50 == 0 or i == total:
-            conn.commit()
-            logger.info(f"  {i}/{total} done")
+def reencode_stale(db, conn, limit=EMBEDDING_REENCODE_LIMIT):
+    """
+    Re-encode up to `limit` stored embeddings built from an older post text, so
+    every stored vector comes from the same text as new posts. Returns the count.
+    """
+    rows = db.get_posts_with_stale_embeddings(conn, EMBEDDING_TEXT_VERSION, limit)
+    for start in range(0, len(rows), BATCH_SIZE):
+        _encode_and_save(db, conn, rows[start:start + BATCH_SIZE])
+    if rows:
+        logger.info(f"Re-encoded {len(rows)} embeddings to post text version {EMBEDDING_TEXT_VERSION}")
+    return len(rows)
 
-    logger.info("Backfill complete.")
+def _encode_and_save(db, conn, rows):
+    embeddings = encode_posts([post_text(row["title"], row["tags"] or "") for row in rows])
+    for row, embedding in zip(rows, embeddings):
+        db.save_post_embedding(conn, row["id"], encode_blob(embedding), EMBEDDING_TEXT_VERSION)
+    conn.commit()
 
 if __name__ == "__main__":
     db = get_database()
     conn = db.get_connection()
     try:
-        backfill(db, conn)
+        if "--convert" in sys.argv[1:]:
+            convert(db, conn)
+        else:
+            backfill(db, conn, reencode_all="--all" in sys.argv[1:])
     finally:
         conn.close()
\ No newline at end of file
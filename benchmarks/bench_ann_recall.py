@@ -0,0 +1,70 @@
+# benchmarks/bench_ann_recall.py
+"""
+Recall@k and latency of the IVF-flat index against brute force.
+
+Uses the labelled post embeddings from a database when given one, otherwise a
+synthetic clustered corpus shaped like ours (768 dims). Queries are held-out
+vectors with a little noise, so "true" neighbours exist but are not the query.
+
+    python benchmarks/bench_ann_recall.py [db_path] [--n 100000] [--k 10]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import IVFFlatIndex
+from embedding_codec import decode_vector
+
+
+def synthetic(n, dim=768, clusters=400, seed=1):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, clusters, n)] + rng.normal(scale=1.5, size=(n, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def from_db(db_path):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT embedding FROM posts WHERE labelled = 1 AND embedding IS NOT NULL").fetchall()
+    conn.close()
+    data = np.stack([decode_vector(raw) for (raw,) in rows])
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("db_path", nargs="?")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    data = from_db(args.db_path) if args.db_path else synthetic(args.n)
+    rng = np.random.default_rng(2)
+    queries = data[rng.choice(len(data), args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    truth = np.argpartition(-(queries @ data.T), args.k - 1, axis=1)[:, :args.k]
+    brute_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    index = IVFFlatIndex(min_train=0)
+    index.add(np.arange(len(data)), data)
+    start = time.perf_counter()
+    index.train()
+    print(f"{len(data)} vectors x {data.shape[1]} dims, {index.nlist} lists, "
+          f"trained in {time.perf_counter() - start:.1f}s; brute force {brute_ms:.2f} ms/query")
+
+    for nprobe in (1, 4, 8, 16, 32):
+        index.nprobe = nprobe
+        start = time.perf_counter()
+        ids, _ = index.search(queries, args.k)
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(set(ids[q]) & set(truth[q])) / args.k for q in range(len(queries))])
+        print(f"nprobe {nprobe:3d}: recall@{args.k} {recall:.3f}  {ms:6.2f} ms/query")
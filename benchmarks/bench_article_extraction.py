@@ -0,0 +1,161 @@
+# benchmarks/bench_article_extraction.py
+"""
+ms/article and output parity of the lxml extraction engine (article_extractor.py)
+against the BeautifulSoup-based extractor it replaced (legacy_article_extractor.py).
+
+The corpus is a directory of saved pages (*.html, e.g. `curl -o`), or by
+default a synthetic one shaped like our publishers' posts: site chrome around
+an article with lazy-loaded and srcset images, <figure>/<picture> media,
+inline SVG diagrams, prose <pre> blocks, code, Medium-style "click to view"
+spans and role=button image wrappers.
+
+Parity is checked on what the reader relies on: visible text, image src and
+srcset, link targets, SVG sizes, figures with media, and the removal of prose
+<pre>, UI spans and button wrappers. Markup may differ in serialization only.
+
+    python benchmarks/bench_article_extraction.py [corpus_dir] [--n 40] [--repeat 3]
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+import lxml.html
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article_extractor import extract_article_html
+from legacy_article_extractor import extract_article_html as legacy_extract_article_html
+
+BASE_URL = "https://engineering.example.com/blog/{i}/post.html"
+
+CHROME = """<header class="site-header"><nav>{links}</nav></header>
+<aside class="sidebar"><h3>Related posts</h3><ul>{related}</ul></aside>"""
+FOOTER = """<footer class="footer"><p>© Example Corp</p><ul>{links}</ul>
+<script>window.__STATE__ = {state};</script></footer>"""
+
+SENTENCES = [
+    "We moved the ingestion path onto a single writer to remove lock contention.",
+    "Tail latency dropped once the cache stopped evicting hot keys under load.",
+    "Each shard keeps an append-only log that replicas replay on startup.",
+    "The rollout was staged across regions with automatic rollback on error budgets.",
+    "Profiling showed most of the time went into parsing the same payload twice.",
+    "Backpressure from the queue now reaches the producers instead of piling up.",
+]
+
+
+def _paragraph(rng):
+    return " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(3, 7)))
+
+
+def synthetic_page(i, rng):
+    # Real pages carry far more chrome than article: mega menus, related lists, inline state
+    links = "".join(f'<a href="/section/{k}" class="nav-link">Section {k}</a>' for k in range(120))
+    related = "".join(f'<li><a href="/blog/{k}/">Related post {k}</a></li>' for k in range(30))
+    state = "[" + ",".join(f'{{"id": {k}, "title": "Related post {k}"}}' for k in range(1500)) + "]"
+    body = [f"<h1>Post {i}: scaling the pipeline</h1>"]
+    for section in range(rng.randint(4, 9)):
+        body.append(f"<h2>Part {section}</h2>")
+        body += [f"<p>{_paragraph(rng)} <a href='/docs/{section}'>docs</a></p>" for _ in range(rng.randint(2, 5))]
+        kind = rng.choice(["lazy", "figure", "picture", "svg", "pre", "code", "ui", "button"])
+        if kind == "lazy":
+            body.append(f'<p><img src="data:image/gif;base64,R0lGOD" data-src="/img/{i}-{section}.png" '
+                        f'data-srcset="/img/{i}-{section}@2x.png 2x, /img/{i}-{section}@3x.png 3x"></p>')
+        elif kind == "figure":
+            body.append(f'<figure><img src="/img/fig-{i}-{section}.jpg" width="640" height="480">'
+                        f'<figcaption>Figure {section}: request flow</figcaption></figure>')
+        elif kind == "picture":
+            body.append(f'<figure><picture><source srcset="/img/p-{i}-{section}.webp 1x" type="image/webp">'
+                        f'<img data-lazy-src="/img/p-{i}-{section}.jpg"></picture>'
+                        f'<figcaption>Diagram {section}</figcaption></figure>')
+        elif kind == "svg":
+            w, h = rng.randint(10, 600), rng.randint(10, 400)
+            sized = f' width="{w}" height="{h}"' if rng.random() < 0.5 else ""
+            body.append(f'<p>Legend <svg viewBox="0 0 {w} {h}"{sized}><rect width="{w}" height="{h}"/></svg> '
+                        f'{_paragraph(rng)}</p>')
+        elif kind == "pre":
+            body.append(f"<pre>{_paragraph(rng)}\nwrapped line with <a href='/notes/{section}'>a link</a>\n\n"
+                        f"{_paragraph(rng)}\n\n{_paragraph(rng)}</pre>")
+        elif kind == "code":
+            body.append(f"<pre><code>for shard in shards:\n    shard.replay(log)\n\nprint('done {section}')</code></pre>")
+        elif kind == "ui":
+            body.append(f'<p>{_paragraph(rng)}<span class="a11y">Press enter or click to view image in full size</span>'
+                        f'<img src="/img/ui-{i}-{section}.png"></p>')
+        else:
+            body.append(f'<div role="button" tabindex="0"><img src="/img/btn-{i}-{section}.png"></div>'
+                        f"<p>{_paragraph(rng)}</p>")
+    return (f"<!DOCTYPE html><html><head><title>Post {i}</title><style>body{{margin:0}}</style></head><body>"
+            f"{CHROME.format(links=links, related=related)}<main><article>{''.join(body)}</article></main>"
+            f"{FOOTER.format(links=links, state=state)}</body></html>")
+
+
+def load_corpus(corpus_dir, n):
+    if corpus_dir:
+        pages = []
+        for i, path in enumerate(sorted(glob.glob(os.path.join(corpus_dir, "*.html")))):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append((BASE_URL.format(i=i), f.read()))
+        return pages
+    rng = random.Random(11)
+    return [(BASE_URL.format(i=i), synthetic_page(i, rng)) for i in range(n)]
+
+
+def features(html):
+    """What the reader depends on, independent of serialization details."""
+    if not html:
+        return None
+    root = lxml.html.fragment_fromstring(html, create_parent="div")
+    return {
+        "text": " ".join(s.strip() for s in root.itertext() if s.strip()),
+        "img src": [el.get("src") for el in root.iter("img")],
+        "srcset": [el.get("srcset") for el in root.iter("img", "source") if el.get("srcset")],
+        "links": [el.get("href") for el in root.iter("a")],
+        "svg sizes": [(el.get("viewbox"), el.get("width"), el.get("height")) for el in root.iter("svg")],
+        "figure media": sum(1 for fig in root.iter("figure") if fig.find(".//img") is not None),
+        "prose pre": sum(1 for pre in root.iter("pre") if pre.find(".//code") is None),
+        "ui spans": sum(1 for span in root.iter("span") if "click to view" in span.text_content().lower()),
+        "button wrappers": sum(1 for div in root.iter("div") if div.get("role") == "button"),
+    }
+
+
+def timed(fn, pages, repeat):
+    outputs, best = None, float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = [fn(html, url) for url, html in pages]
+        best = min(best, time.perf_counter() - start)
+    return outputs, best * 1000 / len(pages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus_dir", nargs="?")
+    parser.add_argument("--n", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus_dir, args.n)
+    size_kb = sum(len(html) for _, html in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size_kb:.0f} KB average")
+
+    legacy, legacy_ms = timed(legacy_extract_article_html, pages, args.repeat)
+    current, current_ms = timed(extract_article_html, pages, args.repeat)
+    print(f"legacy (html.parser + readability): {legacy_ms:7.1f} ms/article")
+    print(f"lxml single pass:                   {current_ms:7.1f} ms/article  ({legacy_ms / current_ms:.1f}x)")
+
+    mismatches = {}
+    for (url, _), old, new in zip(pages, legacy, current):
+        old_features, new_features = features(old), features(new)
+        if old_features is None or new_features is None:
+            if (old_features is None) != (new_features is None):
+                mismatches.setdefault("extracted", []).append(url)
+            continue
+        for name, value in old_features.items():
+            if new_features[name] != value:
+                mismatches.setdefault(name, []).append(url)
+
+    checks = ["extracted"] + list(features("<p>x</p>"))
+    for name in checks:
+        bad = mismatches.get(name, [])
+        print(f"  parity {name:16s} {len(pages) - len(bad):4d}/{len(pages)}" + (f"  e.g. {bad[0]}" if bad else ""))
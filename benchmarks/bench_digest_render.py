@@ -0,0 +1,71 @@
+# benchmarks/bench_digest_render.py
+"""
+Digest rendering throughput for a large send.
+
+Synthesises RECIPIENTS digests drawn from a shared pool of posts (subscribers
+following the same publishers see the same cards) and reports renders/sec with
+the fragment cache, and with a fresh renderer per digest (no card reuse).
+
+    python benchmarks/bench_digest_render.py [recipients]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from digest_renderer import DigestRenderer
+
+RECIPIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+PUBLISHERS = 60
+POSTS_PER_PUBLISHER = 8
+CATEGORIES = ["Software Engineering", "Data Science", "QA & Testing", "Security"]
+
+
+def build_workload(seed=42):
+    rng = random.Random(seed)
+    posts = []
+    for p in range(PUBLISHERS):
+        for i in range(POSTS_PER_PUBLISHER):
+            posts.append({
+                "publisher": f"publisher {p}",
+                "post_url": f"https://blog{p}.example.com/posts/{i}",
+                "post_title": f"how we scaled service {p}-{i} to a million requests",
+                "like_count": rng.choice([0, 0, 1, 3, 12, 57, 134]),
+                "category": CATEGORIES[(p + i) % len(CATEGORIES)],
+            })
+    digests = []
+    for _ in range(RECIPIENTS):
+        heading_map = {}
+        for post in rng.sample(posts, rng.randint(3, 12)):
+            heading_map.setdefault(post["category"], []).append(post)
+        digests.append(heading_map)
+    return digests
+
+
+def run(digests, shared):
+    renderer = DigestRenderer()
+    total_bytes = 0
+    start = time.perf_counter()
+    for heading_map in digests:
+        if not shared:
+            renderer._cards.clear()
+        total_bytes += len(renderer.render(heading_map))
+    return time.perf_counter() - start, total_bytes, renderer.stats()
+
+
+if __name__ == "__main__":
+    digests = build_workload()
+    cards = sum(len(n) for d in digests for n in d.values())
+    print(f"{RECIPIENTS} recipients, {cards} cards, {PUBLISHERS * POSTS_PER_PUBLISHER} distinct posts")
+
+    # Parity: cached and uncached output must be identical
+    sample = digests[:50]
+    shared = DigestRenderer()
+    assert all(shared.render(d) == DigestRenderer().render(d) for d in sample)
+
+    for label, reuse in (("no card reuse", False), ("shared fragment cache", True)):
+        elapsed, total_bytes, stats = run(digests, reuse)
+        print(f"{label:>26}: {RECIPIENTS / elapsed:10.0f} renders/sec  "
+              f"({elapsed:.2f}s, {total_bytes / 1e6:.1f} MB, card hits {stats['hits']}, misses {stats['misses']})")
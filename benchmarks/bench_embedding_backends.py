@@ -0,0 +1,81 @@
+# benchmarks/bench_embedding_backends.py
+"""
+Latency, throughput, memory and parity per embedding runtime.
+
+Each runtime is measured in its own subprocess so peak RSS reflects that
+runtime alone: single-text latency (p50/p95, the /feed/suggested shape), batch
+throughput (the scrape shape) and min cosine similarity to the torch vectors.
+
+    python benchmarks/bench_embedding_backends.py [torch onnx onnx-int8]
+
+ONNX graphs are exported into ONNX_MODEL_DIR on first run (see embedding_runtime.py).
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SINGLE_CALLS = 50
+BATCH_TEXTS = 256
+
+
+def measure(runtime):
+    from embedding_runtime import PARITY_TEXTS
+    from embedding_service import LocalEmbedder
+
+    embedder = LocalEmbedder(runtime=runtime)
+    start = time.perf_counter()
+    embedder.encode(["warm up"])
+    load_s = time.perf_counter() - start
+
+    latencies = []
+    for i in range(SINGLE_CALLS):
+        text = PARITY_TEXTS[i % len(PARITY_TEXTS)]
+        start = time.perf_counter()
+        embedder.encode(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    texts = [f"{PARITY_TEXTS[i % len(PARITY_TEXTS)]} #{i}" for i in range(BATCH_TEXTS)]
+    start = time.perf_counter()
+    embedder.encode(texts)
+    batch_s = time.perf_counter() - start
+
+    vectors = embedder.encode(PARITY_TEXTS)
+    return {
+        "runtime": runtime,
+        "load_s": round(load_s, 2),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 2),
+        "texts_per_sec": round(BATCH_TEXTS / batch_s, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "vectors": vectors.tolist(),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        print(json.dumps(measure(sys.argv[2])))
+        sys.exit(0)
+
+    from embedding_runtime import cosine_rows
+
+    runtimes = sys.argv[1:] or ["torch", "onnx", "onnx-int8"]
+    results = []
+    for runtime in runtimes:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", runtime],
+                             capture_output=True, text=True, check=True, cwd=ROOT)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    reference = next((np.array(r["vectors"]) for r in results if r["runtime"] == "torch"), None)
+    print(f"{'runtime':10s} {'load s':>7s} {'p50 ms':>7s} {'p95 ms':>7s} {'texts/s':>8s} {'RSS MB':>7s} {'min cos':>8s}")
+    for r in results:
+        parity = cosine_rows(reference, np.array(r["vectors"])).min() if reference is not None else float("nan")
+        print(f"{r['runtime']:10s} {r['load_s']:7.2f} {r['p50_ms']:7.2f} {r['p95_ms']:7.2f} "
+              f"{r['texts_per_sec']:8.1f} {r['max_rss_mb']:7.1f} {parity:8.4f}")
@@ -0,0 +1,96 @@
+# benchmarks/bench_embedding_batching.py
+"""
+Per-call vs micro-batched encoding under concurrent load.
+
+THREADS request threads each embed CALLS single texts (the /feed/suggested
+pattern). "per-call" sends each text straight to the model, one at a time (the
+model runs one forward pass at a time); "batched" goes through MicroBatcher,
+which coalesces whatever is queued into one forward pass. Reports texts/sec and
+p50/p99 call latency.
+
+    python benchmarks/bench_embedding_batching.py [threads] [calls]
+    python benchmarks/bench_embedding_batching.py --synthetic [threads] [calls]
+
+--synthetic replaces the model with a fixed-overhead + per-text cost so the
+queueing behaviour can be measured without downloading weights.
+"""
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_service import LocalEmbedder, MicroBatcher
+
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+SYNTHETIC = "--synthetic" in sys.argv
+THREADS = int(args[0]) if len(args) > 0 else 16
+CALLS = int(args[1]) if len(args) > 1 else 50
+
+
+class SyntheticEmbedder:
+    """~8 ms per forward pass plus ~0.4 ms per text, like a small CPU transformer."""
+    model_id = "synthetic"
+    dim = 768
+
+    def encode(self, texts, batch_size=32, normalize=False):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        time.sleep(0.008 + 0.0004 * len(texts))
+        vectors = np.random.default_rng(len(texts)).random((len(texts), self.dim), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+class Serialized:
+    """Direct model calls; one forward pass at a time, as with a shared model."""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self._lock = threading.Lock()
+
+    def encode(self, texts, batch_size=32, normalize=False):
+        with self._lock:
+            return self.embedder.encode(texts, batch_size=batch_size, normalize=normalize)
+
+
+def run(embedder):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(t):
+        local = []
+        for i in range(CALLS):
+            start = time.perf_counter()
+            embedder.encode(f"Title: issue {t}-{i}. Tags: kafka, streaming. Content: consumer lag")
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, latencies
+
+
+def report(label, elapsed, latencies):
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:10s} {len(latencies) / elapsed:9.1f} texts/s   p50 {p50:7.1f} ms   p99 {p99:7.1f} ms")
+
+
+if __name__ == "__main__":
+    model = SyntheticEmbedder() if SYNTHETIC else LocalEmbedder()
+    model.encode(["warm up"])
+    print(f"{THREADS} threads x {CALLS} calls, model {model.model_id}")
+
+    report("per-call", *run(Serialized(model)))
+    batcher = MicroBatcher(model)
+    report("batched", *run(batcher))
+    print(f"batcher: {batcher.stats()}")
@@ -0,0 +1,60 @@
+# benchmarks/bench_embedding_quantization.py
+"""
+Memory, scoring speed and ranking fidelity of each embedding format.
+
+Uses the labelled post embeddings from a database when given one, otherwise a
+synthetic clustered corpus shaped like ours (768 dims). For float32, float16
+and int8 (embedding_codec.py) it reports the BLOB size per post, the in-memory
+matrix size, brute-force scoring time per query and top-k overlap with the
+float32 ranking. Queries are corpus vectors with a little noise.
+
+    python benchmarks/bench_embedding_quantization.py [db_path] [--n 50000] [--k 10]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ann_recall import from_db, synthetic
+from embedding_codec import FORMATS, dot, encode_blob, quantize
+
+
+def top_k(scores, k):
+    return np.argpartition(-scores, k - 1, axis=0)[:k].T
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("db_path", nargs="?")
+    parser.add_argument("--n", type=int, default=50_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = from_db(args.db_path) if args.db_path else synthetic(args.n)
+    rng = np.random.default_rng(3)
+    queries = data[rng.choice(len(data), args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    print(f"{len(data)} vectors x {data.shape[1]} dims, {args.queries} queries, top-{args.k}")
+
+    baseline = None
+    print(f"{'format':8s} {'blob B':>7s} {'matrix MB':>10s} {'saved':>6s} {'ms/query':>9s} {'speedup':>8s} {'overlap':>8s}")
+    for fmt in FORMATS:
+        codes, scales = quantize(data, fmt)
+        matrix_bytes = codes.nbytes + (scales.nbytes if fmt == "int8" else 0)
+        dot(codes, scales, queries)   # warm up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            scores = dot(codes, scales, queries)
+        ms = (time.perf_counter() - start) * 1000 / (args.repeat * len(queries))
+        found = top_k(scores, args.k)
+        if baseline is None:
+            baseline = {"bytes": matrix_bytes, "ms": ms, "top": found}
+        overlap = np.mean([len(set(found[q]) & set(baseline["top"][q])) / args.k for q in range(len(queries))])
+        print(f"{fmt:8s} {len(encode_blob(data[0], fmt)):7d} {matrix_bytes / 2**20:10.1f} "
+              f"{1 - matrix_bytes / baseline['bytes']:6.0%} {ms:9.3f} {baseline['ms'] / ms:7.2f}x {overlap:8.3f}")
@@ -0,0 +1,185 @@
+# benchmarks/legacy_article_extractor.py
+"""
+The BeautifulSoup/html.parser article extractor that article_extractor.py
+replaced, kept verbatim as the baseline for bench_article_extraction.py.
+Not used by the application.
+"""
+
+
+_LAZY_SRC_ATTRS    = ['data-src', 'data-lazy-src', 'data-original', 'data-lazy',
+                       'data-url', 'data-image-src', 'data-hi-res-src', 'data-delayed-url']
+_LAZY_SRCSET_ATTRS = ['data-srcset', 'data-lazy-srcset', 'data-original-set']
+
+
+def _resolve_lazy_images(soup):
+    """Promote data-src / data-srcset to real src/srcset so readability keeps images."""
+    for img in soup.find_all('img'):
+        # src
+        if not img.get('src') or img['src'].startswith('data:'):
+            for attr in _LAZY_SRC_ATTRS:
+                val = img.get(attr)
+                if val:
+                    img['src'] = val
+                    break
+        # srcset
+        if not img.get('srcset'):
+            for attr in _LAZY_SRCSET_ATTRS:
+                val = img.get(attr)
+                if val:
+                    img['srcset'] = val
+                    break
+
+    # <picture><source> elements
+    for source in soup.find_all('source'):
+        if not source.get('srcset'):
+            for attr in _LAZY_SRCSET_ATTRS:
+                val = source.get(attr)
+                if val:
+                    source['srcset'] = val
+                    break
+        if not source.get('src'):
+            for attr in _LAZY_SRC_ATTRS:
+                val = source.get(attr)
+                if val:
+                    source['src'] = val
+                    break
+
+
+def _absolutize_srcset(el, base_url):
+    """Make every URL inside a srcset attribute absolute."""
+    from urllib.parse import urljoin
+    srcset = el.get('srcset', '')
+    if not srcset:
+        return
+    parts = []
+    for entry in srcset.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        pieces = entry.split()
+        if pieces and not pieces[0].startswith(('http://', 'https://', 'data:')):
+            pieces[0] = urljoin(base_url, pieces[0])
+        parts.append(' '.join(pieces))
+    el['srcset'] = ', '.join(parts)
+
+
+def extract_article_html(html, url):
+    """Readability extraction of a fetched page -> reader-ready article HTML, or None."""
+    from readability import Document
+    from bs4 import BeautifulSoup
+    from urllib.parse import urljoin
+
+    # ── Pre-process: fix lazy-loaded images BEFORE readability strips them ──
+    pre_soup = BeautifulSoup(html, 'html.parser')
+    _resolve_lazy_images(pre_soup)
+
+    # Absolutize URLs in pre_soup NOW so collected images are already absolute
+    for tag, attr in [('img', 'src'), ('source', 'src'), ('video', 'src'), ('audio', 'src')]:
+        for el in pre_soup.find_all(tag):
+            val = el.get(attr)
+            if val and not val.startswith(('http://', 'https://', 'data:', '#')):
+                el[attr] = urljoin(url, val)
+    for el in pre_soup.find_all(['img', 'source']):
+        _absolutize_srcset(el, url)
+
+    # ── Collect figure media from original HTML (readability strips images from figures) ──
+    orig_figure_media = []
+    for fig in pre_soup.find_all('figure'):
+        pic = fig.find('picture')
+        img_tag = fig.find('img')
+        if pic:
+            orig_figure_media.append(str(pic))
+        elif img_tag:
+            orig_figure_media.append(str(img_tag))
+
+    html = str(pre_soup)
+
+    doc = Document(html)
+    content = doc.summary(html_partial=True)
+    if not content:
+        return None
+
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # ── Restore SVG width/height stripped by readability ──
+    # Note: html.parser lowercases all attributes, so viewBox → viewbox
+    def _svg_viewbox(el):
+        return el.get('viewbox') or el.get('viewBox')
+
+    orig_svgs = {_svg_viewbox(s): s for s in pre_soup.find_all('svg') if _svg_viewbox(s)}
+    for svg in soup.find_all('svg'):
+        vb = _svg_viewbox(svg)
+        if not vb:
+            continue
+        # Try restoring from original HTML first
+        orig = orig_svgs.get(vb)
+        if orig:
+            if orig.get('width') and not svg.get('width'):
+                svg['width'] = orig['width']
+            if orig.get('height') and not svg.get('height'):
+                svg['height'] = orig['height']
+        # Fallback: derive dimensions from viewBox (e.g. "0 0 26 37" → 26×37)
+        if not svg.get('width') or not svg.get('height'):
+            parts = vb.split()
+            if len(parts) == 4:
+                try:
+                    svg['width'] = str(int(float(parts[2])))
+                    svg['height'] = str(int(float(parts[3])))
+                except ValueError:
+                    pass
+
+    # Absolutize all relative src / href / srcset in readability output
+    for tag, attr in [('img', 'src'), ('a', 'href'), ('source', 'src'), ('video', 'src'), ('audio', 'src')]:
+        for el in soup.find_all(tag):
+            val = el.get(attr)
+            if val and not val.startswith(('http://', 'https://', 'data:', '#', 'mailto:')):
+                el[attr] = urljoin(url, val)
+
+    for el in soup.find_all(['img', 'source']):
+        _absolutize_srcset(el, url)
+
+    # ── Re-inject images into figures that readability emptied ──
+    empty_figs = [f for f in soup.find_all('figure') if not f.find('img')]
+    for i, fig in enumerate(empty_figs):
+        if i < len(orig_figure_media):
+            media_node = BeautifulSoup(orig_figure_media[i], 'html.parser')
+            figcap = fig.find('figcaption')
+            if figcap:
+                figcap.insert_before(media_node)
+            else:
+                fig.insert(0, media_node)
+
+    # Convert prose <pre> tags (no <code> child) into paragraphs,
+    # preserving inline HTML like <a> tags via decode_contents()
+    for pre in soup.find_all('pre'):
+        if not pre.find('code'):
+            inner_html = pre.decode_contents()
+            new_div = soup.new_tag('div')
+            for chunk in inner_html.split('\n\n'):
+                chunk = chunk.strip()
+                if chunk:
+                    p = soup.new_tag('p')
+                    parsed = BeautifulSoup(chunk.replace('\n', ' '), 'html.parser')
+                    body = parsed.body or parsed
+                    for child in list(body.children):
+                        p.append(child)
+                    new_div.append(p)
+            pre.replace_with(new_div)
+
+    # ── Strip UI-only accessibility artifacts (Medium, Substack, etc.) ──
+    import re as _re
+    _UI_TEXT = _re.compile(
+        r'press enter|click to view|full size|zoom in',
+        _re.IGNORECASE
+    )
+    # collect first, then modify — avoids tree-iteration side effects
+    for span in list(soup.find_all('span')):
+        txt = span.get_text(strip=True)
+        if txt and _UI_TEXT.search(txt) and not span.find(['img', 'picture', 'video']):
+            span.decompose()
+
+    # Unwrap <div role="button"> wrappers around images (keep children)
+    for div in list(soup.find_all('div', attrs={'role': 'button'})):
+        div.unwrap()
+
+    return str(soup)
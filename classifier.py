@@ -1,17 +1,20 @@
 # classifier_model.py
 import os
-from sentence_transformers import SentenceTransformer, util
+import re
+from functools import lru_cache
 from db import enums
 import pickle
+import numpy as np
 from logger_config import get_logger
+from embedding_service import get_embedder
 
 env = os.getenv('FLASK_ENV', 'development')
 MODEL_PATH = os.getenv("MODEL_PATH", "data/trained_classifier.pkl") if env == 'production' else 'data/dev/trained_classifier.pkl'
 CONFIDENCE_THRESHOLD = 0.7
 
 logger = get_logger("classifier")
-# Load embedding model
-embedding_model = SentenceTransformer('all-mpnet-base-v2')
+# Embedding model: in-process or the shared embedding service, per EMBEDDING_BACKEND
+embedder = get_embedder()
 
 # Category descriptions
 categories = {
@@ -56,11 +59,14 @@ categories = {
     )
 }
 
-# Precompute embeddings for baseline
-category_embeddings = {
-    cat: embedding_model.encode(desc, convert_to_tensor=True)
-    for cat, desc in categories.items()
-}
+# Baseline category embeddings: one L2-normalized row per category, so cosine
+# similarity against every category is a single matmul. Encoded on first use,
+# so importing this module does not touch the model.
+CATEGORY_NAMES = list(categories)
+
+@lru_cache(maxsize=1)
+def category_matrix():
+    return embedder.encode([categories[cat] for cat in CATEGORY_NAMES], normalize=True)
 
 # Optional keyword mapping
 keywords_map = {
@@ -102,6 +108,22 @@ keywords_map = {
     ]
 }
 
+# All keywords compiled into one alternation, longest first, inside a lookahead so a
+# single scan finds the longest keyword starting at every position. A keyword also
+# credits the categories of every keyword contained in it, which keeps "any keyword
+# is a substring of the text" semantics when a shorter one overlaps a longer match.
+_keyword_categories = {}
+for _cat, _kw_list in keywords_map.items():
+    for _kw in _kw_list:
+        _keyword_categories.setdefault(_kw, set()).add(CATEGORY_NAMES.index(_cat))
+KEYWORD_PATTERN = re.compile("(?=(" + "|".join(
+    re.escape(kw) for kw in sorted(_keyword_categories, key=len, reverse=True)) + "))")
+KEYWORD_CATEGORIES = {
+    kw: sorted(set().union(*(cats for other, cats in _keyword_categories.items() if other in kw)))
+    for kw in _keyword_categories
+}
+KEYWORD_BOOST = 0.1
+
 # ===== Load trained classifier if exists =====
 trained_clf = None
 label_encoder = None
@@ -115,31 +137,57 @@ if os.path.exists(MODEL_PATH):
 # ===== Embedding helper =====
 def get_embedding(text):
     """Return a numpy array embedding for the given text."""
-    return embedding_model.encode(text, convert_to_numpy=True)
+    return embedder.encode(text)
+
+def get_embeddings(texts):
+    """Embeddings for many texts in one request -> float32 array of shape (N, dim)."""
+    return embedder.encode(list(texts))
+
+# Bump whenever post_text changes: the scrape job re-encodes stored embeddings
+# built from an older version (backfill_embeddings.reencode_stale)
+EMBEDDING_TEXT_VERSION = 2
+
+def post_text(title, tags="", content=""):
+    """The one text a post is encoded from, for both classification and the stored embedding."""
+    return f"Title: {title}. Tags: {tags}. Content: {content[:100] if content else ''}"
+
+def encode_posts(texts, batch_size=32):
+    """Encode many post texts in one batched call -> float32 array of shape (N, dim)."""
+    return embedder.encode(list(texts), batch_size=batch_size)
 
 # ===== Baseline classifier =====
+def _keyword_boosts(texts):
+    """(N, C) matrix with KEYWORD_BOOST where a text mentions any keyword of that category."""
+    boosts = np.zeros((len(texts), len(CATEGORY_NAMES)), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for kw in set(KEYWORD_PATTERN.findall(text.lower())):
+            boosts[i, KEYWORD_CATEGORIES[kw]] = KEYWORD_BOOST
+    return boosts
+
+def classify_many(texts, embeddings=None):
+    """
+    Baseline-classify N posts at once -> (categories, scores).
+    scores is an (N, C) array of cosine similarity plus keyword boost, columns in
+    CATEGORY_NAMES order. Pass embeddings to reuse vectors already encoded for texts.
+    """
+    if len(texts) == 0:
+        return [], np.zeros((0, len(CATEGORY_NAMES)), dtype=np.float32)
+    if embeddings is None:
+        embeddings = embedder.encode([text.lower() for text in texts])
+    embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = (embeddings / np.maximum(norms, 1e-12)) @ category_matrix().T + _keyword_boosts(texts)
+
+    top_two = -np.sort(-scores, axis=1)[:, :2]
+    general = (top_two[:, 0] < 0.25) | ((top_two[:, 0] - top_two[:, 1]) < 0.05)
+    best = scores.argmax(axis=1)
+    categories_out = [enums.PublisherCategory.GENERAL.value if general[i] else CATEGORY_NAMES[best[i]]
+                      for i in range(len(texts))]
+    return categories_out, scores
+
 def classify_with_embeddings(title, tags="", content=""):
-    content_snippet = content[:100] if content else ""
-    combined_text = f"Title: {title}. Tags: {tags}. Content: {content_snippet}".lower()
-    text_embedding = embedding_model.encode(combined_text, convert_to_tensor=True)
-
-    scores = {cat: util.cos_sim(text_embedding, emb).item()
-              for cat, emb in category_embeddings.items()}
-
-    combined_lower = combined_text.lower()
-    for cat, kw_list in keywords_map.items():
-        for kw in kw_list:
-            if kw in combined_lower:
-                scores[cat] += 0.1
-                break
-
-    best_cat = max(scores, key=scores.get)
-    sorted_scores = sorted(scores.values(), reverse=True)
-    top_score = sorted_scores[0]
-    second_score = sorted_scores[1] if len(sorted_scores) > 1 else 0.0
-    if top_score < 0.25 or (top_score - second_score) < 0.05:
-        return enums.PublisherCategory.GENERAL.value
-    return best_cat
+    categories_out, _ = classify_many([post_text(title, tags, content)])
+    return categories_out[0]
 
 # ===== Unified classifier =====
 def classify_post(title, tags="", content=""):
@@ -148,7 +196,7 @@ def classify_post(title, tags="", content=""):
     if trained_clf and label_encoder:
         logger.info("Attempt to use trained classifier")
 
-        text_embedding = embedding_model.encode(f"Title: {title}. Tags: {tags}. Content: {content[:100]}")
+        text_embedding = embedder.encode(post_text(title, tags, content))
         pred_proba = trained_clf.predict_proba([text_embedding])[0]
         max_prob = pred_proba.max()
         if max_prob >= CONFIDENCE_THRESHOLD:
@@ -160,3 +208,28 @@ def classify_post(title, tags="", content=""):
 
     # fallback
     return classify_with_embeddings(title, tags, content)
+
+def classify_encoded(texts, embeddings):
+    """
+    Classify N posts that were already encoded with encode_posts(texts).
+    The trained classifier scores the whole batch with one predict_proba;
+    rows below CONFIDENCE_THRESHOLD fall back to the baseline on the same vector.
+    """
+    categories_out = [None] * len(texts)
+    if len(texts) == 0:
+        return categories_out
+
+    if trained_clf and label_encoder:
+        pred_proba = trained_clf.predict_proba(embeddings)
+        confident = pred_proba.max(axis=1) >= CONFIDENCE_THRESHOLD
+        labels = label_encoder.inverse_transform(trained_clf.classes_[pred_proba.argmax(axis=1)])
+        for i in np.flatnonzero(confident):
+            categories_out[i] = labels[i]
+        logger.info(f"Trained classifier confident on {int(confident.sum())}/{len(texts)} posts")
+
+    fallback = [i for i, category in enumerate(categories_out) if category is None]
+    if fallback:
+        baseline, _ = classify_many([texts[i] for i in fallback], np.asarray(embeddings)[fallback])
+        for i, category in zip(fallback, baseline):
+            categories_out[i] = category
+    return categories_out
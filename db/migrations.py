@@ -0,0 +1,637 @@
+# db/migrations.py
+"""
+Versioned schema migrations for the SQLite database.
+
+Each migration is registered with a unique, increasing version number and is
+applied exactly once; applied versions are recorded in the schema_version table.
+On a warm start (schema already current) migrate() costs a single SELECT.
+
+Migrations run inside their own BEGIN IMMEDIATE transaction. Migrations marked
+batched=True manage their own transactions (e.g. rebuild_table) so that large
+copies commit in chunks and never hold the write lock for long; they must be
+safe to resume if the process dies halfway.
+"""
+import fcntl
+import os
+import sqlite3
+import time
+from logger_config import get_logger
+from db.pool import open_connection, retry_on_busy
+from embedding_codec import EMBEDDING_FORMAT, blob_format, check_format, decode_vector, encode_blob
+
+logger = get_logger("DATABASE")
+
+REBUILD_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 2000))
+
+POST_TOPICS = ("'Software Engineering', 'Frontend Engineering', 'Backend Engineering', "
+               "'Mobile Engineering', 'Platform & Infrastructure', 'Data Engineering', "
+               "'Data Science', 'Machine Learning & AI', 'Data Analytics', "
+               "'Security Engineering', 'QA & Testing', 'Product Management', 'General'")
+SUBSCRIPTION_TOPICS = ("'Software Engineering', 'Frontend Engineering', 'Backend Engineering', "
+                       "'Mobile Engineering', 'Platform & Infrastructure', 'Data Engineering', "
+                       "'Data Science', 'Machine Learning & AI', 'Data Analytics', "
+                       "'Security Engineering', 'QA & Testing', 'Product Management'")
+
+POSTS_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {{name}} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        publisher_id INTEGER NOT NULL,
+        url TEXT NOT NULL,
+        title TEXT NOT NULL,
+        tags TEXT,
+        published_at DATETIME NOT NULL,
+        modified_at DATETIME NOT NULL,
+        labelled BOOL DEFAULT 0,
+        topic TEXT NOT NULL CHECK (topic IN ({POST_TOPICS})),
+        embedding BLOB,
+        created_at DATETIME,
+        FOREIGN KEY (publisher_id) REFERENCES publishers(id),
+        UNIQUE (url)
+    )
+"""
+
+SUBSCRIPTIONS_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {{name}} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL,
+        publisher_id INTEGER NOT NULL,
+        joined_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        topic TEXT NOT NULL CHECK (topic IN ({SUBSCRIPTION_TOPICS})),
+        frequency_in_days INTEGER DEFAULT 3,
+        last_notified_at DATETIME DEFAULT NULL,
+        active BOOL DEFAULT 1,
+        FOREIGN KEY (publisher_id) REFERENCES publishers(id),
+        UNIQUE (email, publisher_id, topic)
+    )
+"""
+
+MIGRATIONS = []
+
+
+def migration(version, name, batched=False):
+    def register(fn):
+        assert all(m["version"] != version for m in MIGRATIONS), f"duplicate migration {version}"
+        MIGRATIONS.append({"version": version, "name": name, "fn": fn, "batched": batched})
+        MIGRATIONS.sort(key=lambda m: m["version"])
+        return fn
+    return register
+
+
+def latest_version():
+    return MIGRATIONS[-1]["version"] if MIGRATIONS else 0
+
+
+# ── Helpers ──────────────────────────────────────────────────────────────────
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def table_sql(conn, table):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    return row[0] if row else None
+
+
+def rebuild_table(conn, table, create_sql, columns, select_exprs=None, batch_size=None):
+    """
+    Rebuild `table` from `create_sql` (a template with a {name} placeholder),
+    copying rows in id order, `batch_size` rows per transaction, so readers and
+    other writers get a turn between batches. Triggers on the old table mirror
+    inserts, updates and deletes of already-copied rows into the copy; rows past
+    the copied range are picked up by later batches and by the final catch-up,
+    which drops the old table and renames the new one in a single short
+    transaction.
+
+    Resumable: if a previous run died midway, the partially filled
+    <table>__rebuild table (kept current by the mirror triggers) is continued
+    from its highest id. A leftover copy without its triggers cannot be trusted
+    and is discarded.
+
+    Indexes and triggers on the old table are dropped with it; migrations that
+    create them must run after any rebuild of the table.
+    """
+    new_table = f"{table}__rebuild"
+    batch_size = batch_size or REBUILD_BATCH_SIZE
+    select_exprs = select_exprs or columns
+    col_list = ", ".join(columns)
+    select_list = ", ".join(select_exprs)
+
+    _begin(conn)
+    if table_sql(conn, new_table) is not None and not _has_mirror_triggers(conn, table):
+        logger.warning(f"Migration: discarding unsynchronized leftover {new_table}")
+        conn.execute(f"DROP TABLE {new_table}")
+    conn.execute(create_sql.format(name=new_table))
+    last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {new_table}").fetchone()[0]
+    _mirror_writes(conn, table, new_table, col_list, select_list, last_id)
+    conn.execute("COMMIT")
+
+    copied = 0
+    while True:
+        _begin(conn)
+        rows = conn.execute(f"""
+            INSERT INTO {new_table} ({col_list})
+            SELECT {select_list} FROM {table} WHERE id > ? ORDER BY id LIMIT ?
+        """, (last_id, batch_size)).rowcount
+        last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {new_table}").fetchone()[0]
+        _mirror_writes(conn, table, new_table, col_list, select_list, last_id)
+        conn.execute("COMMIT")
+        copied += rows
+        if rows < batch_size:
+            break
+        logger.info(f"Migration: rebuilt {copied} rows of {table}")
+
+    _begin(conn)
+    conn.execute(f"""
+        INSERT INTO {new_table} ({col_list})
+        SELECT {select_list} FROM {table} WHERE id > ? ORDER BY id
+    """, (last_id,))
+    conn.execute(f"DROP TABLE {table}")      # drops the mirror triggers with it
+    conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+    conn.execute("COMMIT")
+
+
+_MIRROR_EVENTS = ("insert", "update", "delete")
+
+
+def _has_mirror_triggers(conn, table):
+    names = [f"{table}__rebuild_{event}" for event in _MIRROR_EVENTS]
+    found = conn.execute(f"""
+        SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({", ".join("?" * len(names))})
+    """, names).fetchone()[0]
+    return found == len(names)
+
+
+def _mirror_writes(conn, table, new_table, col_list, select_list, last_id):
+    """(Re)create triggers copying writes to rows with id <= last_id into new_table."""
+    for event in _MIRROR_EVENTS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}__rebuild_{event}")
+    upsert = f"""INSERT OR REPLACE INTO {new_table} ({col_list})
+                 SELECT {select_list} FROM {table} WHERE id = NEW.id AND id <= {last_id};"""
+    conn.execute(f"""
+        CREATE TRIGGER {table}__rebuild_insert AFTER INSERT ON {table} WHEN NEW.id <= {last_id} BEGIN
+            {upsert}
+        END""")
+    conn.execute(f"""
+        CREATE TRIGGER {table}__rebuild_update AFTER UPDATE ON {table}
+        WHEN OLD.id <= {last_id} OR NEW.id <= {last_id} BEGIN
+            DELETE FROM {new_table} WHERE id = OLD.id;
+            {upsert}
+        END""")
+    conn.execute(f"""
+        CREATE TRIGGER {table}__rebuild_delete AFTER DELETE ON {table} WHEN OLD.id <= {last_id} BEGIN
+            DELETE FROM {new_table} WHERE id = OLD.id;
+        END""")
+
+
+def convert_embeddings(conn, fmt=EMBEDDING_FORMAT, batch_size=None):
+    """
+    Re-encode every posts.embedding BLOB that is not already in `fmt`
+    (embedding_codec.py), `batch_size` posts per transaction. Resumable: BLOBs are
+    self-describing, so rows converted by an earlier run are skipped. Returns the
+    number of rows rewritten.
+    """
+    check_format(fmt)
+    batch_size = batch_size or REBUILD_BATCH_SIZE
+    last_id, converted = 0, 0
+    while True:
+        _begin(conn)
+        rows = conn.execute("""
+            SELECT id, embedding FROM posts WHERE id > ? AND embedding IS NOT NULL ORDER BY id LIMIT ?
+        """, (last_id, batch_size)).fetchall()
+        updates = [(encode_blob(decode_vector(raw), fmt), post_id) for post_id, raw in rows
+                   if blob_format(raw) not in (None, fmt)]
+        if updates:
+            conn.executemany("UPDATE posts SET embedding = ? WHERE id = ?", updates)
+        conn.execute("COMMIT")
+        converted += len(updates)
+        if len(rows) < batch_size:
+            break
+        last_id = rows[-1][0]
+        logger.info(f"Migration: converted {converted} embeddings to {fmt}")
+    return converted
+
+
+def _begin(conn):
+    retry_on_busy(conn.execute, "BEGIN IMMEDIATE")
+
+
+# ── Migrations ───────────────────────────────────────────────────────────────
+
+@migration(1, "initial schema")
+def _initial_schema(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS notifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL,
+        heading TEXT NOT NULL,
+        post_url TEXT NOT NULL,
+        post_title TEXT NOT NULL,
+        style_version INTEGER,
+        deleted BOOL DEFAULT 0,
+        maturity_date DATETIME NOT NULL
+    )
+    """)
+    conn.execute(SUBSCRIPTIONS_TABLE_SQL.format(name="subscriptions"))
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS publishers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        publisher_name TEXT NOT NULL,
+        publisher_type TEXT NOT NULL CHECK (publisher_type IN ('techteam', 'individual', 'community')),
+        last_scraped_at DATETIME DEFAULT NULL,
+        UNIQUE (publisher_name)
+    )
+    """)
+    conn.execute(POSTS_TABLE_SQL.format(name="posts"))
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS post_likes (
+        post_id INTEGER NOT NULL,
+        user_email TEXT NOT NULL,
+        liked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (post_id, user_email),
+        FOREIGN KEY (post_id) REFERENCES posts(id)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS fire (
+        post_id INTEGER PRIMARY KEY,
+        fire_count INTEGER NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (post_id) REFERENCES posts(id)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS views (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        post_id INTEGER NOT NULL,
+        user_identifier TEXT NOT NULL,
+        device_id TEXT NOT NULL,
+        viewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (post_id, user_identifier, device_id),
+        FOREIGN KEY (post_id) REFERENCES posts(id)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS reading_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        post_id INTEGER NOT NULL,
+        user_email TEXT,
+        device_id TEXT NOT NULL,
+        time_spent INTEGER NOT NULL DEFAULT 0,
+        max_depth INTEGER NOT NULL DEFAULT 0,
+        opened_original BOOLEAN NOT NULL DEFAULT 0,
+        last_read_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (post_id, device_id),
+        FOREIGN KEY (post_id) REFERENCES posts(id)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS job_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL UNIQUE,
+        job_name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        logs TEXT NOT NULL DEFAULT '[]',
+        started_at DATETIME NOT NULL,
+        finished_at DATETIME DEFAULT NULL
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS tts_cache (
+        post_id    INTEGER PRIMARY KEY,
+        audio_file TEXT    NOT NULL,
+        timings    TEXT    NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+@migration(2, "rename post_likes.jira_account_id to user_email")
+def _rename_post_likes_account(conn):
+    if "jira_account_id" in table_columns(conn, "post_likes"):
+        conn.execute("ALTER TABLE post_likes RENAME COLUMN jira_account_id TO user_email")
+
+
+@migration(3, "add posts.embedding")
+def _add_posts_embedding(conn):
+    if "embedding" not in table_columns(conn, "posts"):
+        conn.execute("ALTER TABLE posts ADD COLUMN embedding BLOB")
+
+
+@migration(4, "add posts.created_at")
+def _add_posts_created_at(conn):
+    if "created_at" not in table_columns(conn, "posts"):
+        conn.execute("ALTER TABLE posts ADD COLUMN created_at DATETIME")
+        conn.execute("UPDATE posts SET created_at = published_at WHERE created_at IS NULL")
+
+
+@migration(5, "expand topic categories", batched=True)
+def _expand_topic_categories(conn):
+    # Old 'Software Testing' topic is renamed to 'QA & Testing' as rows are copied
+    rename_topic = "CASE WHEN topic = 'Software Testing' THEN 'QA & Testing' ELSE topic END"
+
+    post_cols = ["id", "publisher_id", "url", "title", "tags", "published_at",
+                 "modified_at", "labelled", "topic", "embedding", "created_at"]
+    sub_cols = ["id", "email", "publisher_id", "joined_time", "topic",
+                "frequency_in_days", "last_notified_at", "active"]
+    # Checked per table: a restart may land between the two rebuilds
+    for table, create_sql, cols in (("posts", POSTS_TABLE_SQL, post_cols),
+                                    ("subscriptions", SUBSCRIPTIONS_TABLE_SQL, sub_cols)):
+        if "Frontend Engineering" in (table_sql(conn, table) or ""):
+            _begin(conn)
+            conn.execute(f"DROP TABLE IF EXISTS {table}__rebuild")
+            conn.execute("COMMIT")
+            continue
+        rebuild_table(conn, table, create_sql, cols, [rename_topic if c == "topic" else c for c in cols])
+
+
+# Likes younger than this count towards post_stats.recent_like_count ("trending")
+RECENT_LIKES_WINDOW = "-15 days"
+
+# Recomputes every post_stats row from the source tables; only rows that drifted
+# are written. Used to backfill post_stats and by the reconcile job, which also
+# decays recent_like_count as likes age out of the window. Trending itself counts
+# the window at read time (get_most_liked_this_month), so it never depends on
+# the job having run.
+POST_STATS_RECONCILE_SQL = f"""
+    INSERT INTO post_stats (post_id, like_count, view_count, fire_count, recent_like_count)
+    SELECT po.id,
+           COALESCE(lc.like_count, 0),
+           COALESCE(vc.view_count, 0),
+           COALESCE(f.fire_count, 0),
+           COALESCE(lc.recent_like_count, 0)
+    FROM posts po
+    LEFT JOIN (
+        SELECT post_id, COUNT(*) AS like_count,
+               SUM(liked_at >= datetime('now', '{RECENT_LIKES_WINDOW}')) AS recent_like_count
+        FROM post_likes GROUP BY post_id
+    ) lc ON lc.post_id = po.id
+    LEFT JOIN (
+        SELECT post_id, COUNT(*) AS view_count FROM views GROUP BY post_id
+    ) vc ON vc.post_id = po.id
+    LEFT JOIN fire f ON f.post_id = po.id
+    WHERE true
+    ON CONFLICT(post_id) DO UPDATE SET
+        like_count = excluded.like_count,
+        view_count = excluded.view_count,
+        fire_count = excluded.fire_count,
+        recent_like_count = excluded.recent_like_count
+    WHERE like_count != excluded.like_count
+       OR view_count != excluded.view_count
+       OR fire_count != excluded.fire_count
+       OR recent_like_count != excluded.recent_like_count
+"""
+
+
+@migration(6, "post_stats engagement counters")
+def _post_stats(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS post_stats (
+        post_id INTEGER PRIMARY KEY,
+        like_count INTEGER NOT NULL DEFAULT 0,
+        view_count INTEGER NOT NULL DEFAULT 0,
+        fire_count INTEGER NOT NULL DEFAULT 0,
+        recent_like_count INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (post_id) REFERENCES posts(id)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_post_stats_like_count ON post_stats(like_count) WHERE like_count > 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_post_stats_fire_count ON post_stats(fire_count) WHERE fire_count > 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_post_stats_recent ON post_stats(recent_like_count) WHERE recent_like_count > 0")
+
+    # Counters are kept in step with every write by these triggers
+    for trigger in (
+        """CREATE TRIGGER IF NOT EXISTS post_stats_posts_ai AFTER INSERT ON posts BEGIN
+               INSERT OR IGNORE INTO post_stats (post_id) VALUES (NEW.id);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS post_stats_posts_ad AFTER DELETE ON posts BEGIN
+               DELETE FROM post_stats WHERE post_id = OLD.id;
+           END""",
+        f"""CREATE TRIGGER IF NOT EXISTS post_stats_likes_ai AFTER INSERT ON post_likes BEGIN
+               INSERT INTO post_stats (post_id, like_count, recent_like_count)
+               VALUES (NEW.post_id, 1, NEW.liked_at >= datetime('now', '{RECENT_LIKES_WINDOW}'))
+               ON CONFLICT(post_id) DO UPDATE SET
+                   like_count = like_count + 1,
+                   recent_like_count = recent_like_count + excluded.recent_like_count;
+           END""",
+        f"""CREATE TRIGGER IF NOT EXISTS post_stats_likes_ad AFTER DELETE ON post_likes BEGIN
+               UPDATE post_stats SET
+                   like_count = MAX(like_count - 1, 0),
+                   recent_like_count = MAX(recent_like_count - (OLD.liked_at >= datetime('now', '{RECENT_LIKES_WINDOW}')), 0)
+               WHERE post_id = OLD.post_id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS post_stats_views_ai AFTER INSERT ON views BEGIN
+               INSERT INTO post_stats (post_id, view_count) VALUES (NEW.post_id, 1)
+               ON CONFLICT(post_id) DO UPDATE SET view_count = view_count + 1;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS post_stats_views_ad AFTER DELETE ON views BEGIN
+               UPDATE post_stats SET view_count = MAX(view_count - 1, 0) WHERE post_id = OLD.post_id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS post_stats_fire_ai AFTER INSERT ON fire BEGIN
+               INSERT INTO post_stats (post_id, fire_count) VALUES (NEW.post_id, NEW.fire_count)
+               ON CONFLICT(post_id) DO UPDATE SET fire_count = excluded.fire_count;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS post_stats_fire_au AFTER UPDATE OF fire_count ON fire BEGIN
+               UPDATE post_stats SET fire_count = NEW.fire_count WHERE post_id = NEW.post_id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS post_stats_fire_ad AFTER DELETE ON fire BEGIN
+               UPDATE post_stats SET fire_count = 0 WHERE post_id = OLD.post_id;
+           END""",
+    ):
+        conn.execute(trigger)
+
+    conn.execute(POST_STATS_RECONCILE_SQL)
+
+
+@migration(7, "feed ordering indexes")
+def _feed_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_labelled_published ON posts(labelled, published_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_publisher_published ON posts(publisher_id, published_at)")
+
+
+def epoch_sql(expr):
+    """SQL expression converting an ISO-8601 timestamp (any offset, naive = UTC) to epoch seconds."""
+    return f"CAST(strftime('%s', {expr}) AS INTEGER)"
+
+
+@migration(8, "epoch timestamp shadow columns")
+def _epoch_columns(conn):
+    post_cols = table_columns(conn, "posts")
+    for col in ("published_ts", "modified_ts", "created_ts"):
+        if col not in post_cols:
+            conn.execute(f"ALTER TABLE posts ADD COLUMN {col} INTEGER")
+    if "maturity_ts" not in table_columns(conn, "notifications"):
+        conn.execute("ALTER TABLE notifications ADD COLUMN maturity_ts INTEGER")
+
+    conn.execute(f"""
+        UPDATE posts SET
+            published_ts = {epoch_sql('published_at')},
+            modified_ts = {epoch_sql('COALESCE(modified_at, published_at)')},
+            created_ts = {epoch_sql('COALESCE(created_at, published_at)')}
+    """)
+    conn.execute(f"UPDATE notifications SET maturity_ts = {epoch_sql('maturity_date')}")
+
+    # Superseded by the numeric equivalents below
+    conn.execute("DROP INDEX IF EXISTS idx_posts_labelled_published")
+    conn.execute("DROP INDEX IF EXISTS idx_posts_publisher_published")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_labelled_published_ts ON posts(labelled, published_ts, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_publisher_published_ts ON posts(publisher_id, published_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_created_ts ON posts(created_ts, id)")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_posts_notify
+                    ON posts(publisher_id, topic, labelled, modified_ts)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_maturity ON notifications(deleted, maturity_ts)")
+
+
+@migration(9, "unique notifications per email and post")
+def _notifications_unique(conn):
+    conn.execute("""
+        DELETE FROM notifications
+        WHERE id NOT IN (SELECT MIN(id) FROM notifications GROUP BY email, post_url)
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_email_url ON notifications(email, post_url)")
+
+
+@migration(10, "notification outbox state")
+def _notification_outbox(conn):
+    cols = table_columns(conn, "notifications")
+    for col, ddl in (
+        ("status", "TEXT NOT NULL DEFAULT 'pending'"),   # pending -> sending -> sent | failed
+        ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+        ("next_retry_at", "INTEGER"),                    # epoch; NULL once retries are exhausted
+        ("claimed_ts", "INTEGER"),                       # epoch the current send was claimed
+        ("digest_key", "TEXT"),                          # idempotency key shared by one digest's rows
+    ):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE notifications ADD COLUMN {col} {ddl}")
+    conn.execute("UPDATE notifications SET status = 'sent' WHERE deleted = 1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_outbox ON notifications(status, maturity_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_digest ON notifications(digest_key)")
+
+
+@migration(11, "posts.guid for feed entry dedup")
+def _post_guid(conn):
+    if "guid" not in table_columns(conn, "posts"):
+        conn.execute("ALTER TABLE posts ADD COLUMN guid TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_guid ON posts(guid) WHERE guid IS NOT NULL")
+
+
+@migration(12, "posts.vector_seq change counter for embedding consumers")
+def _post_vector_seq(conn):
+    if "vector_seq" not in table_columns(conn, "posts"):
+        conn.execute("ALTER TABLE posts ADD COLUMN vector_seq INTEGER")
+    conn.execute("UPDATE posts SET vector_seq = id")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_vector_seq ON posts(vector_seq)")
+    # Every insert and every change to a post's embedding or label takes the next
+    # sequence number, so in-memory vector indexes can catch up with "> last seen".
+    for trigger in (
+        """CREATE TRIGGER IF NOT EXISTS posts_vector_seq_ai AFTER INSERT ON posts BEGIN
+               UPDATE posts SET vector_seq = (SELECT COALESCE(MAX(vector_seq), 0) + 1 FROM posts)
+               WHERE id = NEW.id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS posts_vector_seq_au AFTER UPDATE OF embedding, labelled ON posts BEGIN
+               UPDATE posts SET vector_seq = (SELECT COALESCE(MAX(vector_seq), 0) + 1 FROM posts)
+               WHERE id = NEW.id;
+           END""",
+    ):
+        conn.execute(trigger)
+
+
+@migration(13, "convert stored embeddings to EMBEDDING_FORMAT", batched=True)
+def _convert_embeddings(conn):
+    # No-op with the default float32 format; backfill_embeddings.py --convert
+    # repeats the conversion after a later format change.
+    convert_embeddings(conn, EMBEDDING_FORMAT)
+
+
+@migration(14, "article_content shared extraction cache")
+def _article_content(conn):
+    # Extracted article HTML/text, zlib-compressed, shared by every worker and
+    # feature (reader, TTS, chat); see article_store.py
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS article_content (
+        post_id       INTEGER PRIMARY KEY,
+        html          BLOB    NOT NULL,
+        text          BLOB    NOT NULL,
+        content_hash  TEXT    NOT NULL,
+        source        TEXT    NOT NULL,
+        etag          TEXT,
+        last_modified TEXT,
+        fetched_at    INTEGER NOT NULL,
+        FOREIGN KEY (post_id) REFERENCES posts(id)
+    )
+    """)
+
+
+@migration(15, "post_likes liked_at index for the trending window")
+def _post_likes_liked_at_index(conn):
+    # Trending counts likes inside RECENT_LIKES_WINDOW at read time
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_post_likes_liked_at ON post_likes(liked_at, post_id)")
+
+
+@migration(16, "posts.embedding_version")
+def _embedding_version(conn):
+    # Version of the text a stored embedding was encoded from (classifier.EMBEDDING_TEXT_VERSION);
+    # NULL for rows encoded from the original "{title} {tags}" text. The scrape job re-encodes
+    # anything older than the current version.
+    if "embedding_version" not in table_columns(conn, "posts"):
+        conn.execute("ALTER TABLE posts ADD COLUMN embedding_version INTEGER")
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+
+def current_version(conn):
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0  # no schema_version table yet
+    return row[0] or 0
+
+
+def migrate(db_path):
+    """Apply all pending migrations. Returns the list of versions applied."""
+    conn = open_connection(db_path, isolation_level=None)
+    try:
+        if current_version(conn) >= latest_version():
+            return []
+
+        # Serialize concurrent boots (several gunicorn workers, cron jobs) so only
+        # one process runs the migrations; the others wait and then see them applied.
+        with open(db_path + ".migrate.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return _apply_pending(conn)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        conn.close()
+
+
+def _apply_pending(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    applied = []
+    for m in MIGRATIONS:
+        if m["version"] <= current_version(conn):
+            continue
+        start = time.perf_counter()
+        try:
+            if m["batched"]:
+                m["fn"](conn)
+                _begin(conn)
+            else:
+                _begin(conn)
+                m["fn"](conn)
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (m["version"], m["name"]))
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.exception(f"Migration {m['version']} ({m['name']}) failed")
+            raise
+        applied.append(m["version"])
+        logger.info(f"Migration {m['version']} applied: {m['name']} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+    return applied
@@ -0,0 +1,191 @@
+# db/pool.py
+import os
+import sqlite3
+import time
+from queue import LifoQueue, Empty
+from threading import Lock
+from logger_config import get_logger
+
+logger = get_logger("DATABASE")
+
+POOL_READERS = int(os.getenv("SQLITE_POOL_READERS", 4))
+POOL_WRITERS = int(os.getenv("SQLITE_POOL_WRITERS", 1))
+POOL_TIMEOUT = float(os.getenv("SQLITE_POOL_TIMEOUT", 10))
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+BUSY_RETRIES = int(os.getenv("SQLITE_BUSY_RETRIES", 5))
+
+# Applied to every connection we hand out. journal_mode=WAL is persistent in
+# the file, but setting it again is a cheap no-op.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA mmap_size=268435456",   # 256 MB
+    "PRAGMA cache_size=-16000",     # 16 MB
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+def is_busy_error(exc):
+    msg = str(exc).lower()
+    return isinstance(exc, sqlite3.OperationalError) and ("locked" in msg or "busy" in msg)
+
+
+def retry_on_busy(fn, *args, retries=BUSY_RETRIES, backoff=0.05, on_retry=None, **kwargs):
+    """
+    Call fn(*args, **kwargs), retrying with exponential backoff when SQLite
+    reports the database as locked/busy past busy_timeout.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt == retries:
+                raise
+            if on_retry:
+                on_retry()
+            delay = backoff * (2 ** attempt)
+            logger.warning(f"SQLite busy ({e}), retry {attempt + 1}/{retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+def open_connection(db_path, readonly=False, isolation_level=""):
+    """Open a single SQLite connection tuned for WAL mode."""
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=isolation_level)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        retry_on_busy(conn.execute, pragma)
+    if readonly:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Per-process pool of SQLite connections.
+
+    Readers are query_only connections that never take the write lock, so in WAL
+    mode they are not blocked by writers. Writers open their transaction with
+    BEGIN IMMEDIATE so lock contention surfaces (and is retried) up front rather
+    than as a failed read->write upgrade halfway through a request.
+    """
+
+    def __init__(self, db_path, readers=POOL_READERS, writers=POOL_WRITERS, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._limits = {"reader": readers, "writer": writers}
+        self._idle = {"reader": LifoQueue(), "writer": LifoQueue()}
+        self._created = {"reader": 0, "writer": 0}
+        self._lock = Lock()
+        self._pid = os.getpid()
+        self._stats = {
+            "acquired": 0,
+            "waited": 0,
+            "wait_time_ms": 0.0,
+            "timeouts": 0,
+            "busy_retries": 0,
+            "discarded": 0,
+        }
+
+    def _reset_after_fork(self):
+        # Connections must never cross a fork; the child starts with an empty pool.
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._pid = os.getpid()
+                    self._idle = {"reader": LifoQueue(), "writer": LifoQueue()}
+                    self._created = {"reader": 0, "writer": 0}
+
+    def _new_connection(self, kind):
+        if kind == "reader":
+            return open_connection(self.db_path, readonly=True)
+        return open_connection(self.db_path, isolation_level="IMMEDIATE")
+
+    def acquire(self, kind="reader"):
+        self._reset_after_fork()
+        idle = self._idle[kind]
+        try:
+            conn = idle.get_nowait()
+        except Empty:
+            conn = None
+            with self._lock:
+                if self._created[kind] < self._limits[kind]:
+                    self._created[kind] += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._new_connection(kind)
+                except Exception:
+                    with self._lock:
+                        self._created[kind] -= 1
+                    raise
+            else:
+                start = time.perf_counter()
+                try:
+                    conn = idle.get(timeout=self.timeout)
+                except Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(f"No {kind} connection available after {self.timeout}s")
+                with self._lock:
+                    self._stats["waited"] += 1
+                    self._stats["wait_time_ms"] += (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats["acquired"] += 1
+        return conn
+
+    def release(self, conn, kind="reader"):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken connection: drop it and let the next acquire open a fresh one.
+            self._discard(conn, kind)
+            return
+        if os.getpid() != self._pid:
+            conn.close()
+            return
+        self._idle[kind].put(conn)
+
+    def _discard(self, conn, kind):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created[kind] -= 1
+            self._stats["discarded"] += 1
+
+    def begin_immediate(self, conn):
+        def _on_retry():
+            with self._lock:
+                self._stats["busy_retries"] += 1
+        retry_on_busy(conn.execute, "BEGIN IMMEDIATE", on_retry=_on_retry)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            for kind in ("reader", "writer"):
+                stats[f"{kind}s_open"] = self._created[kind]
+                stats[f"{kind}s_idle"] = self._idle[kind].qsize()
+                stats[f"{kind}s_max"] = self._limits[kind]
+            stats["wait_time_ms"] = round(stats["wait_time_ms"], 2)
+            stats["pid"] = self._pid
+        return stats
+
+    def close(self):
+        for kind, idle in self._idle.items():
+            while True:
+                try:
+                    conn = idle.get_nowait()
+                except Empty:
+                    break
+                conn.close()
+                with self._lock:
+                    self._created[kind] -= 1
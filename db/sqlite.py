@@ -1,229 +1,76 @@
 # db/sqlite.py
 import sqlite3
 import json
+import base64
+import hashlib
+import os
+import time
+import zlib
+from contextlib import contextmanager
 from threading import Lock
 from logger_config import get_logger
+from db.pool import ConnectionPool, open_connection
+from db.migrations import migrate, epoch_sql, POST_STATS_RECONCILE_SQL, RECENT_LIKES_WINDOW
 
 logger = get_logger("DATABASE")
 
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", 1800))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", 300))
+
 class SQLiteDatabase:
     _instance = None
     _lock = Lock()
 
     def __init__(self, db_path):
         self.db_path = db_path
-        conn = self.get_connection()
-        c = conn.cursor()
-        
-        # Ensure tables
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS notifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT NOT NULL,
-            heading TEXT NOT NULL,
-            post_url TEXT NOT NULL,
-            post_title TEXT NOT NULL,
-            style_version INTEGER,
-            deleted BOOL DEFAULT 0,
-            maturity_date DATETIME NOT NULL
-        )
-        """)
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS subscriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT NOT NULL,
-            publisher_id INTEGER NOT NULL,
-            joined_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            topic TEXT NOT NULL CHECK (topic IN ('Software Engineering', 'Frontend Engineering', 'Backend Engineering', 'Mobile Engineering', 'Platform & Infrastructure', 'Data Engineering', 'Data Science', 'Machine Learning & AI', 'Data Analytics', 'Security Engineering', 'QA & Testing', 'Product Management')),
-            frequency_in_days INTEGER DEFAULT 3,
-            last_notified_at DATETIME DEFAULT NULL,
-            active BOOL DEFAULT 1,
-            FOREIGN KEY (publisher_id) REFERENCES publishers(id),
-            UNIQUE (email, publisher_id, topic)
-        )
-        """)
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS publishers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            publisher_name TEXT NOT NULL,
-            publisher_type TEXT NOT NULL CHECK (publisher_type IN ('techteam', 'individual', 'community')),
-            last_scraped_at DATETIME DEFAULT NULL,
-            UNIQUE (publisher_name)
-        )
-        """)
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS posts(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            publisher_id INTEGER NOT NULL,
-            url TEXT NOT NULL,
-            title TEXT NOT NULL,
-            tags TEXT,
-            published_at DATETIME NOT NULL,
-            modified_at DATETIME NOT NULL,
-            labelled BOOL DEFAULT 0,
-            topic TEXT NOT NULL CHECK (topic IN ('Software Engineering', 'Frontend Engineering', 'Backend Engineering', 'Mobile Engineering', 'Platform & Infrastructure', 'Data Engineering', 'Data Science', 'Machine Learning & AI', 'Data Analytics', 'Security Engineering', 'QA & Testing', 'Product Management', 'General')),
-            FOREIGN KEY (publisher_id) REFERENCES publishers(id),
-            UNIQUE (url)
-        )
-        """)
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS post_likes (
-            post_id INTEGER NOT NULL,
-            user_email TEXT NOT NULL,
-            liked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            PRIMARY KEY (post_id, user_email),
-            FOREIGN KEY (post_id) REFERENCES posts(id)
-        )
-        """)
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS fire (
-            post_id INTEGER PRIMARY KEY,
-            fire_count INTEGER NOT NULL DEFAULT 0,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (post_id) REFERENCES posts(id)
-        )
-        """)
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS views (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            post_id INTEGER NOT NULL,
-            user_identifier TEXT NOT NULL,
-            device_id TEXT NOT NULL,
-            viewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE (post_id, user_identifier, device_id),
-            FOREIGN KEY (post_id) REFERENCES posts(id)
-        )
-        """)
+        self._pool = ConnectionPool(db_path)
+        applied = migrate(db_path)
+        if applied:
+            logger.info(f"Applied schema migrations: {applied}")
+        logger.info(f"SQLite database initialized Successfully")
 
-        # Migration: rename jira_account_id to user_email in post_likes
-        try:
-            c.execute("ALTER TABLE post_likes RENAME COLUMN jira_account_id TO user_email")
-            logger.info("Migration: renamed jira_account_id to user_email in post_likes")
-        except Exception:
-            pass  # column already renamed or doesn't exist
+    def get_connection(self):
+        """
+        Returns a new, unpooled SQLite connection (WAL-tuned).
+        Meant for long-running jobs and scripts; caller is responsible for closing it.
+        Request handlers should borrow from the pool via reader() / writer().
+        """
+        conn = open_connection(self.db_path)
+        logger.debug("New SQLite connection created")
+        return conn
 
-        # Migration: add embedding column if it doesn't exist yet
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only pooled connection. Never blocks on writers in WAL mode."""
+        conn = self._pool.acquire("reader")
         try:
-            c.execute("ALTER TABLE posts ADD COLUMN embedding BLOB")
-            logger.info("Migration: added embedding column to posts")
-        except Exception:
-            pass  # column already exists
+            yield conn
+        finally:
+            self._pool.release(conn, "reader")
 
-        # Migration: add created_at column, backfill existing rows from published_at
+    @contextmanager
+    def writer(self):
+        """
+        Borrow the pooled writer connection inside a BEGIN IMMEDIATE transaction.
+        Commits on success, rolls back if the block raises.
+        """
+        conn = self._pool.acquire("writer")
         try:
-            c.execute("ALTER TABLE posts ADD COLUMN created_at DATETIME")
-            c.execute("UPDATE posts SET created_at = published_at WHERE created_at IS NULL")
-            logger.info("Migration: added created_at column to posts")
+            self._pool.begin_immediate(conn)
+            yield conn
+            conn.commit()
         except Exception:
-            pass  # column already exists
-
-        # Migration: expand topic CHECK constraints to new detailed categories
-        try:
-            c.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='posts'")
-            row = c.fetchone()
-            if row and 'Frontend Engineering' not in row[0]:
-                new_post_topics = ("'Software Engineering', 'Frontend Engineering', 'Backend Engineering', "
-                                   "'Mobile Engineering', 'Platform & Infrastructure', 'Data Engineering', "
-                                   "'Data Science', 'Machine Learning & AI', 'Data Analytics', "
-                                   "'Security Engineering', 'QA & Testing', 'Product Management', 'General'")
-                new_sub_topics = ("'Software Engineering', 'Frontend Engineering', 'Backend Engineering', "
-                                  "'Mobile Engineering', 'Platform & Infrastructure', 'Data Engineering', "
-                                  "'Data Science', 'Machine Learning & AI', 'Data Analytics', "
-                                  "'Security Engineering', 'QA & Testing', 'Product Management'")
-
-                # Rename old Software Testing → QA & Testing
-                c.execute("UPDATE posts SET topic = 'QA & Testing' WHERE topic = 'Software Testing'")
-                c.execute("UPDATE subscriptions SET topic = 'QA & Testing' WHERE topic = 'Software Testing'")
-
-                # Rebuild posts table with new constraint
-                c.execute(f"""CREATE TABLE posts_new (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    publisher_id INTEGER NOT NULL,
-                    url TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    tags TEXT,
-                    published_at DATETIME NOT NULL,
-                    modified_at DATETIME NOT NULL,
-                    labelled BOOL DEFAULT 0,
-                    topic TEXT NOT NULL CHECK (topic IN ({new_post_topics})),
-                    embedding BLOB,
-                    FOREIGN KEY (publisher_id) REFERENCES publishers(id),
-                    UNIQUE (url)
-                )""")
-                c.execute("INSERT INTO posts_new SELECT id, publisher_id, url, title, tags, published_at, modified_at, labelled, topic, embedding FROM posts")
-                c.execute("DROP TABLE posts")
-                c.execute("ALTER TABLE posts_new RENAME TO posts")
-
-                # Rebuild subscriptions table with new constraint
-                c.execute(f"""CREATE TABLE subscriptions_new (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    email TEXT NOT NULL,
-                    publisher_id INTEGER NOT NULL,
-                    joined_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    topic TEXT NOT NULL CHECK (topic IN ({new_sub_topics})),
-                    frequency_in_days INTEGER DEFAULT 3,
-                    last_notified_at DATETIME DEFAULT NULL,
-                    active BOOL DEFAULT 1,
-                    FOREIGN KEY (publisher_id) REFERENCES publishers(id),
-                    UNIQUE (email, publisher_id, topic)
-                )""")
-                c.execute("INSERT INTO subscriptions_new SELECT * FROM subscriptions")
-                c.execute("DROP TABLE subscriptions")
-                c.execute("ALTER TABLE subscriptions_new RENAME TO subscriptions")
-
-                logger.info("Migration: expanded topic categories and rebuilt posts/subscriptions tables")
-        except Exception as e:
-            logger.warning(f"Topic category migration failed: {e}")
-
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS reading_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            post_id INTEGER NOT NULL,
-            user_email TEXT,
-            device_id TEXT NOT NULL,
-            time_spent INTEGER NOT NULL DEFAULT 0,
-            max_depth INTEGER NOT NULL DEFAULT 0,
-            opened_original BOOLEAN NOT NULL DEFAULT 0,
-            last_read_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE (post_id, device_id),
-            FOREIGN KEY (post_id) REFERENCES posts(id)
-        )
-        """)
-
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS job_runs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            job_id TEXT NOT NULL UNIQUE,
-            job_name TEXT NOT NULL,
-            status TEXT NOT NULL,
-            logs TEXT NOT NULL DEFAULT '[]',
-            started_at DATETIME NOT NULL,
-            finished_at DATETIME DEFAULT NULL
-        )
-        """)
+            conn.rollback()
+            raise
+        finally:
+            self._pool.release(conn, "writer")
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS tts_cache (
-                post_id    INTEGER PRIMARY KEY,
-                audio_file TEXT    NOT NULL,
-                timings    TEXT    NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    def pool_stats(self):
+        return self._pool.stats()
 
-        logger.info(f"SQLite database initialized Successfully")
-        conn.commit()
-        conn.close()
-
-    def get_connection(self):
-        """
-        Always returns a new SQLite connection.
-        Caller is responsible for closing it after use.
-        """
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        logger.info("New SQLite connection created")
-        return conn
+    def close(self):
+        self._pool.close()
     
     def save_job_run(self, conn, job_id, job_name, status, logs, started_at, finished_at):
         import json
@@ -402,13 +249,20 @@ class SQLiteDatabase:
             WHERE id = ?
         """, (id,))
             
-    def get_active_notifications(self, conn):
+    def get_active_notifications(self, conn, matured_only=False):
         c = conn.cursor()
-        c.execute("""
-            SELECT *
-            FROM notifications
-            WHERE deleted = 0
-        """)
+        if matured_only:
+            c.execute(f"""
+                SELECT *
+                FROM notifications
+                WHERE deleted = 0 AND maturity_ts <= {epoch_sql("'now'")}
+            """)
+        else:
+            c.execute("""
+                SELECT *
+                FROM notifications
+                WHERE deleted = 0
+            """)
         rows = c.fetchall()
         return [dict(row) for row in rows]
     
@@ -435,20 +289,151 @@ class SQLiteDatabase:
 
     def add_notification(self, conn, email, heading, style_version, post_url, post_title, maturity_date):
         logger.info(f"Adding notification: {email}, type: {post_title}")
-        
-        notf = self.get_notifications_by_email_and_url(conn, email, post_url)
-        
-        if not notf:
-            c = conn.cursor()
-            c.execute("""
-                INSERT INTO notifications (email, heading, style_version, post_url, post_title, maturity_date)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (email, heading, style_version, post_url, post_title, maturity_date))
+        c = conn.cursor()
+        c.execute(f"""
+            INSERT OR IGNORE INTO notifications (email, heading, style_version, post_url, post_title, maturity_date, maturity_ts)
+            VALUES (?, ?, ?, ?, ?, ?, {epoch_sql('?')})
+        """, (email, heading, style_version, post_url, post_title, maturity_date, maturity_date))
+        if c.rowcount:
             logger.info("notification added successfully!")
         else:
             logger.info("notification already existed!")
 
+    # subscriptions x labelled posts modified since the subscriber's watermark.
+    # Maturity is the watermark pushed out by the subscriber's frequency.
+    FAN_OUT_SELECT = f"""
+        SELECT lower(s.email),
+               p.publisher_name || ' ,' || po.topic,
+               'v1',
+               po.url,
+               po.title,
+               strftime('%Y-%m-%dT%H:%M:%S', COALESCE(s.last_notified_at, s.joined_time),
+                        '+' || s.frequency_in_days || ' days'),
+               {epoch_sql("COALESCE(s.last_notified_at, s.joined_time), '+' || s.frequency_in_days || ' days'")}
+        FROM subscriptions s
+        JOIN publishers p ON p.id = s.publisher_id
+        JOIN posts po ON po.publisher_id = s.publisher_id
+                     AND po.topic = s.topic
+                     AND po.labelled = 1
+                     AND po.modified_ts >= {epoch_sql('COALESCE(s.last_notified_at, s.joined_time)')}
+        WHERE s.active = 1
+    """
+
+    def fan_out_notifications(self, conn):
+        """
+        Queue a notification for every (active subscription, matching post) pair in a
+        single INSERT ... SELECT. Pairs already queued or sent are skipped by the
+        unique (email, post_url) index. Returns per-run counts; caller commits.
+        """
+        c = conn.cursor()
+        subscriptions = c.execute("SELECT COUNT(*) FROM subscriptions WHERE active = 1").fetchone()[0]
+        candidates = c.execute(f"SELECT COUNT(*) FROM ({self.FAN_OUT_SELECT})").fetchone()[0]
+        c.execute(f"""
+            INSERT OR IGNORE INTO notifications
+                (email, heading, style_version, post_url, post_title, maturity_date, maturity_ts)
+            {self.FAN_OUT_SELECT}
+        """)
+        inserted = c.rowcount
+        return {
+            "subscriptions": subscriptions,
+            "candidates": candidates,
+            "inserted": inserted,
+            "duplicates": candidates - inserted,
+        }
+
     
+    def claim_digests(self, conn, target_email=None, lease_seconds=OUTBOX_LEASE_SECONDS,
+                      max_attempts=OUTBOX_MAX_ATTEMPTS):
+        """
+        Move every sendable notification to 'sending' in one transaction and return them.
+
+        Sendable: matured and pending, failed with a retry now due, or stuck in
+        'sending' past the lease (a crashed run). Stale claims that have used up
+        max_attempts are marked failed for good instead, so a digest that kills
+        every run does not come back each lease period. Each recipient's rows
+        share a digest_key derived from the email and notification ids, so a
+        digest re-sent after a crash carries the same idempotency key.
+        """
+        now = int(time.time())
+        query = """
+            SELECT * FROM notifications
+            WHERE deleted = 0 AND maturity_ts <= ?
+              AND (status = 'pending'
+                   OR (status = 'failed' AND attempts < ? AND next_retry_at <= ?)
+                   OR (status = 'sending' AND attempts < ? AND claimed_ts <= ?))
+        """
+        params = [now, max_attempts, now, max_attempts, now - lease_seconds]
+        if target_email:
+            query += " AND lower(email) = lower(?)"
+            params.append(target_email)
+
+        if conn.in_transaction:
+            conn.commit()
+        self._pool.begin_immediate(conn)
+        try:
+            exhausted = conn.execute("""
+                UPDATE notifications SET status = 'failed', next_retry_at = NULL
+                WHERE deleted = 0 AND status = 'sending' AND attempts >= ? AND claimed_ts <= ?
+            """, (max_attempts, now - lease_seconds)).rowcount
+            if exhausted:
+                logger.warning(f"Gave up on {exhausted} notifications stuck in sending after {max_attempts} attempts")
+            rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+            by_email = {}
+            for row in rows:
+                by_email.setdefault(row["email"], []).append(row)
+            updates = []
+            for email, group in by_email.items():
+                ids = ",".join(str(i) for i in sorted(row["id"] for row in group))
+                digest_key = hashlib.sha256(f"{email}|{ids}".encode()).hexdigest()[:32]
+                for row in group:
+                    row["digest_key"] = digest_key
+                    row["status"] = "sending"
+                    row["attempts"] += 1
+                    updates.append((digest_key, now, row["id"]))
+            conn.executemany("""
+                UPDATE notifications
+                SET status = 'sending', digest_key = ?, claimed_ts = ?, attempts = attempts + 1
+                WHERE id = ?
+            """, updates)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"Claimed {len(rows)} notifications in {len(by_email)} digests")
+        return rows
+
+    def complete_digests(self, conn, sent=(), failed=(), released=(), retry_base_seconds=OUTBOX_RETRY_BASE_SECONDS,
+                         max_attempts=OUTBOX_MAX_ATTEMPTS):
+        """
+        Batched outbox transitions; caller commits.
+        sent: (digest_key, email) pairs, failed / released: digest keys.
+        Released digests (claimed but never attempted) go back to pending.
+        """
+        now = int(time.time())
+        c = conn.cursor()
+        c.executemany("""
+            UPDATE notifications
+            SET status = 'sent', deleted = 1, next_retry_at = NULL
+            WHERE digest_key = ? AND status = 'sending'
+        """, [(key,) for key, _ in sent])
+        c.executemany("""
+            UPDATE subscriptions
+            SET last_notified_at = CURRENT_TIMESTAMP
+            WHERE email = ?
+        """, [(email,) for email in {email for _, email in sent}])
+        c.executemany("""
+            UPDATE notifications
+            SET status = 'failed',
+                next_retry_at = CASE WHEN attempts < ? THEN ? + ? * (1 << (attempts - 1)) END
+            WHERE digest_key = ? AND status = 'sending'
+        """, [(max_attempts, now, retry_base_seconds, key) for key in failed])
+        c.executemany("""
+            UPDATE notifications
+            SET status = 'pending', attempts = attempts - 1, claimed_ts = NULL
+            WHERE digest_key = ? AND status = 'sending'
+        """, [(key,) for key in released])
+        logger.info(f"Outbox: {len(sent)} digests sent, {len(failed)} failed, {len(released)} released")
+
     def delete_notification(self, conn, email, post_url):
         logger.info(f"Deleting notification: {email}, url: {post_url}")
         c = conn.cursor()
@@ -524,17 +509,20 @@ class SQLiteDatabase:
         """, (last_scraped_at, publisher_id))
         logger.info(f"Publisher {publisher_id} updated successfully")
     
-    def add_post(self, conn, post_url, post_title, published_by, tags, published_at, topic):
+    def add_post(self, conn, post_url, post_title, published_by, tags, published_at, topic, guid=None):
         logger.info(f"Adding post: {post_title}, published_by: {published_by}")
         c = conn.cursor()
         
         post = self.get_post_by_url(conn, post_url)
         
         if not post:
-            c.execute("""
-                INSERT INTO posts (url, title, publisher_id, topic, tags, published_at, modified_at, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """, (post_url, post_title, published_by, topic, tags, published_at, published_at))
+            c.execute(f"""
+                INSERT INTO posts (url, title, publisher_id, topic, tags, published_at, modified_at, created_at,
+                                   published_ts, modified_ts, created_ts, guid)
+                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP,
+                        {epoch_sql('?')}, {epoch_sql('?')}, {epoch_sql("'now'")}, ?)
+            """, (post_url, post_title, published_by, topic, tags, published_at, published_at,
+                  published_at, published_at, guid))
             logger.info(f"post {post_title} added successfully!")
             return c.lastrowid
         else:
@@ -542,9 +530,21 @@ class SQLiteDatabase:
             return post['id']
 
     
-    def save_post_embedding(self, conn, post_id, embedding_bytes):
+    def save_post_embedding(self, conn, post_id, embedding_bytes, version=None):
+        """version: EMBEDDING_TEXT_VERSION of the text the vector was encoded from."""
         c = conn.cursor()
-        c.execute("UPDATE posts SET embedding = ? WHERE id = ?", (embedding_bytes, post_id))
+        c.execute("UPDATE posts SET embedding = ?, embedding_version = ? WHERE id = ?",
+                  (embedding_bytes, version, post_id))
+
+    def get_posts_with_stale_embeddings(self, conn, version, limit):
+        """Posts whose stored embedding was encoded from an older post text than `version`."""
+        c = conn.cursor()
+        c.execute("""
+            SELECT id, title, tags FROM posts
+            WHERE embedding IS NOT NULL AND (embedding_version IS NULL OR embedding_version < ?)
+            ORDER BY id LIMIT ?
+        """, (version, limit))
+        return [dict(row) for row in c.fetchall()]
 
     def get_post_by_url(self, conn, url):
         c = conn.cursor()
@@ -556,13 +556,22 @@ class SQLiteDatabase:
         row = c.fetchone()
         return dict(row) if row else None
     
-    def get_labelled_post_by_publisher_and_topic(self,conn, publisher_id, topic):
+    def get_known_post_keys(self, conn):
+        """Every stored post URL and feed GUID, for dedup before any model work."""
+        known = set()
+        for url, guid in conn.execute("SELECT url, guid FROM posts"):
+            known.add(url)
+            if guid:
+                known.add(guid)
+        return known
+
+    def get_labelled_post_by_publisher_and_topic(self,conn, publisher_id, topic, modified_since_ts=0):
         c = conn.cursor()
         c.execute("""
-            SELECT *
+            SELECT id, url, title, tags, topic, published_at, modified_at, modified_ts
             FROM posts
-            WHERE publisher_id = ? AND topic = ? AND labelled=1 
-        """, (publisher_id, topic))
+            WHERE publisher_id = ? AND topic = ? AND labelled=1 AND modified_ts >= ?
+        """, (publisher_id, topic, modified_since_ts))
         rows = c.fetchall()
         return [dict(row) for row in rows]
     
@@ -572,26 +581,167 @@ class SQLiteDatabase:
             SELECT po.id, po.url, po.title, po.tags, po.published_at,
                    po.modified_at, po.created_at, po.labelled, po.topic, po.embedding,
                    p.id AS publisher_id, p.publisher_name, p.publisher_type,
-                   COALESCE(lc.like_count, 0) AS like_count,
-                   COALESCE(f.fire_count, 0) AS fire_count,
-                   COALESCE(vc.view_count, 0) AS view_count
+                   COALESCE(ps.like_count, 0) AS like_count,
+                   COALESCE(ps.fire_count, 0) AS fire_count,
+                   COALESCE(ps.view_count, 0) AS view_count
             FROM posts po
             JOIN publishers p ON po.publisher_id = p.id
-            LEFT JOIN (
-                SELECT post_id, COUNT(*) AS like_count
-                FROM post_likes
-                GROUP BY post_id
-            ) lc ON lc.post_id = po.id
-            LEFT JOIN fire f ON f.post_id = po.id
-            LEFT JOIN (
-                SELECT post_id, COUNT(*) AS view_count
-                FROM views
-                GROUP BY post_id
-            ) vc ON vc.post_id = po.id
+            LEFT JOIN post_stats ps ON ps.post_id = po.id
         """)
         rows = c.fetchall()
         return [dict(row) for row in rows]
 
+    # Columns a feed query may project. The embedding BLOB is only loaded when asked for.
+    FEED_COLUMNS = {
+        "id": "po.id",
+        "url": "po.url",
+        "title": "po.title",
+        "tags": "po.tags",
+        "topic": "po.topic",
+        "published_at": "po.published_at",
+        "modified_at": "po.modified_at",
+        "created_at": "po.created_at",
+        "published_ts": "po.published_ts",
+        "modified_ts": "po.modified_ts",
+        "created_ts": "po.created_ts",
+        "labelled": "po.labelled",
+        "embedding": "po.embedding",
+        "publisher_id": "p.id",
+        "publisher_name": "p.publisher_name",
+        "publisher_type": "p.publisher_type",
+        "like_count": "COALESCE(ps.like_count, 0)",
+        "fire_count": "COALESCE(ps.fire_count, 0)",
+        "view_count": "COALESCE(ps.view_count, 0)",
+    }
+    DEFAULT_FEED_COLUMNS = ("id", "url", "title", "tags", "topic", "published_at", "publisher_name",
+                            "like_count", "fire_count", "view_count")
+    FEED_FILTERS = {
+        "labelled": "po.labelled = ?",
+        "publisher_type": "p.publisher_type = ?",
+        "publisher_id": "po.publisher_id = ?",
+        "topic": "po.topic = ?",
+    }
+    # Newest first; ties broken by id so keyset pagination is stable
+    FEED_ORDERS = {
+        "published": "po.published_ts",
+        "created": "po.created_ts",
+    }
+
+    def get_feed_page(self, conn, filters=None, order="published", cursor=None, limit=30, columns=None):
+        """
+        One page of posts, newest first, with filtering, ordering and LIMIT done in SQL.
+
+        filters: dict with any of labelled, publisher_type, publisher_id, topic
+        order:   "published" or "created"
+        cursor:  opaque string from a previous page's next_cursor (keyset pagination)
+        limit:   page size, or None for everything
+        columns: names from FEED_COLUMNS to project (default excludes embedding)
+
+        Returns (rows, next_cursor); next_cursor is None on the last page.
+        """
+        columns = list(columns or self.DEFAULT_FEED_COLUMNS)
+        unknown = [col for col in columns if col not in self.FEED_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown feed columns: {unknown}")
+        if order not in self.FEED_ORDERS:
+            raise ValueError(f"Unknown feed order: {order}")
+        sort_key = self.FEED_ORDERS[order]
+
+        select = [f"{self.FEED_COLUMNS[col]} AS {col}" for col in columns]
+        select += [f"{sort_key} AS _sort_key", "po.id AS _sort_id"]
+
+        where, params = [], []
+        for key, value in (filters or {}).items():
+            if key not in self.FEED_FILTERS:
+                raise ValueError(f"Unknown feed filter: {key}")
+            where.append(self.FEED_FILTERS[key])
+            params.append(int(value) if isinstance(value, bool) else value)
+        if cursor:
+            sort_value, last_id = self._decode_cursor(cursor)
+            where.append(f"({sort_key}, po.id) < (?, ?)")
+            params += [sort_value, last_id]
+
+        query = f"""
+            SELECT {', '.join(select)}
+            FROM posts po
+            JOIN publishers p ON po.publisher_id = p.id
+            LEFT JOIN post_stats ps ON ps.post_id = po.id
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY {sort_key} DESC, po.id DESC
+        """
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+        next_cursor = None
+        if rows and limit is not None and len(rows) == limit:
+            next_cursor = self._encode_cursor(rows[-1]["_sort_key"], rows[-1]["_sort_id"])
+        for row in rows:
+            del row["_sort_key"], row["_sort_id"]
+        return rows, next_cursor
+
+    def get_feed_items(self, conn, ids, columns=None):
+        """Feed rows for the given post ids, in the order given; unknown ids are skipped."""
+        columns = list(columns or self.DEFAULT_FEED_COLUMNS)
+        unknown = [col for col in columns if col not in self.FEED_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown feed columns: {unknown}")
+        ids = [int(post_id) for post_id in ids]
+        if not ids:
+            return []
+        select = [f"{self.FEED_COLUMNS[col]} AS {col}" for col in columns] + ["po.id AS _item_id"]
+        rows = conn.execute(f"""
+            SELECT {', '.join(select)}
+            FROM posts po
+            JOIN publishers p ON po.publisher_id = p.id
+            LEFT JOIN post_stats ps ON ps.post_id = po.id
+            WHERE po.id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(ids),)).fetchall()
+        by_id = {}
+        for row in rows:
+            row = dict(row)
+            by_id[row.pop("_item_id")] = row
+        return [by_id[post_id] for post_id in ids if post_id in by_id]
+
+    def get_post_vectors_since(self, conn, after_seq=0, with_embedding=True):
+        """
+        (id, labelled, vector_seq[, embedding]) for posts changed after `after_seq`,
+        oldest change first. Feeds incremental rebuilds of vector indexes and stores.
+        """
+        return conn.execute(f"""
+            SELECT id, labelled, vector_seq{', embedding' if with_embedding else ''}
+            FROM posts
+            WHERE vector_seq > ?
+            ORDER BY vector_seq
+        """, (after_seq,)).fetchall()
+
+    def get_post_embeddings(self, conn, post_ids):
+        """{post_id: embedding BLOB} for the given posts that have one."""
+        rows = conn.execute("""
+            SELECT id, embedding FROM posts
+            WHERE id IN (SELECT value FROM json_each(?)) AND embedding IS NOT NULL
+        """, (json.dumps([int(post_id) for post_id in post_ids]),)).fetchall()
+        return {row["id"]: row["embedding"] for row in rows}
+
+    def get_vector_seq(self, conn):
+        """Highest posts.vector_seq, i.e. the latest embedding/label change."""
+        return conn.execute("SELECT COALESCE(MAX(vector_seq), 0) FROM posts").fetchone()[0]
+
+    @staticmethod
+    def _encode_cursor(sort_value, post_id):
+        raw = json.dumps([sort_value, post_id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            sort_value, post_id = json.loads(raw)
+            return sort_value, int(post_id)
+        except Exception:
+            raise ValueError(f"Invalid feed cursor: {cursor!r}")
+
     def get_post_url(self, conn, post_id):
         c = conn.cursor()
         c.execute("SELECT url FROM posts WHERE id = ?", (post_id,))
@@ -612,6 +762,56 @@ class SQLiteDatabase:
             return row["url"], row["publisher_name"]
         return None, None
 
+    def get_article_content(self, conn, post_id):
+        """
+        A post's url, title and publisher_name plus its stored article content
+        (html, text, content_hash, source, etag, last_modified, fetched_at; all
+        None if nothing is stored yet). Returns None if the post does not exist.
+        """
+        row = conn.execute("""
+            SELECT po.url, po.title, pu.publisher_name,
+                   ac.html, ac.text, ac.content_hash, ac.source, ac.etag, ac.last_modified, ac.fetched_at
+            FROM posts po
+            JOIN publishers pu ON po.publisher_id = pu.id
+            LEFT JOIN article_content ac ON ac.post_id = po.id
+            WHERE po.id = ?
+        """, (post_id,)).fetchone()
+        if not row:
+            return None
+        article = dict(row)
+        if article["html"] is not None:
+            article["html"] = zlib.decompress(article["html"]).decode("utf-8")
+            article["text"] = zlib.decompress(article["text"]).decode("utf-8")
+        return article
+
+    def save_article_content(self, conn, post_id, html, text, content_hash, source, etag=None, last_modified=None):
+        """Store (compressed) extracted article content, replacing any earlier copy."""
+        conn.execute("""
+            INSERT OR REPLACE INTO article_content
+                (post_id, html, text, content_hash, source, etag, last_modified, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (post_id, zlib.compress(html.encode("utf-8")), zlib.compress(text.encode("utf-8")),
+              content_hash, source, etag, last_modified, int(time.time())))
+
+    def touch_article_content(self, conn, post_id, etag=None, last_modified=None):
+        """Mark stored content as revalidated now (origin said 304 or content was unchanged)."""
+        conn.execute("""
+            UPDATE article_content
+            SET fetched_at = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+            WHERE post_id = ?
+        """, (int(time.time()), etag, last_modified, post_id))
+
+    def get_posts_missing_article_content(self, conn, created_after_ts, limit):
+        """(id, url) of posts created after `created_after_ts` (epoch) with no stored article content, newest first."""
+        return conn.execute("""
+            SELECT po.id, po.url
+            FROM posts po
+            LEFT JOIN article_content ac ON ac.post_id = po.id
+            WHERE po.created_ts > ? AND ac.post_id IS NULL
+            ORDER BY po.created_ts DESC
+            LIMIT ?
+        """, (created_after_ts, limit)).fetchall()
+
     def get_like_counts_by_urls(self, conn, urls):
         """Returns {url: like_count} for the given list of post URLs."""
         if not urls:
@@ -619,11 +819,10 @@ class SQLiteDatabase:
         placeholders = ','.join('?' * len(urls))
         c = conn.cursor()
         c.execute(f"""
-            SELECT po.url, COALESCE(COUNT(pl.post_id), 0) AS like_count
+            SELECT po.url, COALESCE(ps.like_count, 0) AS like_count
             FROM posts po
-            LEFT JOIN post_likes pl ON pl.post_id = po.id
+            LEFT JOIN post_stats ps ON ps.post_id = po.id
             WHERE po.url IN ({placeholders})
-            GROUP BY po.url
         """, urls)
         return {row['url']: row['like_count'] for row in c.fetchall()}
 
@@ -635,8 +834,7 @@ class SQLiteDatabase:
         )
         conn.commit()
         is_new = c.rowcount == 1
-        c.execute("SELECT COUNT(*) FROM post_likes WHERE post_id = ?", (post_id,))
-        return c.fetchone()[0], is_new
+        return self._get_stat(conn, post_id, "like_count"), is_new
 
     def record_view(self, conn, post_id, user_identifier, device_id):
         c = conn.cursor()
@@ -645,8 +843,26 @@ class SQLiteDatabase:
             (post_id, user_identifier, device_id)
         )
         conn.commit()
-        c.execute("SELECT COUNT(*) FROM views WHERE post_id = ?", (post_id,))
-        return c.fetchone()[0]
+        return self._get_stat(conn, post_id, "view_count")
+
+    def _get_stat(self, conn, post_id, column):
+        """Single post_stats counter, kept current by triggers on the source tables."""
+        row = conn.execute(f"SELECT {column} FROM post_stats WHERE post_id = ?", (post_id,)).fetchone()
+        return row[0] if row else 0
+
+    def reconcile_post_stats(self, conn):
+        """
+        Recompute post_stats from post_likes / views / fire, fixing any drift and
+        decaying recent_like_count. Returns the number of rows corrected.
+        """
+        c = conn.cursor()
+        c.execute(POST_STATS_RECONCILE_SQL)
+        corrected = c.rowcount
+        c.execute("DELETE FROM post_stats WHERE post_id NOT IN (SELECT id FROM posts)")
+        corrected += c.rowcount
+        conn.commit()
+        logger.info(f"post_stats reconciled, {corrected} rows corrected")
+        return corrected
 
     def set_fire_count(self, conn, post_id, fire_count):
         c = conn.cursor()
@@ -658,23 +874,26 @@ class SQLiteDatabase:
         conn.commit()
 
     def get_most_liked_this_month(self, conn, limit=5):
+        # Likes in the window are counted live (idx_post_likes_liked_at); the
+        # all-time counters come from post_stats
         c = conn.cursor()
-        c.execute("""
+        c.execute(f"""
+            WITH recent AS (
+                SELECT post_id, COUNT(*) AS recent_like_count
+                FROM post_likes
+                WHERE liked_at >= datetime('now', '{RECENT_LIKES_WINDOW}')
+                GROUP BY post_id
+            )
             SELECT po.id, po.url, po.title, po.tags, po.published_at,
                    po.modified_at, po.labelled, po.topic,
                    p.id AS publisher_id, p.publisher_name, p.publisher_type,
-                   COUNT(pl.user_email) AS recent_like_count,
-                   (SELECT COUNT(*) FROM post_likes WHERE post_id = po.id) AS like_count,
-                   COALESCE(f.fire_count, 0) AS fire_count,
-                   (SELECT COUNT(*) FROM views WHERE post_id = po.id) AS view_count,
-                   (COUNT(pl.user_email) * 2 + (SELECT COUNT(*) FROM views WHERE post_id = po.id)) AS trending_score
-            FROM post_likes pl
-            JOIN posts po ON pl.post_id = po.id
+                   r.recent_like_count, ps.like_count, ps.fire_count, ps.view_count,
+                   (r.recent_like_count * 2 + ps.view_count) AS trending_score
+            FROM recent r
+            JOIN posts po ON r.post_id = po.id
+            JOIN post_stats ps ON ps.post_id = po.id
             JOIN publishers p ON po.publisher_id = p.id
-            LEFT JOIN fire f ON f.post_id = po.id
-            WHERE pl.liked_at >= datetime('now', '-15 days')
-              AND po.labelled = 1
-            GROUP BY po.id
+            WHERE po.labelled = 1
             ORDER BY trending_score DESC
             LIMIT ?
         """, (limit,))
@@ -684,28 +903,18 @@ class SQLiteDatabase:
     
     def get_recommended_by_fire(self, conn, limit=15):
         c = conn.cursor()
-        c.execute("""
+        c.execute(f"""
             SELECT po.id, po.url, po.title, po.tags, po.published_at,
                    po.modified_at, po.labelled, po.topic,
                    p.id AS publisher_id, p.publisher_name, p.publisher_type,
-                   COALESCE(lc.like_count, 0) AS like_count,
-                   COALESCE(f.fire_count, 0) AS fire_count,
-                   COALESCE(vc.view_count, 0) AS view_count
-            FROM posts po
+                   ps.like_count, ps.fire_count, ps.view_count
+            FROM post_stats ps
+            JOIN posts po ON ps.post_id = po.id
             JOIN publishers p ON po.publisher_id = p.id
-            JOIN fire f ON f.post_id = po.id
-            LEFT JOIN (
-                SELECT post_id, COUNT(*) AS like_count
-                FROM post_likes GROUP BY post_id
-            ) lc ON lc.post_id = po.id
-            LEFT JOIN (
-                SELECT post_id, COUNT(*) AS view_count
-                FROM views GROUP BY post_id
-            ) vc ON vc.post_id = po.id
-            WHERE po.labelled = 1
-              AND f.fire_count > 0
-              AND po.published_at >= datetime('now', '-3 months')
-            ORDER BY f.fire_count DESC
+            WHERE ps.fire_count > 0
+              AND po.labelled = 1
+              AND po.published_ts >= {epoch_sql("'now', '-3 months'")}
+            ORDER BY ps.fire_count DESC
             LIMIT ?
         """, (limit,))
         rows = c.fetchall()
@@ -717,16 +926,13 @@ class SQLiteDatabase:
             SELECT po.id, po.url, po.title, po.tags, po.published_at,
                    po.modified_at, po.labelled, po.topic,
                    p.id AS publisher_id, p.publisher_name, p.publisher_type,
-                   COUNT(pl.user_email) AS like_count,
-                   COALESCE(f.fire_count, 0) AS fire_count,
-                   (SELECT COUNT(*) FROM views WHERE post_id = po.id) AS view_count
-            FROM post_likes pl
-            JOIN posts po ON pl.post_id = po.id
+                   ps.like_count, ps.fire_count, ps.view_count
+            FROM post_stats ps
+            JOIN posts po ON ps.post_id = po.id
             JOIN publishers p ON po.publisher_id = p.id
-            LEFT JOIN fire f ON f.post_id = po.id
-            WHERE po.labelled = 1
-            GROUP BY po.id
-            ORDER BY like_count DESC
+            WHERE ps.like_count > 0
+              AND po.labelled = 1
+            ORDER BY ps.like_count DESC
             LIMIT ?
         """, (limit,))
         rows = c.fetchall()
@@ -745,11 +951,12 @@ class SQLiteDatabase:
     def update_post_label(self, conn, post_id, label, tags=None):
         logger.info(f"Updating post: {post_id}, with label: {label}, tags: {tags}")
         c = conn.cursor()
-        c.execute("""
+        c.execute(f"""
             UPDATE posts
             SET topic = ?,
                 tags = ?,
                 modified_at = CURRENT_TIMESTAMP,
+                modified_ts = {epoch_sql("'now'")},
                 labelled = 1
             WHERE id = ?
         """, (label, tags, post_id))
@@ -0,0 +1,166 @@
+# digest_renderer.py
+"""
+Digest email rendering.
+
+The card, section and page templates are compiled once. A post card depends
+only on the post and its (bucketed) like count, so it is rendered once per run
+and reused for every recipient who follows that post's publisher; the page and
+section wrappers are pre-split around their content slot. Assembling a digest
+is then string concatenation.
+"""
+import os
+from urllib.parse import urlparse
+from jinja2 import Template
+
+PRIMARY_COLOR = '#d97757'  # Claude theme
+MONO = "Courier New, Courier, monospace"
+EMAIL_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "email_template_v2.html")
+
+# Stands in for a template's content slot so the rendered wrapper can be split around it
+_SLOT = "\x00slot\x00"
+
+
+def favicon_url(post_url):
+    try:
+        domain = urlparse(post_url).netloc
+        return f"https://www.google.com/s2/favicons?domain={domain}&sz=32"
+    except Exception:
+        return None
+
+
+def like_bucket(count):
+    """Exact below 10, then floored to the leading digit: 12 -> 10, 57 -> 50, 134 -> 100."""
+    if count < 10:
+        return count
+    magnitude = 10 ** (len(str(count)) - 1)
+    return count // magnitude * magnitude
+
+
+CARD_TEMPLATE = Template("""
+    <table width="100%" cellpadding="0" cellspacing="0" border="0"
+           style="margin-bottom:8px; background:#161614; border-radius:6px;
+                  border:1px solid #252522;">
+      <tr>
+        <td style="padding:2px 14px 2px 0; width:3px; background:{{ color }}; border-radius:6px 0 0 6px; font-size:0; line-height:0;">&#8203;</td>
+        <td style="padding:13px 16px;">
+          <!-- Publisher row with favicon -->
+          <table cellpadding="0" cellspacing="0" border="0" style="margin-bottom:6px;">
+            <tr>
+              <td style="vertical-align:middle; padding-right:5px; font-size:11px; color:#555550;">@</td>
+              {% if favicon %}<td style="vertical-align:middle; padding-right:6px;"><img src="{{ favicon }}" width="13" height="13" alt="" style="display:block; border-radius:2px; opacity:0.85;"></td>{% endif %}
+              <td style="vertical-align:middle;">
+                <span style="font-size:11px; font-weight:700; color:{{ color }};
+                             text-transform:uppercase; letter-spacing:0.08em; font-family:{{ mono }};">
+                  {{ publisher }}
+                </span>
+              </td>
+            </tr>
+          </table>
+          <!-- Post title -->
+          <a href="{{ url }}"
+             style="font-size:14px; font-weight:700; color:#e8e5e0;
+                    text-decoration:none; line-height:1.45; display:block;
+                    font-family:{{ mono }}; letter-spacing:-0.01em;">
+            {{ title }}
+          </a>
+          <table cellpadding="0" cellspacing="0" border="0" style="margin-top:10px;">
+            <tr>
+              <td style="padding-right:16px;">
+                <a href="{{ url }}"
+                   style="font-size:11px; color:{{ color }}; font-weight:700;
+                          text-decoration:none; font-family:{{ mono }};
+                          letter-spacing:0.03em;">
+                  $ open post &#8594;
+                </a>
+              </td>
+              {% if likes %}<td style="font-size:11px; color:#444440; font-family:{{ mono }};">// &#9829; {{ likes }}</td>{% endif %}
+            </tr>
+          </table>
+        </td>
+      </tr>
+    </table>
+""")
+
+SECTION_TEMPLATE = Template("""
+    <table width="100%" cellpadding="0" cellspacing="0" border="0"
+           style="margin-bottom:26px;">
+      <tr>
+        <td style="padding-bottom:10px;">
+          <p style="margin:0 0 2px; font-size:10px; color:#333330; font-family:{{ mono }}; letter-spacing:0.05em;">
+            // category
+          </p>
+          <h2 style="margin:0; font-size:12px; font-weight:700; color:{{ color }};
+                     text-transform:uppercase; letter-spacing:0.1em; font-family:{{ mono }};
+                     border-bottom:1px dashed #2a2a26; padding-bottom:8px;">
+            {{ category }}
+          </h2>
+        </td>
+      </tr>
+      <tr>
+        <td>
+          {{ cards }}
+        </td>
+      </tr>
+    </table>
+""")
+
+
+def _capitalize(text):
+    return text[:1].upper() + text[1:]
+
+
+class DigestRenderer:
+    """Renders digest bodies from cached fragments. One instance per run (or longer)."""
+
+    def __init__(self, template_path=EMAIL_TEMPLATE_PATH, primary_color=PRIMARY_COLOR):
+        self.primary_color = primary_color
+        with open(template_path, "r") as f:
+            page = Template(f.read()).render(category_sections=_SLOT, primary_color=primary_color)
+        self._page = page.split(_SLOT)
+        self._sections = {}
+        self._cards = {}
+        self.hits = 0
+        self.misses = 0
+
+    def card(self, notification):
+        bucket = like_bucket(notification.get("like_count", 0))
+        key = (notification["post_url"], bucket)
+        html = self._cards.get(key)
+        if html is not None:
+            self.hits += 1
+            return html
+        self.misses += 1
+        likes = bucket if bucket < 10 else f"{bucket}+"
+        html = CARD_TEMPLATE.render(
+            color=self.primary_color,
+            mono=MONO,
+            url=notification["post_url"],
+            favicon=favicon_url(notification["post_url"]),
+            publisher=_capitalize(notification["publisher"]),
+            title=_capitalize(notification["post_title"]),
+            likes=likes or None,
+        )
+        self._cards[key] = html
+        return html
+
+    def _section(self, category):
+        wrapper = self._sections.get(category)
+        if wrapper is None:
+            wrapper = SECTION_TEMPLATE.render(color=self.primary_color, mono=MONO, category=category,
+                                              cards=_SLOT).split(_SLOT)
+            self._sections[category] = wrapper
+        return wrapper
+
+    def render(self, heading_map):
+        """heading_map: {category: [notification, ...]} for one recipient -> full HTML body."""
+        parts = [self._page[0]]
+        for category, notifications in heading_map.items():
+            head, tail = self._section(category)
+            parts.append(head)
+            parts.extend(self.card(n) for n in notifications)
+            parts.append(tail)
+        parts.append(self._page[1])
+        return "".join(parts)
+
+    def stats(self):
+        return {"cards_cached": len(self._cards), "hits": self.hits, "misses": self.misses}
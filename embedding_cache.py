@@ -0,0 +1,189 @@
+# embedding_cache.py
+"""
+Persistent, content-addressed embedding cache.
+
+Vectors are stored in their own SQLite file (EMBEDDING_CACHE_PATH), keyed by
+(model id, sha256 of the normalized text), so the same text is only ever
+encoded once per model, across processes and restarts. Entries carry a
+last-used timestamp; once the cache grows past EMBEDDING_CACHE_MAX_ENTRIES the
+least recently used rows are evicted. A hit only rewrites that timestamp when it
+is older than EMBEDDING_CACHE_TOUCH_SECONDS, so repeated hits stay read-only and
+do not take the cache file's write lock.
+
+CachedEmbedder wraps any embedder (local model, batcher or service client)
+with the same encode() contract; get_embedder() puts it in front of every
+caller. Set EMBEDDING_CACHE_PATH to an empty string to disable it.
+"""
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+import numpy as np
+from db.pool import open_connection, retry_on_busy
+from logger_config import get_logger
+
+logger = get_logger("embedding_cache")
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.db")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 50_000))
+# Granularity of last_used: hits within this many seconds of the last touch write nothing
+EMBEDDING_CACHE_TOUCH_SECONDS = int(os.getenv("EMBEDDING_CACHE_TOUCH_SECONDS", 3600))
+# Eviction checks the row count only this often (in inserts), not on every write
+EVICT_CHECK_EVERY = 500
+# SQLite caps bound parameters per statement; lookups are chunked below it
+_LOOKUP_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model_id   TEXT    NOT NULL,
+    text_hash  BLOB    NOT NULL,
+    dim        INTEGER NOT NULL,
+    vector     BLOB    NOT NULL,
+    last_used  INTEGER NOT NULL,
+    PRIMARY KEY (model_id, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used);
+"""
+
+
+def normalize_text(text):
+    """Unicode NFC with whitespace runs collapsed; case is kept (the model can see it)."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()[:16]
+
+
+class EmbeddingCache:
+    """SQLite-backed (model id, text hash) -> float32 vector store with LRU eviction."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = open_connection(path)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._inserts_since_check = EVICT_CHECK_EVERY   # check once on first insert
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, model_id, keys):
+        """{key: vector} for the keys present; touches last-used times older than the touch interval."""
+        found = {}
+        now = int(time.time())
+        stale = []
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, dim, vector, last_used FROM embedding_cache "
+                    f"WHERE model_id = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                    (model_id, *chunk),
+                ).fetchall()
+                for row in rows:
+                    key = bytes(row["text_hash"])
+                    found[key] = np.frombuffer(row["vector"], dtype=np.float32)
+                    if now - row["last_used"] >= EMBEDDING_CACHE_TOUCH_SECONDS:
+                        stale.append(key)
+            if stale:
+                retry_on_busy(self._conn.executemany,
+                              "UPDATE embedding_cache SET last_used = ? WHERE model_id = ? AND text_hash = ?",
+                              [(now, model_id, key) for key in stale])
+                self._conn.commit()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, model_id, items):
+        """items: iterable of (key, float32 vector)."""
+        now = int(time.time())
+        rows = [(model_id, key, len(vector), np.ascontiguousarray(vector, dtype=np.float32).tobytes(), now)
+                for key, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            retry_on_busy(self._conn.executemany,
+                          "INSERT OR REPLACE INTO embedding_cache (model_id, text_hash, dim, vector, last_used) "
+                          "VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._inserts_since_check += len(rows)
+            if self._inserts_since_check >= EVICT_CHECK_EVERY:
+                self._inserts_since_check = 0
+                self._evict()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        retry_on_busy(self._conn.execute,
+                      "DELETE FROM embedding_cache WHERE (model_id, text_hash) IN ("
+                      "SELECT model_id, text_hash FROM embedding_cache ORDER BY last_used LIMIT ?)", (excess,))
+        self._conn.commit()
+        self.evictions += excess
+        logger.info(f"Evicted {excess} least recently used embeddings")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+class CachedEmbedder:
+    """Consults the cache first and only sends misses to the wrapped embedder."""
+
+    def __init__(self, embedder, cache):
+        self.embedder = embedder
+        self.cache = cache
+
+    @property
+    def model_id(self):
+        return self.embedder.model_id
+
+    @property
+    def dim(self):
+        return self.embedder.dim
+
+    def encode(self, texts, batch_size=32, normalize=False):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return self.embedder.encode(texts, batch_size=batch_size, normalize=normalize)
+
+        model_id = self.model_id
+        keys = [text_key(text) for text in texts]
+        found = self.cache.get_many(model_id, keys)
+
+        missing = {}
+        for text, key in zip(texts, keys):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            # Cache raw vectors; normalization is applied on the way out
+            vectors = self.embedder.encode(list(missing.values()), batch_size=batch_size)
+            fresh = dict(zip(missing, vectors))
+            self.cache.put_many(model_id, fresh.items())
+            found.update(fresh)
+
+        vectors = np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+        if normalize:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+    def stats(self):
+        return self.cache.stats()
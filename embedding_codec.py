@@ -0,0 +1,118 @@
+# embedding_codec.py
+"""
+Compact encodings for post embeddings.
+
+EMBEDDING_FORMAT picks how vectors are stored in posts.embedding, in the shared
+embedding store and in the in-memory ANN index:
+
+    float32  4 bytes/dim, exact (default; the historical format)
+    float16  2 bytes/dim
+    int8     1 byte/dim plus one float32 scale per vector (max |x| / 127)
+
+Inner products are computed as (codes @ query) * scale, so the per-vector
+scale never has to be applied to the matrix itself. benchmarks/
+bench_embedding_quantization.py reports the memory saved, scoring speed and
+top-k overlap of each format against float32.
+
+BLOBs are self-describing. float32 BLOBs are the raw little-endian array, as
+they have always been; quantized BLOBs start with a 4-byte tag (a float32 NaN
+bit pattern, which no real embedding starts with), int8 then has its scale.
+Rows written in different formats can therefore coexist while a migration
+converts them.
+"""
+import os
+import struct
+import numpy as np
+
+FORMATS = ("float32", "float16", "int8")
+EMBEDDING_FORMAT = os.getenv("EMBEDDING_FORMAT", "float32")
+
+_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2"), "int8": np.dtype("i1")}
+_TAGS = {"float16": b"Q\x10\xc0\x7f", "int8": b"Q\x08\xc0\x7f"}
+_TAG_FORMATS = {tag: fmt for fmt, tag in _TAGS.items()}
+_SCALE = struct.Struct("<f")
+INT8_MAX = 127
+# Rows per chunk when scoring; small enough that the widened float32 copy stays in cache
+_SCORE_CHUNK = 512
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown embedding format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def storage_dtype(fmt):
+    return _DTYPES[check_format(fmt)]
+
+
+def quantize(vectors, fmt=EMBEDDING_FORMAT):
+    """(n, dim) floats -> (codes (n, dim) in the format's dtype, scales (n,) float32)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if check_format(fmt) != "int8":
+        return vectors.astype(_DTYPES[fmt]), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1, initial=0.0) / INT8_MAX
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes, scales):
+    """Inverse of quantize() -> (n, dim) float32."""
+    return np.asarray(codes).astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+
+def dot(codes, scales, queries):
+    """codes (n, dim) against queries (m, dim) -> (n, m) float32 inner products."""
+    queries = np.asarray(queries, dtype=np.float32).T
+    scales = np.asarray(scales, dtype=np.float32)[:, None]
+    out = np.empty((len(codes), queries.shape[1]), dtype=np.float32)
+    for start in range(0, len(codes), _SCORE_CHUNK):
+        chunk = np.asarray(codes[start:start + _SCORE_CHUNK]).astype(np.float32, copy=False)
+        out[start:start + _SCORE_CHUNK] = chunk @ queries
+    return out * scales
+
+
+def encode_blob(vector, fmt=EMBEDDING_FORMAT):
+    """One vector -> bytes for posts.embedding."""
+    codes, scales = quantize(np.asarray(vector, dtype=np.float32).reshape(1, -1), fmt)
+    if fmt == "float32":
+        return codes.tobytes()
+    if fmt == "int8":
+        return _TAGS[fmt] + _SCALE.pack(scales[0]) + codes.tobytes()
+    return _TAGS[fmt] + codes.tobytes()
+
+
+def blob_format(raw):
+    """Format a BLOB was written in, or None if it is not a valid embedding."""
+    if not raw:
+        return None
+    fmt = _TAG_FORMATS.get(bytes(raw[:4]), "float32")
+    payload = len(raw) - (0 if fmt == "float32" else 4) - (_SCALE.size if fmt == "int8" else 0)
+    if payload <= 0 or payload % _DTYPES[fmt].itemsize:
+        return None
+    return fmt
+
+
+def decode_blob(raw):
+    """posts.embedding BLOB in any format -> (codes, scale, format), or None if malformed."""
+    fmt = blob_format(raw)
+    if fmt is None:
+        return None
+    if fmt == "float32":
+        return np.frombuffer(raw, dtype=_DTYPES[fmt]), 1.0, fmt
+    offset = 4
+    scale = 1.0
+    if fmt == "int8":
+        scale = _SCALE.unpack_from(raw, offset)[0]
+        offset += _SCALE.size
+    return np.frombuffer(raw, dtype=_DTYPES[fmt], offset=offset), scale, fmt
+
+
+def decode_vector(raw):
+    """posts.embedding BLOB in any format -> float32 vector, or None if malformed."""
+    decoded = decode_blob(raw)
+    if decoded is None:
+        return None
+    codes, scale, fmt = decoded
+    return codes if fmt == "float32" else codes.astype(np.float32) * np.float32(scale)
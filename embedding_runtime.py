@@ -0,0 +1,133 @@
+# embedding_runtime.py
+"""
+Inference runtimes for the sentence-embedding model.
+
+EMBEDDING_RUNTIME selects how LocalEmbedder runs the model:
+  torch      PyTorch SentenceTransformer (default)
+  onnx       exported ONNX graph on onnxruntime, CPU
+  onnx-int8  the same graph with dynamically int8-quantized weights
+
+Every runtime produces the same float32 vectors of the same dimension, so
+stored embeddings stay interchangeable. The ONNX graphs are exported once into
+ONNX_MODEL_DIR; an export is only kept if it passes the parity check against
+the torch model (minimum cosine similarity over PARITY_TEXTS).
+
+    python embedding_runtime.py export [onnx|onnx-int8]
+    python embedding_runtime.py check  [onnx|onnx-int8]
+"""
+import os
+import sys
+import numpy as np
+from logger_config import get_logger
+
+logger = get_logger("embedding_runtime")
+
+EMBEDDING_RUNTIME = os.getenv("EMBEDDING_RUNTIME", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "data/onnx")
+# onnxruntime quantization target: avx2 | avx512 | avx512_vnni | arm64
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+EMBEDDING_PARITY_MIN_COSINE = float(os.getenv("EMBEDDING_PARITY_MIN_COSINE", 0.98))
+
+RUNTIMES = ("torch", "onnx", "onnx-int8")
+
+PARITY_TEXTS = [
+    "Title: Scaling Kafka consumers to a million events per second. Tags: kafka, streaming. Content: ",
+    "Title: How we migrated our monolith to microservices. Tags: architecture, system design. Content: ",
+    "Title: Building accessible React component libraries. Tags: react, frontend, a11y. Content: ",
+    "Title: Fine-tuning LLMs for retrieval augmented generation. Tags: llm, rag, embeddings. Content: ",
+    "Title: Zero trust networking in practice. Tags: security, oauth. Content: ",
+    "Title: Flaky end-to-end tests and how to tame them. Tags: testing, playwright. Content: ",
+    "Title: Our dbt and Airflow data platform. Tags: data pipeline, etl. Content: ",
+    "Title: Shipping SwiftUI at scale. Tags: ios, mobile. Content: ",
+    "Title: Reading a Grafana dashboard during an incident. Tags: sre, observability. Content: ",
+    "Title: Writing product roadmaps engineers trust. Tags: product strategy, okr. Content: ",
+    "consumer lag spikes after rebalancing the payments topic",
+    "general technology, industry news, engineering culture, career development",
+]
+
+
+class ParityError(RuntimeError):
+    pass
+
+
+def runtime_model_id(model_name, runtime=EMBEDDING_RUNTIME):
+    """Identifies both the weights and how they are run, e.g. for cache keys."""
+    return model_name if runtime == "torch" else f"{model_name}@{runtime}"
+
+
+def _onnx_dir(model_name):
+    return os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+
+
+def _onnx_file(runtime):
+    return "onnx/model.onnx" if runtime == "onnx" else f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+
+
+def load_sentence_model(model_name, runtime=EMBEDDING_RUNTIME):
+    """SentenceTransformer for the given runtime, exporting the ONNX graph on first use."""
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown EMBEDDING_RUNTIME {runtime!r}; expected one of {RUNTIMES}")
+    from sentence_transformers import SentenceTransformer
+    if runtime == "torch":
+        return SentenceTransformer(model_name)
+
+    path = _onnx_dir(model_name)
+    if not os.path.exists(os.path.join(path, _onnx_file(runtime))):
+        export(model_name, runtime)
+    return SentenceTransformer(path, backend="onnx", model_kwargs={"file_name": _onnx_file(runtime)})
+
+
+def export(model_name, runtime):
+    """Export (and for onnx-int8, quantize) the model, then verify parity against torch."""
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.backend import export_dynamic_quantized_onnx_model
+
+    path = _onnx_dir(model_name)
+    logger.info(f"Exporting {model_name} to ONNX in {path}")
+    onnx_model = SentenceTransformer(model_name, backend="onnx")
+    onnx_model.save_pretrained(path)
+    if runtime == "onnx-int8":
+        logger.info(f"Quantizing {model_name} to int8 ({ONNX_QUANTIZATION})")
+        export_dynamic_quantized_onnx_model(onnx_model, ONNX_QUANTIZATION, path)
+
+    try:
+        min_cosine = check_parity(model_name, runtime)
+    except ParityError:
+        os.remove(os.path.join(path, _onnx_file(runtime)))
+        raise
+    logger.info(f"Exported {runtime_model_id(model_name, runtime)}: min cosine to torch {min_cosine:.4f}")
+
+
+def cosine_rows(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def check_parity(model_name, runtime, texts=PARITY_TEXTS, min_cosine=EMBEDDING_PARITY_MIN_COSINE):
+    """Minimum row-wise cosine between torch and `runtime` vectors; ParityError below min_cosine."""
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer(model_name).encode(texts, convert_to_numpy=True)
+    candidate = SentenceTransformer(_onnx_dir(model_name), backend="onnx",
+                                    model_kwargs={"file_name": _onnx_file(runtime)}) \
+        .encode(texts, convert_to_numpy=True)
+    if candidate.shape != reference.shape:
+        raise ParityError(f"{runtime} produced shape {candidate.shape}, torch {reference.shape}")
+    worst = float(cosine_rows(reference, candidate).min())
+    if worst < min_cosine:
+        raise ParityError(f"{runtime} min cosine to torch {worst:.4f} < {min_cosine}")
+    return worst
+
+
+if __name__ == "__main__":
+    from embedding_service import EMBEDDING_MODEL
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    runtime = sys.argv[2] if len(sys.argv) > 2 else "onnx-int8"
+    if command == "export":
+        export(EMBEDDING_MODEL, runtime)
+    elif command == "check":
+        print(f"{runtime}: min cosine to torch {check_parity(EMBEDDING_MODEL, runtime):.4f}")
+    else:
+        sys.exit(f"usage: {sys.argv[0]} export|check [onnx|onnx-int8]")
@@ -0,0 +1,401 @@
+# embedding_service.py
+"""
+Shared sentence-embedding service.
+
+One process owns the SentenceTransformer weights and serves encode requests over
+a local Unix socket; web workers and jobs use EmbeddingClient, which costs a
+socket instead of ~1.5 GB of model. Run the server with:
+
+    python embedding_service.py
+
+Wire protocol (all integers big-endian):
+  request   header !BBI = op, flags, payload length, then the payload
+            OP_ENCODE payload: !I count, then per text !I length + UTF-8 bytes
+            OP_INFO   payload: empty
+  response  header !BI = status, payload length, then the payload
+            OP_ENCODE: !II rows, dim + rows*dim little-endian float32
+            OP_INFO:   !I dim + UTF-8 model id
+            error:     UTF-8 message (status STATUS_ERROR)
+
+get_embedder() returns the client when EMBEDDING_BACKEND=service and an
+in-process model otherwise (development, tests, one-off scripts).
+
+Encoding is fronted by MicroBatcher: requests from all threads (and, in the
+server, from all connected workers) are queued and flushed to the model as one
+batch once EMBEDDING_MAX_BATCH texts are waiting or EMBEDDING_MAX_WAIT_MS has
+passed since the first one arrived.
+"""
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+import numpy as np
+from logger_config import get_logger
+from embedding_cache import EMBEDDING_CACHE_PATH, CachedEmbedder, EmbeddingCache
+from embedding_runtime import EMBEDDING_RUNTIME, load_sentence_model, runtime_model_id
+
+logger = get_logger("embedding_service")
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-mpnet-base-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "local")   # local | service
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET", "/tmp/onesearch-embedder.sock")
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", 60))
+# How long a client waits for the server to come up (model load takes a while)
+EMBEDDING_CONNECT_TIMEOUT = float(os.getenv("EMBEDDING_CONNECT_TIMEOUT", 120))
+EMBEDDING_MAX_REQUEST_BYTES = int(os.getenv("EMBEDDING_MAX_REQUEST_BYTES", 16 * 1024 * 1024))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", 64))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", 5))
+
+OP_ENCODE = 1
+OP_INFO = 2
+FLAG_NORMALIZE = 0x01
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+REQUEST_HEADER = struct.Struct("!BBI")
+RESPONSE_HEADER = struct.Struct("!BI")
+_U32 = struct.Struct("!I")
+_SHAPE = struct.Struct("!II")
+_FLOAT32 = np.dtype("<f4")
+
+
+class EmbeddingServiceError(RuntimeError):
+    pass
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        n = sock.recv_into(view[got:], size - got)
+        if n == 0:
+            raise ConnectionError("embedding service connection closed")
+        got += n
+    return bytes(buf)
+
+
+def pack_texts(texts):
+    parts = [_U32.pack(len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def unpack_texts(payload):
+    (count,), offset = _U32.unpack_from(payload, 0), _U32.size
+    texts = []
+    for _ in range(count):
+        (size,) = _U32.unpack_from(payload, offset)
+        offset += _U32.size
+        texts.append(payload[offset:offset + size].decode("utf-8"))
+        offset += size
+    return texts
+
+
+def pack_matrix(matrix):
+    matrix = np.ascontiguousarray(matrix, dtype=_FLOAT32)
+    rows, dim = matrix.shape
+    return _SHAPE.pack(rows, dim) + matrix.tobytes()
+
+
+def unpack_matrix(payload):
+    rows, dim = _SHAPE.unpack_from(payload, 0)
+    return np.frombuffer(payload, dtype=_FLOAT32, count=rows * dim, offset=_SHAPE.size) \
+        .reshape(rows, dim).astype(np.float32)
+
+
+# ── In-process model ─────────────────────────────────────────────────────────
+
+class LocalEmbedder:
+    """Loads the model on first use, in this process, on the EMBEDDING_RUNTIME backend."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, runtime=EMBEDDING_RUNTIME):
+        self.model_name = model_name
+        self.runtime = runtime
+        self.model_id = runtime_model_id(model_name, runtime)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    logger.info(f"Loading embedding model {self.model_id}")
+                    self._model = load_sentence_model(self.model_name, self.runtime)
+        return self._model
+
+    @property
+    def dim(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32, normalize=False):
+        """str -> (dim,), list of str -> (N, dim); float32 numpy either way."""
+        single = isinstance(texts, str)
+        vectors = self.model.encode([texts] if single else list(texts), batch_size=batch_size,
+                                    convert_to_numpy=True, normalize_embeddings=normalize)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent encode calls into batched model calls.
+
+    submit() queues texts and returns a Future; one background thread drains the
+    queue, waiting at most max_wait_ms after the first request for up to
+    max_batch texts, encodes them in one call and resolves each Future with its
+    slice. encode() is the blocking equivalent, so a MicroBatcher can stand in
+    for the embedder it wraps.
+    """
+
+    def __init__(self, embedder, max_batch=EMBEDDING_MAX_BATCH, max_wait_ms=EMBEDDING_MAX_WAIT_MS):
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    @property
+    def model_id(self):
+        return self.embedder.model_id
+
+    @property
+    def dim(self):
+        return self.embedder.dim
+
+    def submit(self, texts, normalize=False):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, self.dim), dtype=np.float32))
+            return future
+        self._queue.put((texts, normalize, single, future))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                    self._thread.start()
+        return future
+
+    def encode(self, texts, batch_size=32, normalize=False):
+        return self.submit(texts, normalize).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            for normalize in (False, True):
+                group = [item for item in batch if item[1] == normalize]
+                if group:
+                    self._flush(group, normalize)
+
+    def _flush(self, group, normalize):
+        texts = [text for item in group for text in item[0]]
+        try:
+            vectors = self.embedder.encode(texts, batch_size=max(self.max_batch, 1), normalize=normalize)
+        except Exception as e:
+            if len(group) > 1:
+                # Don't fail every caller for one bad request: retry them one by one
+                for item in group:
+                    self._flush([item], normalize)
+            else:
+                group[0][3].set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.requests += len(group)
+        offset = 0
+        for item_texts, _, single, future in group:
+            rows = vectors[offset:offset + len(item_texts)]
+            offset += len(item_texts)
+            future.set_result(rows[0] if single else rows)
+
+    def stats(self):
+        return {"batches": self.batches, "requests": self.requests,
+                "requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0}
+
+
+# ── Client ───────────────────────────────────────────────────────────────────
+
+class EmbeddingClient:
+    """
+    Thin client for the embedding server. Same encode() contract as LocalEmbedder.
+    Each thread keeps its own connection; a dropped connection is reopened once.
+    """
+
+    def __init__(self, path=EMBEDDING_SOCKET, timeout=EMBEDDING_TIMEOUT,
+                 connect_timeout=EMBEDDING_CONNECT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+        self._info = None
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+                return sock
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise EmbeddingServiceError(f"embedding service not reachable at {self.path}")
+                time.sleep(0.5)
+
+    def _request(self, op, payload=b"", flags=0):
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            if sock is None:
+                sock = self._local.sock = self._connect()
+            try:
+                sock.sendall(REQUEST_HEADER.pack(op, flags, len(payload)) + payload)
+                status, size = RESPONSE_HEADER.unpack(_recv_exact(sock, RESPONSE_HEADER.size))
+                body = _recv_exact(sock, size)
+                break
+            except (ConnectionError, socket.timeout, OSError):
+                sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise
+        if status != STATUS_OK:
+            raise EmbeddingServiceError(body.decode("utf-8", "replace"))
+        return body
+
+    def _load_info(self):
+        if self._info is None:
+            body = self._request(OP_INFO)
+            (dim,) = _U32.unpack_from(body, 0)
+            self._info = (body[_U32.size:].decode("utf-8"), dim)
+        return self._info
+
+    @property
+    def model_id(self):
+        return self._load_info()[0]
+
+    @property
+    def dim(self):
+        return self._load_info()[1]
+
+    def encode(self, texts, batch_size=32, normalize=False):
+        """batch_size is chosen by the server; accepted for signature compatibility."""
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        body = self._request(OP_ENCODE, pack_texts(texts), FLAG_NORMALIZE if normalize else 0)
+        vectors = unpack_matrix(body)
+        return vectors[0] if single else vectors
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """Process-wide embedder selected by EMBEDDING_BACKEND, behind the persistent embedding cache."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                embedder = EmbeddingClient() if EMBEDDING_BACKEND == "service" else MicroBatcher(LocalEmbedder())
+                if EMBEDDING_CACHE_PATH:
+                    embedder = CachedEmbedder(embedder, EmbeddingCache())
+                _embedder = embedder
+    return _embedder
+
+
+# ── Server ───────────────────────────────────────────────────────────────────
+
+class _EncodeHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                header = _recv_exact(self.request, REQUEST_HEADER.size)
+            except ConnectionError:
+                return
+            op, flags, size = REQUEST_HEADER.unpack(header)
+            if size > EMBEDDING_MAX_REQUEST_BYTES:
+                self._reply(STATUS_ERROR, f"request of {size} bytes exceeds limit".encode())
+                return
+            payload = _recv_exact(self.request, size)
+            try:
+                if op == OP_ENCODE:
+                    texts = unpack_texts(payload)
+                    vectors = server.embedder.encode(texts, normalize=bool(flags & FLAG_NORMALIZE))
+                    self._reply(STATUS_OK, pack_matrix(vectors))
+                elif op == OP_INFO:
+                    self._reply(STATUS_OK, _U32.pack(server.embedder.dim) + server.embedder.model_id.encode())
+                else:
+                    self._reply(STATUS_ERROR, f"unknown op {op}".encode())
+            except Exception as e:
+                logger.exception("Embedding request failed")
+                self._reply(STATUS_ERROR, str(e).encode())
+
+    def _reply(self, status, body):
+        self.request.sendall(RESPONSE_HEADER.pack(status, len(body)) + body)
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path=EMBEDDING_SOCKET, embedder=None):
+        if os.path.exists(path):
+            os.unlink(path)   # stale socket from a previous run
+        # Requests from every connected worker are coalesced into shared model batches
+        self.embedder = MicroBatcher(embedder or LocalEmbedder())
+        super().__init__(path, _EncodeHandler)
+        os.chmod(path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def serve(path=EMBEDDING_SOCKET):
+    embedder = LocalEmbedder()
+    # Load weights before accepting connections so clients never see a half-ready server
+    logger.info(f"Embedding service ready: {embedder.model_id} ({embedder.dim} dims) on {path}")
+    with EmbeddingServer(path, embedder) as server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve()
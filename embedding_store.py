@@ -0,0 +1,242 @@
+# embedding_store.py
+"""
+Memory-mapped post embedding store shared by every process.
+
+Post embeddings are exported from posts.embedding into one contiguous .npy
+matrix in EMBEDDING_FORMAT (float32, float16 or int8 codes, see
+embedding_codec.py) plus parallel .npy files of per-row scales and post ids
+(row -> id), next to the database.
+Readers np.load them with mmap_mode="r", so all gunicorn workers and jobs share
+one copy through the page cache, with no per-row BLOB decoding.
+
+Writes are append-and-swap. A JSON manifest names the current generation of
+files and how many rows of it are valid. The writer (scrape and backfill jobs,
+under a file lock) appends new rows past that count, flushes, then atomically
+replaces the manifest; readers only ever look at rows the manifest covers.
+A re-embedded post gets a new row and the id's latest row wins. When the
+preallocated capacity runs out, the live rows are compacted into a new
+generation and the manifest is swapped over to it, as is a store written in a
+different format than the one configured.
+"""
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+import numpy as np
+from embedding_codec import EMBEDDING_FORMAT, decode_blob, dequantize, quantize, storage_dtype
+from logger_config import get_logger
+
+logger = get_logger("embedding_store")
+
+EMBEDDING_STORE_MIN_CAPACITY = int(os.getenv("EMBEDDING_STORE_MIN_CAPACITY", 4096))
+
+
+def store_path(db_path):
+    return f"{db_path}.vectors"
+
+
+class EmbeddingStore:
+    def __init__(self, base_path, fmt=EMBEDDING_FORMAT):
+        self.base_path = base_path
+        self.fmt = fmt
+        self.stored_fmt = None
+        self.manifest_path = f"{base_path}.json"
+        self.generation = None
+        self.rows = 0
+        self.capacity = 0
+        self.dim = None
+        self.seq = 0
+        self._vectors = None
+        self._scales = None
+        self._ids = None
+        self._position = {}
+        self._manifest_mtime = None
+
+    def _file(self, generation, kind):
+        return f"{self.base_path}.{generation}.{kind}.npy"
+
+    def __len__(self):
+        return len(self._position)
+
+    # ── Reading ──────────────────────────────────────────────────────────────
+
+    def refresh(self):
+        """Re-read the manifest if it changed; map a new generation when swapped. Returns True if changed."""
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except FileNotFoundError:
+            return False
+        if mtime == self._manifest_mtime:
+            return False
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+
+        if manifest["generation"] != self.generation:
+            self._vectors = np.load(self._file(manifest["generation"], "vectors"), mmap_mode="r")
+            self._ids = np.load(self._file(manifest["generation"], "ids"), mmap_mode="r")
+            # Stores written before quantization support are float32 without scales
+            scales_file = self._file(manifest["generation"], "scales")
+            self._scales = (np.load(scales_file, mmap_mode="r") if os.path.exists(scales_file)
+                            else np.ones(len(self._ids), dtype=np.float32))
+            self._position, self.rows = {}, 0
+        for row, post_id in enumerate(self._ids[self.rows:manifest["rows"]].tolist(), start=self.rows):
+            self._position[post_id] = row
+
+        self.generation = manifest["generation"]
+        self.rows = manifest["rows"]
+        self.capacity = manifest["capacity"]
+        self.dim = manifest["dim"]
+        self.seq = manifest["seq"]
+        self.stored_fmt = manifest.get("format")   # None: legacy float32 store, rebuilt on next sync
+        self._manifest_mtime = mtime
+        return True
+
+    def matrix(self):
+        """
+        (rows, dim) read-only view of the stored codes over the shared mapping;
+        includes superseded rows. Multiply by scales() for float32 values.
+        """
+        if self._vectors is None:
+            return np.empty((0, self.dim or 0), storage_dtype(self.fmt))
+        return self._vectors[:self.rows]
+
+    def scales(self):
+        return self._scales[:self.rows] if self._scales is not None else np.empty(0, np.float32)
+
+    def get(self, post_id):
+        """float32 vector of a post, or None."""
+        row = self._position.get(post_id)
+        return None if row is None else dequantize(self._vectors[[row]], self._scales[[row]])[0]
+
+    def get_many(self, post_ids):
+        """-> (found_ids, (n, dim) float32 array) for the ids present in the store."""
+        found = [post_id for post_id in post_ids if post_id in self._position]
+        rows = [self._position[post_id] for post_id in found]
+        if not rows:
+            return [], np.empty((0, self.dim or 0), dtype=np.float32)
+        return found, dequantize(self._vectors[rows], self._scales[rows])
+
+    def _stored(self, post_id):
+        row = self._position.get(post_id)
+        return None if row is None else (self._vectors[row], self._scales[row])
+
+    # ── Writing (jobs only) ──────────────────────────────────────────────────
+
+    @contextmanager
+    def _write_lock(self):
+        directory = os.path.dirname(self.base_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.base_path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def sync(self, db, conn):
+        """Append embeddings changed since the last sync. Returns the number of rows written."""
+        with self._write_lock():
+            self.refresh()
+            rebuild = self.seq > db.get_vector_seq(conn)
+            if rebuild:
+                # Restored/replaced database: start a fresh generation, never overwrite mapped rows
+                logger.warning("Embedding store is ahead of the database; rebuilding")
+            elif self.generation is not None and self.stored_fmt != self.fmt:
+                logger.info(f"Embedding store is stored as {self.stored_fmt}, configured {self.fmt}; rebuilding")
+                rebuild = True
+            if rebuild:
+                self._position, self.seq = {}, 0
+
+            new_ids, new_codes, new_scales, seq = [], [], [], self.seq
+            for row in db.get_post_vectors_since(conn, self.seq):
+                seq = max(seq, row["vector_seq"] or 0)
+                decoded = decode_blob(row["embedding"])
+                if decoded is None:
+                    continue
+                codes, scale, fmt = decoded
+                if fmt != self.fmt:
+                    codes, scales = quantize(codes.astype(np.float32)[None, :] * np.float32(scale), self.fmt)
+                    codes, scale = codes[0], scales[0]
+                if self.dim is None:
+                    self.dim = len(codes)
+                if len(codes) != self.dim:
+                    logger.warning(f"Skipping post {row['id']}: embedding has {len(codes)} dims, expected {self.dim}")
+                    continue
+                current = self._stored(row["id"])
+                if current is not None and current[1] == scale and np.array_equal(current[0], codes):
+                    continue   # only the label changed
+                new_ids.append(row["id"])
+                new_codes.append(codes)
+                new_scales.append(scale)
+
+            if not new_ids and not rebuild and (seq == self.seq or self.generation is None):
+                return 0
+            if not rebuild and self.generation is not None and self.rows + len(new_ids) <= self.capacity:
+                self._append(new_ids, new_codes, new_scales, seq)
+            else:
+                self._swap(new_ids, new_codes, new_scales, seq)
+            logger.info(f"Embedding store synced: {len(new_ids)} rows written, {len(self)} posts")
+            return len(new_ids)
+
+    def _append(self, new_ids, new_codes, new_scales, seq):
+        start, end = self.rows, self.rows + len(new_ids)
+        if new_ids:
+            vectors = np.load(self._file(self.generation, "vectors"), mmap_mode="r+")
+            scales = np.load(self._file(self.generation, "scales"), mmap_mode="r+")
+            ids = np.load(self._file(self.generation, "ids"), mmap_mode="r+")
+            vectors[start:end] = np.stack(new_codes)
+            scales[start:end] = new_scales
+            ids[start:end] = new_ids
+            for array in (vectors, scales, ids):
+                array.flush()
+            del vectors, scales, ids
+        self._write_manifest(self.generation, end, self.capacity, seq)
+
+    def _swap(self, new_ids, new_codes, new_scales, seq):
+        # Compact: the latest row of every live id, then the new rows
+        replaced = set(new_ids)
+        live = [(post_id, row) for post_id, row in self._position.items() if post_id not in replaced]
+        rows = len(live) + len(new_ids)
+        capacity = max(EMBEDDING_STORE_MIN_CAPACITY, 2 * rows)
+        generation = (self.generation or 0) + 1
+        dim = self.dim or (len(new_codes[0]) if new_codes else 0)
+
+        vectors = np.lib.format.open_memmap(self._file(generation, "vectors"), mode="w+",
+                                            dtype=storage_dtype(self.fmt), shape=(capacity, dim))
+        scales = np.lib.format.open_memmap(self._file(generation, "scales"), mode="w+",
+                                           dtype=np.float32, shape=(capacity,))
+        ids = np.lib.format.open_memmap(self._file(generation, "ids"), mode="w+", dtype=np.int64, shape=(capacity,))
+        if live:
+            live_rows = [row for _, row in live]
+            vectors[:len(live)] = self._vectors[live_rows]
+            scales[:len(live)] = self._scales[live_rows]
+            ids[:len(live)] = [post_id for post_id, _ in live]
+        if new_ids:
+            vectors[len(live):rows] = np.stack(new_codes)
+            scales[len(live):rows] = new_scales
+            ids[len(live):rows] = new_ids
+        for array in (vectors, scales, ids):
+            array.flush()
+        del vectors, scales, ids
+
+        old_generation = self.generation
+        self._write_manifest(generation, rows, capacity, seq)
+        if old_generation is not None:
+            # Readers still mapping the old files keep them alive until they re-map
+            for kind in ("vectors", "scales", "ids"):
+                try:
+                    os.remove(self._file(old_generation, kind))
+                except FileNotFoundError:
+                    pass
+
+    def _write_manifest(self, generation, rows, capacity, seq):
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"generation": generation, "rows": rows, "capacity": capacity,
+                       "dim": self.dim, "seq": seq, "format": self.fmt}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_path)
+        self._manifest_mtime = None
+        self.refresh()
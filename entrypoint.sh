@@ -1,2 +1,13 @@
 #!/bin/sh
-exec gunicorn -b 0.0.0.0:8000 --worker-tmp-dir /dev/shm app:app
+# One process owns the embedding model; gunicorn workers and jobs (docker exec, with
+# EMBEDDING_BACKEND=service from the image) reach it over a Unix socket.
+# Supervised: if it dies it is restarted, and clients wait for it to come back
+# (EMBEDDING_CONNECT_TIMEOUT) rather than failing.
+(
+    while true; do
+        python embedding_service.py
+        echo "embedding service exited with status $?; restarting in 2s" >&2
+        sleep 2
+    done
+) &
+exec gunicorn -b 0.0.0.0:8000 --workers "${WEB_CONCURRENCY:-3}" --worker-tmp-dir /dev/shm app:app
@@ -6,6 +6,8 @@ const JOBS = [
   { id: 'scrape', label: 'Scrape Publishers', description: 'Fetch new blog posts from all subscribed publishers and classify them.' },
   { id: 'notify', label: 'Queue Notifications', description: 'Match new labelled posts to subscriber preferences and queue notifications.' },
   { id: 'send',   label: 'Send Notifications', description: 'Send queued notification emails to subscribers whose frequency has matured.' },
+  { id: 'reconcile', label: 'Reconcile Stats', description: 'Recompute like / view / fire counters from source tables and decay trending likes.' },
+  { id: 'prefetch', label: 'Prefetch Articles', description: 'Fetch and extract content for recent posts that have none stored yet, so the reader loads locally.' },
 ]
 
 function logLevel(line) {
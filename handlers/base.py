@@ -1,14 +1,33 @@
+import os
+import time
 import feedparser
+import httpx
 from datetime import timezone, datetime
 import ssl
 import urllib
+from threading import Lock
+from urllib.parse import urlparse
 from logger_config import get_logger
 from email.utils import parsedate_to_datetime
 
 HEADERS = {'User-Agent': 'Mozilla/5.0'}
+# Deadline for any single feed/page request made while scraping
+REQUEST_TIMEOUT = float(os.getenv("SCRAPE_REQUEST_TIMEOUT", 15))
 
 logger = get_logger("base-handler")
 
+_client = None
+_client_lock = Lock()
+
+def http_client():
+    """Process-wide httpx client (thread-safe, keeps connections alive across feeds)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(headers=HEADERS, follow_redirects=True, timeout=REQUEST_TIMEOUT)
+    return _client
+
 class BaseScraper:
     def get_feed_url(self):
         return ""
@@ -27,6 +46,26 @@ class BaseScraper:
         Return an HTML string, or None to fall back to the generic readability extractor.
         """
         return None
+
+    def get_host(self):
+        """Key used to limit concurrent requests against one site while scraping."""
+        return urlparse(self.get_feed_url()).netloc or type(self).__name__.lower()
+
+    def fetch(self, url, timeout=REQUEST_TIMEOUT):
+        """
+        GET url within `timeout` seconds in total. httpx's timeout applies per
+        connect/read, so a server trickling its body would otherwise never time out.
+        """
+        deadline = time.monotonic() + timeout
+        with http_client().stream("GET", url, timeout=timeout) as resp:
+            resp.raise_for_status()
+            body = bytearray()
+            for chunk in resp.iter_bytes():
+                if time.monotonic() > deadline:
+                    raise httpx.ReadTimeout(f"Request timed out: {url} took longer than {timeout}s",
+                                            request=resp.request)
+                body += chunk
+        return httpx.Response(resp.status_code, headers=resp.headers, content=bytes(body), request=resp.request)
     
     def scrape(self):
         feed_url = self.get_feed_url()
@@ -43,7 +82,8 @@ class BaseScraper:
         """Search AWS blog posts matching a category and published after a specific datetime."""
         feed_url = self.get_feed_url()
 
-        feed = feedparser.parse(feed_url)
+        # Fetched with a deadline; feedparser.parse(url) has no timeout
+        feed = feedparser.parse(self.fetch(feed_url).content)
         
         matching_posts = []    
 
@@ -77,7 +117,8 @@ class BaseScraper:
                     "title": entry.title,
                     "url": entry.link,
                     "published": published.isoformat(),
-                    "tags": categories
+                    "tags": categories,
+                    "guid": entry.get("id") or entry.link,
                 })   
             except Exception:
                 logger.exception(f"Date parse error: {entry}") 
@@ -1,7 +1,7 @@
 import requests
 from bs4 import BeautifulSoup
 import re
-from .base import BaseScraper
+from .base import BaseScraper, REQUEST_TIMEOUT
 from logger_config import get_logger
 from email.utils import parsedate_to_datetime
 from dateutil import parser
@@ -56,7 +56,7 @@ class FacebookScraper(BaseScraper):
         return sorted(categories)
     
     def search_blog_posts(self, category, last_scan_time):
-        res = requests.get(BASE_URL)
+        res = requests.get(BASE_URL, headers=HEADERS, timeout=REQUEST_TIMEOUT)
         soup = BeautifulSoup(res.text, "html.parser")
     
         posts = []
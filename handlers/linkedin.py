@@ -2,7 +2,7 @@ import requests
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urljoin
-from .base import BaseScraper
+from .base import BaseScraper, REQUEST_TIMEOUT
 from logger_config import get_logger
 from email.utils import parsedate_to_datetime
 from dateutil import parser
@@ -156,7 +156,7 @@ class LinkedinScraper(BaseScraper):
         return '<div>' + '\n'.join(parts) + '</div>'
 
     def search_blog_posts(self, category, last_scan_time):
-        res = requests.get(BASE_URL)
+        res = requests.get(BASE_URL, timeout=REQUEST_TIMEOUT)
         soup = BeautifulSoup(res.text, "html.parser")
     
         posts = []
@@ -0,0 +1,90 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+from threading import Semaphore
+from logger_config import get_logger
+
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", 8))
+SCRAPE_PER_HOST = int(os.getenv("SCRAPE_PER_HOST", 2))
+SCRAPE_BUDGET_SECONDS = float(os.getenv("SCRAPE_BUDGET_SECONDS", 300))
+
+logger = get_logger("scrape-pipeline")
+
+
+class ScrapeBudgetExceeded(TimeoutError):
+    pass
+
+
+def run_concurrently(tasks, workers, per_host, budget, name="scrape"):
+    """
+    Run many network-bound calls at once with per-host and global limits.
+
+    tasks: iterable of (key, host, fn); fn takes no arguments.
+    Yields (key, result, error) in completion order; error is None on success.
+    At most `per_host` tasks run against one host at a time. Tasks still
+    unfinished when the global `budget` (seconds) runs out are reported with a
+    ScrapeBudgetExceeded error right away; queued ones are cancelled, and the
+    generator only finishes once the in-flight ones have ended at their own
+    request deadline, so no worker outlives the run.
+
+    Work happens on worker threads only; the caller consumes results on its
+    own thread, which keeps all database writes on a single connection.
+    """
+    tasks = list(tasks)
+    host_limits = {}
+    for _, host, _ in tasks:
+        host_limits.setdefault(host, Semaphore(per_host))
+
+    def _run(host, fn):
+        with host_limits[host]:
+            return fn()
+
+    deadline = time.monotonic() + budget
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=name)
+    pending = {executor.submit(_run, host, fn): key for key, host, fn in tasks}
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                error = future.exception()
+                yield key, (None if error else future.result()), error
+        for future, key in list(pending.items()):
+            pending.pop(future)
+            yield key, None, ScrapeBudgetExceeded(f"{name} budget of {budget}s exhausted")
+    finally:
+        # Abandoned calls end at their own request deadline (BaseScraper.fetch)
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def fetch_concurrently(jobs, workers=SCRAPE_WORKERS, per_host=SCRAPE_PER_HOST, budget=SCRAPE_BUDGET_SECONDS):
+    """
+    Run scraper.search_blog_posts for many publishers at once (see run_concurrently).
+
+    jobs: iterable of (key, scraper, last_scan_time).
+    Yields (key, posts, error) in completion order; error is None on success.
+    """
+    tasks = ((key, scraper.get_host(), partial(scraper.search_blog_posts, "", since)) for key, scraper, since in jobs)
+    yield from run_concurrently(tasks, workers, per_host, budget)
+
+
+def drop_known(posts, known):
+    """
+    Filter scraped posts down to ones not stored yet, by URL or feed GUID.
+    `known` is the seen-set loaded at job start; new posts are added to it, so
+    a post repeated across feeds or within one feed is only kept once.
+    """
+    fresh = []
+    for post in posts:
+        guid = post.get("guid")
+        if post["url"] in known or (guid and guid in known):
+            continue
+        known.add(post["url"])
+        if guid:
+            known.add(guid)
+        fresh.append(post)
+    return fresh
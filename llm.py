@@ -1,8 +1,7 @@
 import os
-import time
-from bs4 import BeautifulSoup
 from google import genai
 from google.genai import types
+from article_store import get_article, ArticleNotFoundError, ArticleFetchError, ArticleExtractionError
 
 _client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
@@ -14,8 +13,6 @@ _SYSTEM_PROMPT = (
     "Be concise and direct."
 )
 
-_article_cache = {}
-_CACHE_TTL = 3600       # 1 hour
 _MAX_ARTICLE_CHARS = 20_000  # ~5k tokens — stays within free tier limits
 
 
@@ -28,57 +25,18 @@ class ContentExtractionError(Exception):
 
 
 def _get_article_context(post_id):
-    """Fetch article context (title, publisher, body text) with in-memory cache."""
-    now = time.time()
-    cached = _article_cache.get(post_id)
-    if cached and cached["expires_at"] > now:
-        return cached["text"]
+    """Article context (title, publisher, body text), read through the shared article store."""
+    from app import app
 
-    from app import app, _extract_article_content
-    from handlers.factory import ScraperFactory
-
-    conn = app.db.get_connection()
     try:
-        c = conn.cursor()
-        c.execute("""
-            SELECT po.url, po.title, pu.publisher_name
-            FROM posts po
-            JOIN publishers pu ON po.publisher_id = pu.id
-            WHERE po.id = ?
-        """, (post_id,))
-        row = c.fetchone()
-    finally:
-        conn.close()
-
-    if not row:
-        raise PostNotFoundError(f"Post {post_id} not found")
-
-    url, title, publisher_name = row["url"], row["title"], row["publisher_name"]
-
-    scraper = ScraperFactory.get_scraper(publisher_name) if publisher_name else None
-    html = None
-
-    if scraper:
-        try:
-            html = scraper.extract_article(url)
-        except Exception:
-            html = None
-
-    if not html:
-        try:
-            html = _extract_article_content(url)
-        except Exception as e:
-            raise ContentExtractionError(f"Could not fetch article: {e}")
-
-    if not html:
-        raise ContentExtractionError("Could not extract article content")
-
-    body = BeautifulSoup(html, "html.parser").get_text(separator=" ", strip=True)
-    body = body[:_MAX_ARTICLE_CHARS]
-
-    context = f"Title: {title}\nPublisher: {publisher_name}\n\n{body}"
-    _article_cache[post_id] = {"text": context, "expires_at": now + _CACHE_TTL}
-    return context
+        article = get_article(app.db, post_id)
+    except ArticleNotFoundError as e:
+        raise PostNotFoundError(str(e))
+    except (ArticleFetchError, ArticleExtractionError) as e:
+        raise ContentExtractionError(str(e))
+
+    body = article["text"][:_MAX_ARTICLE_CHARS]
+    return f"Title: {article['title']}\nPublisher: {article['publisher_name']}\n\n{body}"
 
 
 def ask_article(post_id, question):
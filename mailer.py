@@ -0,0 +1,244 @@
+# mailer.py
+"""
+Pooled, parallel SMTP delivery.
+
+SMTPSessionPool keeps up to N authenticated SMTP sessions open for the length of
+a run instead of paying TCP + STARTTLS + AUTH for every recipient. DeliveryEngine
+sends from a bounded worker pool, throttled by a per-second rate limit, and
+transparently reconnects a session the server has dropped.
+"""
+import os
+import smtplib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from queue import LifoQueue, Empty
+from logger_config import get_logger
+
+logger = get_logger("mailer")
+
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+SMTP_RATE_LIMIT = float(os.getenv("SMTP_RATE_LIMIT", 10))   # emails/sec, 0 = unlimited
+SMTP_SEND_RETRIES = int(os.getenv("SMTP_SEND_RETRIES", 2))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 30))
+
+# Failures that mean the session is gone, not that the message was rejected
+TRANSPORT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                    ConnectionError, socket.timeout, TimeoutError)
+
+
+def is_transport_error(exc):
+    if isinstance(exc, TRANSPORT_ERRORS):
+        return True
+    # 421: service not available, server is closing the channel
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code == 421
+
+
+class RateLimiter:
+    """Spaces calls to acquire() at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SMTPSessionPool:
+    """Up to `size` logged-in SMTP sessions shared by the worker threads."""
+
+    def __init__(self, host, port, username=None, password=None, size=SMTP_POOL_SIZE,
+                 starttls=True, timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.starttls = starttls
+        self.timeout = timeout
+        self._idle = LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.connects = 0
+
+    def _connect(self):
+        # Looked up at call time so tests can swap smtplib.SMTP out
+        session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            session.starttls()
+        if self.username:
+            session.login(self.username, self.password)
+        with self._lock:
+            self.connects += 1
+        return session
+
+    def acquire(self, fresh=False):
+        """
+        An idle session, or a new one while the pool is under size. fresh=True
+        always opens a new connection: after a transport error the other idle
+        sessions have usually been dropped by the server too.
+        """
+        while True:
+            if not fresh:
+                try:
+                    return self._idle.get_nowait()
+                except Empty:
+                    pass
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                break
+            # All sessions busy; re-check periodically in case one is released or discarded
+            try:
+                session = self._idle.get(timeout=0.5)
+            except Empty:
+                continue
+            if not fresh:
+                return session
+            # Make room for the new connection rather than reuse a possibly dead one
+            self.discard(session)
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, session):
+        self._idle.put(session)
+
+    def discard(self, session):
+        try:
+            session.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def close(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except Empty:
+                break
+            self.discard(session)
+
+
+class DeliveryEngine:
+    """
+    Sends messages from a bounded worker pool over a SMTPSessionPool.
+
+    deliver() consumes an iterable of (key, to_email, message) lazily, so
+    messages are built in the caller's thread only as fast as they are sent,
+    and yields (key, error) as each send completes (error is None on success).
+    If the iterable raises, the outcomes of sends already started are yielded
+    before the exception propagates.
+    """
+
+    def __init__(self, pool, workers=None, rate=SMTP_RATE_LIMIT, retries=SMTP_SEND_RETRIES):
+        self.pool = pool
+        self.workers = workers or pool.size
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._latencies_ms = []
+        self._failed = 0
+        self._reconnects = 0
+        self._started = None
+        self._finished = None
+
+    def _send(self, to_email, message):
+        self.limiter.acquire()
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            session = self.pool.acquire(fresh=attempt > 0)
+            try:
+                session.sendmail(message["From"], to_email, message.as_string())
+            except Exception as e:
+                if not is_transport_error(e):
+                    self.pool.release(session)
+                    raise
+                self.pool.discard(session)
+                if attempt == self.retries:
+                    raise
+                with self._lock:
+                    self._reconnects += 1
+                logger.warning(f"SMTP session dropped ({e}), reconnecting for {to_email}")
+                continue
+            self.pool.release(session)
+            with self._lock:
+                self._latencies_ms.append((time.perf_counter() - start) * 1000)
+            return
+
+    def deliver(self, messages, should_stop=None):
+        """should_stop: optional threading.Event; once set, no new sends are started."""
+        with self._lock:
+            self._latencies_ms, self._failed, self._reconnects = [], 0, 0
+        self._started, self._finished = time.perf_counter(), None
+        max_in_flight = self.workers * 2
+        in_flight = {}
+
+        def _outcome(future):
+            key = in_flight.pop(future)
+            error = future.exception()
+            if error is not None:
+                with self._lock:
+                    self._failed += 1
+            return key, error
+
+        def _drain():
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield _outcome(future)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="smtp") as executor:
+            try:
+                for key, to_email, message in messages:
+                    if should_stop is not None and should_stop.is_set():
+                        break
+                    if len(in_flight) >= max_in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield _outcome(future)
+                    in_flight[executor.submit(self._send, to_email, message)] = key
+            except Exception:
+                # Building a message failed: still report the sends already started
+                # before re-raising, so the caller doesn't treat them as never sent
+                yield from _drain()
+                raise
+            yield from _drain()
+        self._finished = time.perf_counter()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            failed = self._failed
+            reconnects = self._reconnects
+        end = self._finished or time.perf_counter()
+        elapsed = end - self._started if self._started else 0.0
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        return {
+            "sent": len(latencies),
+            "failed": failed,
+            "sessions_opened": self.pool.connects,
+            "reconnects": reconnects,
+            "elapsed_s": round(elapsed, 3),
+            "emails_per_sec": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "p95_ms": round(p95, 2),
+        }
+
+    def close(self):
+        self.pool.close()
@@ -1,71 +1,28 @@
 from db import get_database
 from logger_config import get_logger
-from datetime import timedelta, datetime
+import time
 
 logger = get_logger("notify_worker")
 
 def notify(db, conn, cancel_event=None):
-    
-    subscriptions = db.get_subscriptions(conn)    
-
-    postcache = {}    
+    if cancel_event and cancel_event.is_set():
+        from app import JobCancelledError
+        raise JobCancelledError()
 
-    for subscriber in subscriptions:
-        if cancel_event and cancel_event.is_set():
-            from app import JobCancelledError
-            raise JobCancelledError()
-        email = subscriber['email']
-        pub_id = subscriber['publisher']['id']
-        pub_name = subscriber['publisher']['publisher_name']
-        topic = subscriber['topic']
-        logger.debug(f"working for {email} and topic: {topic} and publusher_id: {pub_id}")
+    start = time.perf_counter()
+    try:
+        counts = db.fan_out_notifications(conn)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Unable to fan out notifications, error: {e}")
+        raise
 
-        last_notified_at = subscriber['last_notified_at']
-        
-        if last_notified_at is None:
-            last_notified_at_dt = datetime.fromisoformat(subscriber['joined_time'])
-        else:
-            last_notified_at_dt = datetime.fromisoformat(last_notified_at)
-            
-        if ((pub_id, topic)) not in postcache:
-            posts = db.get_labelled_post_by_publisher_and_topic(conn, pub_id, topic)
-            postcache[(pub_id, topic)] = posts
-        else:
-            posts = postcache[(pub_id, topic)]
-        
-        logger.debug(f"total posts to be notified before filtering: {len(posts)}")
-        
-        logger.debug(f"filtering posts afer: {last_notified_at_dt}")
-        posts_filtered = [
-            post for post in posts
-            if datetime.fromisoformat(post['modified_at']) >= last_notified_at_dt
-        ]
-        
-        logger.debug(f"total posts to be notified: {len(posts_filtered)}")
-        
-        try:
-            for post in posts_filtered:
-                frequency = subscriber['frequency_in_days']
-                maturity_date = last_notified_at_dt + timedelta(days=frequency)
-                maturity_date = maturity_date.isoformat()
-                topic = post['topic']
-                logger.info(f"Adding notification for {subscriber['email']} about {post['title']}")
-                notification = {
-                    "email": email.lower(),
-                    "heading": pub_name + " ," + topic,
-                    "style_version": "v1",
-                    "post_url": post["url"],
-                    "post_title": post["title"],
-                    "maturity_date": maturity_date
-                }
-                
-                db.add_notification(conn, **notification)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Unable to process notifications for email: {email}, error: {e}")
-    
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(f"Queued {counts['inserted']} notifications for {counts['subscriptions']} subscriptions "
+                f"({counts['candidates']} matches, {counts['duplicates']} already queued) in {elapsed_ms:.1f}ms")
     logger.info("Notify run ended")
+    return counts
     
 if __name__ == "__main__":
     logger.info("Notify run started")
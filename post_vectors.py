@@ -0,0 +1,170 @@
+# post_vectors.py
+"""
+Similarity search over labelled post embeddings.
+
+PostVectorIndex keeps an IVF-flat ANN index (ann_index.py) of every labelled
+post's normalized embedding. refresh() catches up incrementally from
+posts.vector_seq (bumped by triggers whenever a post's embedding or label
+changes). The index is persisted next to the database: the scrape job inserts
+its new posts, re-trains when the index has grown enough and saves; web
+workers load the saved file on start (and again when it changes) and only
+replay the changes after its sequence number. Vectors for those changes come
+from the memory-mapped EmbeddingStore where it is current, so there is no
+per-row BLOB decoding on the common path. The index holds its vectors in
+EMBEDDING_FORMAT (see embedding_codec.py); an index saved in another format is
+rebuilt on the next refresh.
+"""
+import os
+import threading
+import numpy as np
+from ann_index import IVFFlatIndex
+from embedding_codec import EMBEDDING_FORMAT, decode_vector
+from logger_config import get_logger
+
+logger = get_logger("post_vectors")
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-9)
+
+
+def index_path(db_path):
+    return f"{db_path}.ivf.npz"
+
+
+class PostVectorIndex:
+    """ANN index of labelled post embeddings, kept current via vector_seq."""
+
+    def __init__(self, path=None, store=None, fmt=EMBEDDING_FORMAT):
+        self.path = path
+        self.store = store
+        self.fmt = fmt
+        self.index = IVFFlatIndex(fmt=fmt)
+        self.seq = 0
+        self._loaded_mtime = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.index)
+
+    def _load_if_changed(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            index, extra = IVFFlatIndex.load(self.path)
+        except Exception:
+            logger.exception(f"Ignoring unreadable vector index {self.path}")
+            self._loaded_mtime = mtime
+            return
+        if extra.get("seq", 0) >= self.seq:
+            self.index, self.seq = index, int(extra.get("seq", 0))
+            logger.info(f"Loaded vector index {self.path}: {len(index)} posts, seq {self.seq}")
+        self._loaded_mtime = mtime
+
+    def refresh(self, db, conn):
+        """Apply post changes since the last refresh. Returns the number of changed posts."""
+        with self._lock:
+            self._load_if_changed()
+            if self.seq > db.get_vector_seq(conn):
+                # Saved index is ahead of this database (restored/replaced DB): start over
+                logger.warning("Vector index is ahead of the database; rebuilding")
+                self.index, self.seq = IVFFlatIndex(fmt=self.fmt), 0
+            elif self.index.fmt != self.fmt:
+                logger.info(f"Vector index is stored as {self.index.fmt}, configured {self.fmt}; rebuilding")
+                self.index, self.seq = IVFFlatIndex(fmt=self.fmt), 0
+
+            changes = db.get_post_vectors_since(conn, self.seq, with_embedding=False)
+            if not changes:
+                return 0
+            vectors = self._vectors_for(db, conn, [row for row in changes if row["labelled"]])
+            upserts, removed = {}, set()
+            for row in changes:
+                vector = vectors.get(row["id"]) if row["labelled"] else None
+                if vector is None:
+                    removed.add(row["id"])
+                    upserts.pop(row["id"], None)
+                else:
+                    upserts[row["id"]] = vector
+                    removed.discard(row["id"])
+                self.seq = max(self.seq, row["vector_seq"] or 0)
+
+            self.index.remove(list(removed))
+            if upserts:
+                self.index.add(list(upserts), np.stack(list(upserts.values())))
+            logger.info(f"Vector index refreshed: {len(changes)} changes, {len(self.index)} posts")
+            return len(changes)
+
+    def _vectors_for(self, db, conn, rows):
+        """
+        Current embedding of each post: from the shared memory-mapped store when it
+        has caught up with that post's last change, else decoded from its BLOB.
+        """
+        vectors, missing = {}, []
+        if self.store is not None:
+            self.store.refresh()
+        for row in rows:
+            vector = None
+            if self.store is not None and row["vector_seq"] <= self.store.seq:
+                vector = self.store.get(row["id"])
+            if vector is None:
+                missing.append(row["id"])
+            else:
+                vectors[row["id"]] = self._checked(row["id"], vector)
+        if missing:
+            for post_id, raw in db.get_post_embeddings(conn, missing).items():
+                vectors[post_id] = self._decode(post_id, raw)
+        return vectors
+
+    def _checked(self, post_id, vector):
+        if self.index.dim is not None and len(vector) != self.index.dim:
+            logger.warning(f"Skipping post {post_id}: embedding has {len(vector)} dims, expected {self.index.dim}")
+            return None
+        return vector
+
+    def _decode(self, post_id, raw):
+        vector = decode_vector(raw)
+        return None if vector is None else self._checked(post_id, vector)
+
+    def save(self):
+        """Re-train if the index has outgrown its partition, then persist it. Writer side only."""
+        with self._lock:
+            if self.index.needs_training():
+                self.index.train()
+            self.index.save(self.path, seq=self.seq)
+            self._loaded_mtime = os.path.getmtime(self.path)
+
+    def search(self, queries, k):
+        """
+        The k posts most similar to any of `queries` (M, dim).
+        Returns (post_ids, best_scores, best_query_index), best first.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        with self._lock:
+            ids, scores = self.index.search(queries, k)
+        # A post may be a candidate for several queries; keep its best one
+        best = {}
+        for q in range(len(queries)):
+            for post_id, score in zip(ids[q].tolist(), scores[q].tolist()):
+                if post_id >= 0 and (post_id not in best or score > best[post_id][0]):
+                    best[post_id] = (score, q)
+        ranked = sorted(best.items(), key=lambda item: -item[1][0])[:k]
+        return ([post_id for post_id, _ in ranked],
+                np.array([score for _, (score, _) in ranked], dtype=np.float32),
+                np.array([q for _, (_, q) in ranked], dtype=np.int64))
+
+    def score_ids(self, post_ids, queries):
+        """Exact best score and query for specific posts -> {post_id: (score, query_index)}."""
+        queries = normalize_rows(np.atleast_2d(queries))
+        with self._lock:
+            position = self.index.position()
+            rows = [position[post_id] for post_id in post_ids if post_id in position]
+            found = [post_id for post_id in post_ids if post_id in position]
+            if not rows:
+                return {}
+            similarities = self.index.score_rows(rows, queries)
+        which = similarities.argmax(axis=1)
+        return {post_id: (float(similarities[i, which[i]]), int(which[i])) for i, post_id in enumerate(found)}
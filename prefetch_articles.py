@@ -0,0 +1,76 @@
+"""
+Fetch and extract article content for newly ingested posts before anyone reads them.
+
+scrape_pubs runs this as its last stage for the posts it just added. On its
+own it catches up on recent posts that still have no stored content, e.g.
+because their origin was down during the scrape:
+
+    python prefetch_articles.py [--days N]
+
+Each post goes through article_store.get_article(), i.e. its publisher's
+extract_article() override or the generic extractor, and the result lands in
+article_content, so /posts/<id>/content is a local read. Fetches run
+concurrently, bounded per host and by an overall time budget.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+import os
+import sys
+import time
+from functools import partial
+from urllib.parse import urlparse
+
+from db import get_database
+from article_store import get_article
+from handlers.pipeline import run_concurrently
+from logger_config import get_logger
+
+logger = get_logger("prefetch_articles")
+
+ARTICLE_PREFETCH_WORKERS = int(os.getenv("ARTICLE_PREFETCH_WORKERS", 4))
+ARTICLE_PREFETCH_PER_HOST = int(os.getenv("ARTICLE_PREFETCH_PER_HOST", 2))
+ARTICLE_PREFETCH_BUDGET_SECONDS = float(os.getenv("ARTICLE_PREFETCH_BUDGET_SECONDS", 600))
+# Standalone runs look back this far for posts without content, newest first
+ARTICLE_PREFETCH_DAYS = int(os.getenv("ARTICLE_PREFETCH_DAYS", 7))
+ARTICLE_PREFETCH_LIMIT = int(os.getenv("ARTICLE_PREFETCH_LIMIT", 500))
+
+
+def prefetch_articles(db, conn, posts=None, cancel_event=None, days=ARTICLE_PREFETCH_DAYS):
+    """
+    Store article content for `posts` ((post_id, url) pairs), or by default for
+    posts from the last `days` days that have none. Returns (stored, failed).
+    """
+    if posts is None:
+        posts = db.get_posts_missing_article_content(conn, time.time() - days * 86400, ARTICLE_PREFETCH_LIMIT)
+    posts = [(post_id, url) for post_id, url in posts]
+    if not posts:
+        logger.info("No articles to prefetch")
+        return 0, 0
+
+    logger.info(f"Prefetching article content for {len(posts)} posts")
+    start = time.perf_counter()
+    tasks = ((post_id, urlparse(url).netloc, partial(get_article, db, post_id)) for post_id, url in posts)
+    stored, failed = 0, 0
+    for post_id, _, error in run_concurrently(tasks, ARTICLE_PREFETCH_WORKERS, ARTICLE_PREFETCH_PER_HOST,
+                                              ARTICLE_PREFETCH_BUDGET_SECONDS, name="prefetch"):
+        if error is None:
+            stored += 1
+        else:
+            failed += 1
+            logger.warning(f"Could not prefetch article for post {post_id}: {error}")
+        if cancel_event and cancel_event.is_set():
+            logger.info("Article prefetch cancelled")
+            break
+    logger.info(f"Prefetched {stored} articles ({failed} failed) in {time.perf_counter() - start:.1f}s")
+    return stored, failed
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    days = int(args[args.index("--days") + 1]) if "--days" in args else ARTICLE_PREFETCH_DAYS
+    db = get_database()
+    conn = db.get_connection()
+    try:
+        prefetch_articles(db, conn, days=days)
+    finally:
+        conn.close()
@@ -0,0 +1,23 @@
+"""
+Recompute post_stats counters from post_likes / views / fire.
+Triggers keep the counters current; this fixes any drift and decays
+recent_like_count as likes fall out of the trending window (trending itself
+counts the window at read time, so it is correct between runs).
+Run from cron, e.g. hourly: python reconcile_stats.py
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+from db import get_database
+from logger_config import get_logger
+
+logger = get_logger("reconcile_stats")
+
+if __name__ == "__main__":
+    logger.info("Reconciling post stats")
+    db = get_database()
+    conn = db.get_connection()
+    try:
+        db.reconcile_post_stats(conn)
+    finally:
+        conn.close()
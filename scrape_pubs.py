@@ -4,9 +4,15 @@ import sys
 from datetime import datetime, timezone
 from db import enums
 from handlers import ScraperFactory  # maps company -> handler class
+from handlers.pipeline import fetch_concurrently, drop_known
 from db import get_database
 from logger_config import get_logger
-from classifier import classify_post, get_embedding
+from classifier import EMBEDDING_TEXT_VERSION, post_text, encode_posts, classify_encoded
+from backfill_embeddings import reencode_stale
+from post_vectors import PostVectorIndex, index_path
+from embedding_store import EmbeddingStore, store_path
+from embedding_codec import encode_blob
+from prefetch_articles import prefetch_articles
 
 def parse_datetime(dt_str):
     if dt_str is None:
@@ -42,10 +48,8 @@ def scrape_pubs(db, conn, target_publishers=None, cancel_event=None):
                 logger.error(f"Publisher '{name}' not found.")
 
                        
+    jobs = []
     for publisher_id in publishers:
-        if cancel_event and cancel_event.is_set():
-            from app import JobCancelledError
-            raise JobCancelledError()
         publisher = publishers[publisher_id]
         
         last_scraped_at =  parse_datetime(publisher.get("last_scraped_at"))
@@ -67,33 +71,93 @@ def scrape_pubs(db, conn, target_publishers=None, cancel_event=None):
                 continue    
 
             logger.info(f"🔍 Scraping {publisher['publisher_name']} for new blog posts after {last_scraped_at}...")    
+            jobs.append((publisher_id, scraper, last_scraped_at))
 
-            blog_posts = scraper.search_blog_posts("", last_scraped_at)
-            
-            if not blog_posts:
-                logger.info(f"No new blog posts found for {publisher['publisher_name']}")
+    # URLs / GUIDs already stored; checked before any classifier or embedding work
+    known = db.get_known_post_keys(conn)
+    logger.info(f"Loaded {len(known)} known post keys")
+
+    # Feeds are fetched concurrently; new posts are gathered here first so the
+    # whole run is encoded in one batch, then persisted on this thread's connection
+    fetched_pubs = []
+    for publisher_id, blog_posts, error in fetch_concurrently(jobs):
+        if cancel_event and cancel_event.is_set():
+            from app import JobCancelledError
+            raise JobCancelledError()
+        publisher = publishers[publisher_id]
+
+        if error is not None:
+            logger.error(f"Error while fetching publisher: {publisher['publisher_name']}: {error!r}")
+            continue
             
-            try:
-                for post in blog_posts:
-                    tags = ', '.join(post["tags"])
-                    logger.info(f"Found new post: {post['title']} published by {post['published']} with tags: {tags}")
-                    category = classify_post(post["title"], tags)
-                    if not category:
-                        logger.error(f"⚠️ Could not classify post: {post['title']}")
-                        category = enums.PublisherCategory.GENERAL.value
-                    
-                    logger.info(f" {category} - Classified post '{post['title']}'")
-        
-                    post_id = db.add_post(conn, post['url'], post['title'], publisher['id'], tags, post['published'], category)
-                    embedding = get_embedding(f"{post['title']} {tags}")
-                    db.save_post_embedding(conn, post_id, embedding.tobytes())                    
+        fetched = len(blog_posts)
+        blog_posts = drop_known(blog_posts, known)
+        if fetched != len(blog_posts):
+            logger.info(f"Skipping {fetched - len(blog_posts)} already stored posts for {publisher['publisher_name']}")
+
+        if not blog_posts:
+            logger.info(f"No new blog posts found for {publisher['publisher_name']}")
+        fetched_pubs.append((publisher, blog_posts))
+
+    # One encode for every new post; the same vector feeds the classifier and is stored
+    new_posts = [post for _, blog_posts in fetched_pubs for post in blog_posts]
+    texts = [post_text(post["title"], ', '.join(post["tags"])) for post in new_posts]
+    embeddings = encode_posts(texts) if texts else []
+    categories = classify_encoded(texts, embeddings)
+    logger.info(f"Encoded and classified {len(texts)} new posts in one batch")
+
+    index = 0
+    stored_posts = []
+    for publisher, blog_posts in fetched_pubs:
+        try:
+            added = []
+            for post in blog_posts:
+                embedding, category = embeddings[index], categories[index]
+                index += 1
+                tags = ', '.join(post["tags"])
+                logger.info(f"Found new post: {post['title']} published by {post['published']} with tags: {tags}")
+                if not category:
+                    logger.error(f"⚠️ Could not classify post: {post['title']}")
+                    category = enums.PublisherCategory.GENERAL.value
                 
-                publisher["last_scraped_at"] = datetime.now(timezone.utc).isoformat()
-                db.update_publisher(conn, publisher["id"], publisher["last_scraped_at"])
-                conn.commit()
-            except Exception as e:
-                logger.exception(f"Error while scraping publisher: {publisher['publisher_name']}")
-                conn.rollback()    
+                logger.info(f" {category} - Classified post '{post['title']}'")
+    
+                post_id = db.add_post(conn, post['url'], post['title'], publisher['id'], tags, post['published'], category,
+                                      guid=post.get('guid'))
+                db.save_post_embedding(conn, post_id, encode_blob(embedding), EMBEDDING_TEXT_VERSION)
+                added.append((post_id, post['url']))
+            
+            publisher["last_scraped_at"] = datetime.now(timezone.utc).isoformat()
+            db.update_publisher(conn, publisher["id"], publisher["last_scraped_at"])
+            conn.commit()
+            stored_posts += added
+        except Exception as e:
+            logger.exception(f"Error while scraping publisher: {publisher['publisher_name']}")
+            conn.rollback()    
+
+    # Embeddings stored from an older post text are brought up to the current one,
+    # so the store and ANN index never compare vectors of two text formats for long
+    try:
+        reencode_stale(db, conn)
+    except Exception:
+        logger.exception("Error while re-encoding stale embeddings")
+
+    # Export new embeddings to the shared memory-mapped store, then bring the persisted
+    # ANN index up to date, so web workers only replay what changed after this
+    try:
+        store = EmbeddingStore(store_path(db.db_path))
+        store.sync(db, conn)
+        post_vectors = PostVectorIndex(index_path(db.db_path), store)
+        post_vectors.refresh(db, conn)
+        post_vectors.save()
+    except Exception:
+        logger.exception("Error while updating the embedding store and post vector index")
+
+    # Fetch and extract the new articles now, so their first reader gets a local read
+    try:
+        prefetch_articles(db, conn, stored_posts, cancel_event=cancel_event)
+    except Exception:
+        logger.exception("Error while prefetching article content")
 
 if __name__ == "__main__":
     logger.info("Scraping pubs started")
@@ -11,30 +11,27 @@ from email.utils import formataddr
 from logger_config import get_logger
 from collections import defaultdict
 import random
-from jinja2 import Template
+import time
 from dotenv import load_dotenv
+from functools import lru_cache
+from mailer import DeliveryEngine, SMTPSessionPool
+from digest_renderer import DigestRenderer
 from urllib.parse import urlparse                                                                                 
 
 load_dotenv()   
 
 # === CONFIG ===
-SMTP_SERVER = "smtp.zoho.in"
-SMTP_PORT = 587
+SMTP_SERVER = os.getenv('SMTP_SERVER', "smtp.zoho.in")
+SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+OUTBOX_COMMIT_BATCH = int(os.getenv('OUTBOX_COMMIT_BATCH', 100))  # digests per state-transition commit
 SMTP_USERNAME = os.getenv('SMTP_USERNAME', 'xxxx@onesearch.blog')
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', 'xxxx')
-PRIMARY_COLOR = '#d97757'  # Claude theme
 print(f"SMTP_USERNAME: {SMTP_USERNAME}, SMTP_PASSWORD: {'*' * len(SMTP_PASSWORD)}")
 
 logger = get_logger("send_notification_worker")
 
 
-def favicon_url(post_url):
-    try:
-        domain = urlparse(post_url).netloc
-        return f"https://www.google.com/s2/favicons?domain={domain}&sz=32"
-    except Exception:
-        return None
-
 # === EMAIL TEMPLATE ===
 
 # === MAIN LOGIC ===
@@ -55,7 +52,12 @@ def get_random_subject():
     return f"OneSearch Digest: {tagline}"
 
 
-def send_email(to_email, subject, html_body, logo_path=None, header_path=None):
+@lru_cache(maxsize=4)
+def _read_image(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def build_message(to_email, subject, html_body, header_path=None):
     msg = MIMEMultipart("related")
     msg["To"] = to_email
     msg["Subject"] = subject
@@ -68,24 +70,17 @@ def send_email(to_email, subject, html_body, logo_path=None, header_path=None):
     alt_part.attach(MIMEText(html_body, "html"))
     msg.attach(alt_part)
 
-    # Optional inline image
-    # if logo_path and os.path.exists(logo_path):
-    #     with open(logo_path, "rb") as f:
-    #         img_data = f.read()
-    #     image = MIMEImage(img_data)
-    #     image.add_header("Content-ID", "<logo>")
-    #     image.add_header("Content-Disposition", "inline", filename=os.path.basename(logo_path))
-    #     msg.attach(image)
-    
+    # Header image bytes are read from disk once per process
     if header_path and os.path.exists(header_path):
-        with open(header_path, "rb") as f:
-            img_data = f.read()
-        image = MIMEImage(img_data)
+        image = MIMEImage(_read_image(header_path))
         image.add_header("Content-ID", "<header>")
         image.add_header("Content-Disposition", "inline", filename=os.path.basename(header_path))
         msg.attach(image)
+    return msg
 
-    # Send email
+def send_email(to_email, subject, html_body, logo_path=None, header_path=None):
+    """One-off send over its own connection; bulk sends go through DeliveryEngine."""
+    msg = build_message(to_email, subject, html_body, header_path=header_path)
     with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
         server.starttls()
         server.login(SMTP_USERNAME, SMTP_PASSWORD)
@@ -104,189 +99,107 @@ def deduplicate_notifications(notifications):
 
 def leave_unmature_notifications(notifications):
     """Remove unmatured based on timing of the subscriber. if subcriber frequency is diff, the notification stays in the queue"""
-    matured = []
-    for row in notifications:
-        maturity_dt = datetime.fromisoformat(row['maturity_date'])        
-
-        if maturity_dt.tzinfo is None:
-            maturity_dt = maturity_dt.replace(tzinfo=timezone.utc)        
-
-        if maturity_dt <= datetime.now(timezone.utc):
-            matured.append(row)
-            
-    return matured
+    now_ts = time.time()
+    return [row for row in notifications if row['maturity_ts'] is not None and row['maturity_ts'] <= now_ts]
 
 def process_notifications(db, conn, target_email=None, cancel_event=None):
-    notifications = db.get_active_notifications(conn)
-    if target_email:
-        notifications = [n for n in notifications if n["email"].lower() == target_email.lower()]
-        logger.info(f"filtering for {target_email}: {len(notifications)} notifications")
-    logger.info(f"found {len(notifications)} notifications to be processed")
-
-    notifications = deduplicate_notifications(notifications)
-    logger.info(f"After dedup, found {len(notifications)} notifications to be processed")
-
-    notifications = leave_unmature_notifications(notifications)
-    logger.info(f"After leaving unmatured, found {len(notifications)} notifications to be processed")
-
-    # fetch like counts for all posts in one query
-    urls = [n['post_url'] for n in notifications]
-    like_counts = db.get_like_counts_by_urls(conn, urls)
-    for n in notifications:
-        n['like_count'] = like_counts.get(n['post_url'], 0)
-
-    notifications_by_email = defaultdict(list)
-    for row in notifications:
-        notifications_by_email[row["email"]].append(row)
-
-    organised_by_heading = {}
-    for email, rows in notifications_by_email.items():
-        heading_map = defaultdict(list)
-        for row in rows:
-            heading = row["heading"]
-            publisher, category = heading.split(",", 1)
-            row["publisher"] = publisher.strip()
-            heading_map[category.strip()].append(row)
-        organised_by_heading[email] = heading_map
-    
-    # Load static template once
-    with open("static/email_template_v2.html", "r") as f:
-        html_template = Template(f.read())
-
+    # Outbox: matured notifications (plus due retries and stale claims from a crashed
+    # run) move to 'sending' in one transaction before anything is mailed
+    notifications = db.claim_digests(conn, target_email=target_email)
+    # Every claimed digest not handed to SMTP by the end is released, whatever fails on the way
+    digest_keys = {row["email"]: row["digest_key"] for row in notifications}
+    engine = None
     failed_emails = []
+    sent, failed = [], []
 
-    for email, heading_map in organised_by_heading.items():
-        if cancel_event and cancel_event.is_set():
-            from app import JobCancelledError
-            raise JobCancelledError()
-        subject = get_random_subject()
-
-        MONO = "Courier New, Courier, monospace"
-
-        category_sections = ""
-        all_notifications_for_email = []
-        for heading, notifications_for_email in heading_map.items():
-            category = heading
-
-            #formatting before sending mail
-            for notification in notifications_for_email:
-                notification['post_title'] = notification['post_title'][0].upper() + notification['post_title'][1:]
-                notification['publisher'] = notification['publisher'][0].upper() + notification['publisher'][1:]
-
-            def favicon_td(n):
-                url = favicon_url(n["post_url"])
-                if url:
-                    return f'<td style="vertical-align:middle; padding-right:6px;"><img src="{url}" width="13" height="13" alt="" style="display:block; border-radius:2px; opacity:0.85;"></td>'
-                return ''
-
-            def likes_td(n):
-                count = n.get("like_count", 0)
-                if count > 0:
-                    return f'<td style="font-size:11px; color:#444440; font-family:{MONO};">// &#9829; {count}</td>'
-                return ''
-
-            blog_items = "".join([
-                f"""
-                <table width="100%" cellpadding="0" cellspacing="0" border="0"
-                       style="margin-bottom:8px; background:#161614; border-radius:6px;
-                              border:1px solid #252522;">
-                  <tr>
-                    <td style="padding:2px 14px 2px 0; width:3px; background:{PRIMARY_COLOR}; border-radius:6px 0 0 6px; font-size:0; line-height:0;">&#8203;</td>
-                    <td style="padding:13px 16px;">
-                      <!-- Publisher row with favicon -->
-                      <table cellpadding="0" cellspacing="0" border="0" style="margin-bottom:6px;">
-                        <tr>
-                          <td style="vertical-align:middle; padding-right:5px; font-size:11px; color:#555550;">@</td>
-                          {favicon_td(notification)}
-                          <td style="vertical-align:middle;">
-                            <span style="font-size:11px; font-weight:700; color:{PRIMARY_COLOR};
-                                         text-transform:uppercase; letter-spacing:0.08em; font-family:{MONO};">
-                              {notification['publisher']}
-                            </span>
-                          </td>
-                        </tr>
-                      </table>
-                      <!-- Post title -->
-                      <a href="{notification['post_url']}"
-                         style="font-size:14px; font-weight:700; color:#e8e5e0;
-                                text-decoration:none; line-height:1.45; display:block;
-                                font-family:{MONO}; letter-spacing:-0.01em;">
-                        {notification['post_title']}
-                      </a>
-                      <table cellpadding="0" cellspacing="0" border="0" style="margin-top:10px;">
-                        <tr>
-                          <td style="padding-right:16px;">
-                            <a href="{notification['post_url']}"
-                               style="font-size:11px; color:{PRIMARY_COLOR}; font-weight:700;
-                                      text-decoration:none; font-family:{MONO};
-                                      letter-spacing:0.03em;">
-                              $ open post &#8594;
-                            </a>
-                          </td>
-                          {likes_td(notification)}
-                        </tr>
-                      </table>
-                    </td>
-                  </tr>
-                </table>
-                """
-                for notification in notifications_for_email
-            ])
-
-            all_notifications_for_email.extend(notifications_for_email)
-
-            category_sections += f"""
-                <table width="100%" cellpadding="0" cellspacing="0" border="0"
-                       style="margin-bottom:26px;">
-                  <tr>
-                    <td style="padding-bottom:10px;">
-                      <p style="margin:0 0 2px; font-size:10px; color:#333330; font-family:{MONO}; letter-spacing:0.05em;">
-                        // category
-                      </p>
-                      <h2 style="margin:0; font-size:12px; font-weight:700; color:{PRIMARY_COLOR};
-                                 text-transform:uppercase; letter-spacing:0.1em; font-family:{MONO};
-                                 border-bottom:1px dashed #2a2a26; padding-bottom:8px;">
-                        {category}
-                      </h2>
-                    </td>
-                  </tr>
-                  <tr>
-                    <td>
-                      {blog_items}
-                    </td>
-                  </tr>
-                </table>
-            """
-
-        # Render template with dynamic sections
-        html_body = html_template.render(category_sections=category_sections, primary_color=PRIMARY_COLOR)
-
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-        header_file = os.path.join(BASE_DIR, "static", "og-preview.png")
-
-        try:
-            send_email(email, subject, html_body, header_path=header_file)
-            logger.info(f"✅ Email sent successfully: {email}")
-        except Exception as e:
-            logger.error(f"❌ Failed to send to {email}: {e}")
-            failed_emails.append((email, e))
-            continue
-
-        for notification in all_notifications_for_email:
-            logger.info(f"Deleting notification for email: {email} and post url: {notification['post_url']}")
+    def flush():
+        if sent or failed:
+            db.complete_digests(conn, sent=sent, failed=failed)
+            conn.commit()
+            sent.clear()
+            failed.clear()
 
-        for notification in all_notifications_for_email:
-            db.delete_notification(conn, email, notification['post_url'])
+    try:
+        if target_email:
+            logger.info(f"filtering for {target_email}: {len(notifications)} notifications")
+        logger.info(f"found {len(notifications)} notifications to be processed")
+
+        notifications = deduplicate_notifications(notifications)
+        logger.info(f"After dedup, found {len(notifications)} notifications to be processed")
+
+        # fetch like counts for all posts in one query
+        urls = [n['post_url'] for n in notifications]
+        like_counts = db.get_like_counts_by_urls(conn, urls)
+        for n in notifications:
+            n['like_count'] = like_counts.get(n['post_url'], 0)
+
+        notifications_by_email = defaultdict(list)
+        for row in notifications:
+            notifications_by_email[row["email"]].append(row)
+
+        organised_by_heading = {}
+        for email, rows in notifications_by_email.items():
+            heading_map = defaultdict(list)
+            for row in rows:
+                heading = row["heading"]
+                publisher, category = heading.split(",", 1)
+                row["publisher"] = publisher.strip()
+                heading_map[category.strip()].append(row)
+            organised_by_heading[email] = heading_map
+
+        # Templates compile once; each post card renders once and is shared by every recipient
+        renderer = DigestRenderer()
+        header_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "og-preview.png")
+
+        def digests():
+            for email, heading_map in organised_by_heading.items():
+                subject = get_random_subject()
+                html_body = renderer.render(heading_map)
+                message = build_message(email, subject, html_body, header_path=header_file)
+                # Same digest_key on a resend, so receiving servers can drop the duplicate
+                message["Message-ID"] = f"<{digest_keys[email]}@{SMTP_USERNAME.split('@')[-1]}>"
+                yield email, email, message
+
+        engine = DeliveryEngine(SMTPSessionPool(SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD,
+                                                starttls=SMTP_STARTTLS))
+        # Sends run on the engine's workers; all DB writes stay on this thread's connection
+        for email, error in engine.deliver(digests(), should_stop=cancel_event):
+            digest_key = digest_keys.pop(email)
+            if error is not None:
+                logger.error(f"❌ Failed to send to {email}: {error}")
+                failed_emails.append((email, error))
+                failed.append(digest_key)
+            else:
+                logger.info(f"✅ Email sent successfully: {email}")
+                sent.append((digest_key, email))
+            if len(sent) + len(failed) >= OUTBOX_COMMIT_BATCH:
+                flush()
+    finally:
+        if engine is not None:
+            engine.close()
+        flush()
+        # Claimed but never handed to SMTP (cancelled, or failed before or during render);
+        # sends already started were reported by deliver() before the error propagated
+        if digest_keys:
+            db.complete_digests(conn, released=list(digest_keys.values()))
             conn.commit()
 
-        db.update_subscription_last_notified(conn, email)
-        conn.commit()
+    stats = engine.stats()
+    logger.info(f"Delivery finished: {stats['sent']} sent, {stats['failed']} failed in {stats['elapsed_s']}s "
+                f"({stats['emails_per_sec']} emails/sec, p95 {stats['p95_ms']}ms, "
+                f"{stats['sessions_opened']} sessions, {stats['reconnects']} reconnects)")
+    render_stats = renderer.stats()
+    logger.info(f"Rendered {render_stats['misses']} distinct post cards, reused {render_stats['hits']}")
+
+    if cancel_event and cancel_event.is_set():
+        from app import JobCancelledError
+        raise JobCancelledError()
 
     if failed_emails:
         summary = ", ".join(f"{e}" for _, e in failed_emails)
         raise RuntimeError(f"Failed to send to {len(failed_emails)} recipient(s): {summary}")
             
+
 if __name__ == "__main__":
     db = get_database()
     conn = db.get_connection()
@@ -0,0 +1,136 @@
+# single_flight.py
+"""
+Keyed single-flight: concurrent requests for the same expensive work share one
+execution instead of each doing it.
+
+Within a worker, the first caller for a key runs the work and the others block
+on it and get its result (or exception). Across gunicorn workers (and jobs),
+the running caller holds a per-key file lock; a caller in another process waits
+for that lock and then calls `recheck` first, which normally finds the result
+the other process just stored (article content, TTS cache) and skips the work.
+
+Lock files live in SINGLE_FLIGHT_DIR and are removed on release. A caller that
+waits longer than SINGLE_FLIGHT_WAIT_SECONDS for another thread or process
+gives up waiting and does the work itself, so a hung holder cannot block readers.
+"""
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logger_config import get_logger
+
+logger = get_logger("single_flight")
+
+SINGLE_FLIGHT_DIR = os.getenv("SINGLE_FLIGHT_DIR", "data/locks")
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", 120))
+_POLL_SECONDS = 0.05
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, lock_dir=SINGLE_FLIGHT_DIR, wait_seconds=SINGLE_FLIGHT_WAIT_SECONDS):
+        self.lock_dir = lock_dir
+        self.wait_seconds = wait_seconds
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.shared = 0
+
+    def _path(self, key):
+        return os.path.join(self.lock_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".lock")
+
+    @contextmanager
+    def lock(self, key):
+        """
+        Hold `key` exclusively across threads and processes. Yields True once held,
+        or False if another holder outlasted the wait and we proceed without it.
+        """
+        os.makedirs(self.lock_dir, exist_ok=True)
+        path = self._path(key)
+        deadline = time.monotonic() + self.wait_seconds
+        fd = None
+        while True:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                fd = None
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(_POLL_SECONDS)
+                continue
+            # The previous holder unlinks the file on release; make sure we locked the live one
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+            fd = None
+
+        if fd is None:
+            logger.warning(f"Gave up waiting {self.wait_seconds}s for {key}; running without the lock")
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def do(self, key, fn, recheck=None):
+        """
+        Return fn() for `key`, running it at most once at a time across threads and
+        processes. recheck() is called under the lock before fn(); a non-None
+        result from it is returned instead (work finished by another process).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            if not call.done.wait(self.wait_seconds):
+                logger.warning(f"Gave up waiting {self.wait_seconds}s for {key}; running it ourselves")
+                result = recheck() if recheck else None
+                if result is None:
+                    self.executions += 1
+                    result = fn()
+                return result
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self.lock(key):
+                result = recheck() if recheck else None
+                if result is None:
+                    self.executions += 1
+                    result = fn()
+            call.result = result
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.shared += call.waiters
+            call.done.set()
+
@@ -2,6 +2,14 @@ import os
 
 os.environ["FLASK_ENV"] = "test"   # must be first
 
+import tempfile
+# Keep the default embedder's cache out of data/
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="onesearch-tests-"), "embedding_cache.db")
+
+import glob
+import re
+import zlib
+import numpy as np
 import pytest
 import smtplib
 from db.sqlite import SQLiteDatabase
@@ -17,12 +25,15 @@ logger.debug("=================== Test Session Starts =================== ")
 @pytest.fixture(scope="function")
 def db():
     db_path = "data/tests.db"
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    # WAL mode leaves -wal/-shm side files next to the database; vector index and store files live there too
+    for path in [db_path, db_path + "-wal", db_path + "-shm"] + glob.glob(db_path + ".*"):
+        if os.path.exists(path):
+            os.remove(path)
     # use in-memory DB for testing
     db_instance = SQLiteDatabase(db_path)
     logger.debug("Test Database Initialised")
     yield db_instance
+    db_instance.close()
     
 class DummySMTP:
     def __init__(self):
@@ -95,4 +106,39 @@ def pytest_terminal_summary(terminalreporter, exitstatus, config):
         tw.line(f"  🤔 XPassed: {xpassed}", magenta=True)
 
     tw.line(f"\n  Total: {total}", bold=True)
-    tw.line("="*40 + "\n", bold=True)
\ No newline at end of file
+    tw.line("="*40 + "\n", bold=True)
+
+class FakeEmbedder:
+    """
+    Deterministic stand-in for the embedding model: a hashed bag of words, so texts
+    sharing words are similar. Records every batch of post texts it encodes.
+    """
+    dim = 64
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, normalize=False):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if texts and texts[0].lower().startswith("title:"):
+            self.calls.append(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in re.findall(r"[a-z0-9]+", text.lower()):
+                vectors[i, zlib.crc32(word.encode()) % self.dim] += 1
+        if normalize:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+
+@pytest.fixture
+def fake_embedder(monkeypatch):
+    """Route classifier encodes to a FakeEmbedder (no model download), baseline classifier only."""
+    import classifier
+    embedder = FakeEmbedder()
+    monkeypatch.setattr(classifier, "embedder", embedder)
+    monkeypatch.setattr(classifier, "trained_clf", None)
+    classifier.category_matrix.cache_clear()
+    yield embedder
+    classifier.category_matrix.cache_clear()
@@ -0,0 +1,70 @@
+import lxml.html
+import pytest
+from article_extractor import extract_article_html
+
+URL = "https://blog.example.com/posts/redis/index.html"
+
+PARAGRAPH = ("The event loop handles every client on one thread, so commands never contend for locks "
+             "and latency stays flat until the CPU is saturated. ")
+
+PAGE = f"""<!DOCTYPE html><html><head><title>Redis</title></head><body>
+<nav>{''.join(f'<a href="/s/{i}">Section {i}</a>' for i in range(20))}</nav>
+<article>
+<h1>Inside the event loop</h1>
+<p>{PARAGRAPH * 3}<a href="../docs/loop.html">docs</a></p>
+<p><img src="data:image/gif;base64,R0lGOD" data-src="img/loop.png" data-srcset="img/loop@2x.png 2x"></p>
+<figure><picture><source data-srcset="img/arch.webp 1x"><img data-lazy-src="/img/arch.jpg"></picture>
+<figcaption>Architecture</figcaption></figure>
+<p>{PARAGRAPH * 2}Legend <svg viewBox="0 0 26 37"><rect width="26" height="37"/></svg>
+and <svg viewBox="0 0 10 20" width="15" height="30"><circle r="4"/></svg></p>
+<pre>First prose block
+with a <a href="notes.html">link</a>
+
+Second prose block</pre>
+<pre><code>while True:
+    poll()</code></pre>
+<p>{PARAGRAPH}<span>Press enter or click to view image in full size</span></p>
+<p>{PARAGRAPH * 2}</p><div role="button"><img src="/img/zoom.png"><p>Zoom</p></div>
+<p>{PARAGRAPH * 2}</p>
+</article>
+<footer>Copyright</footer></body></html>"""
+
+
+@pytest.mark.articles
+def test_extraction_keeps_media_and_fixes_markup():
+    html = extract_article_html(PAGE, URL)
+    root = lxml.html.fragment_fromstring(html, create_parent="div")
+    text = root.text_content()
+
+    assert "Inside the event loop" in text and "Section 3" not in text and "Copyright" not in text
+    # Lazy images resolved and every URL absolute
+    images = [img.get("src") for img in root.iter("img")]
+    assert "https://blog.example.com/posts/redis/img/loop.png" in images
+    assert "https://blog.example.com/img/arch.jpg" in images and "https://blog.example.com/img/zoom.png" in images
+    assert "https://blog.example.com/posts/redis/img/loop@2x.png 2x" in [img.get("srcset") for img in root.iter("img")]
+    hrefs = [a.get("href") for a in root.iter("a")]
+    assert "https://blog.example.com/posts/docs/loop.html" in hrefs
+    assert "https://blog.example.com/posts/redis/notes.html" in hrefs
+
+    # Figure media re-injected before the caption
+    figure = next(root.iter("figure"))
+    assert figure.find(".//img") is not None and figure[-1].tag == "figcaption"
+
+    # SVG sizes from the page, or derived from the viewBox
+    sizes = {svg.get("viewbox"): (svg.get("width"), svg.get("height")) for svg in root.iter("svg")}
+    assert sizes == {"0 0 26 37": ("26", "37"), "0 0 10 20": ("15", "30")}
+
+    # Prose <pre> became paragraphs (link kept); code blocks stay <pre>
+    pres = list(root.iter("pre"))
+    assert len(pres) == 1 and pres[0].find("code") is not None
+    paragraphs = [p.text_content() for p in root.iter("p")]
+    assert "First prose block with a link" in paragraphs and "Second prose block" in paragraphs
+
+    # UI-only spans dropped, button wrappers unwrapped
+    assert "click to view" not in text
+    assert not [div for div in root.iter("div") if div.get("role") == "button"]
+
+
+@pytest.mark.articles
+def test_empty_page_extracts_nothing():
+    assert extract_article_html("   ", URL) is None
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from article_store import get_article, ArticleNotFoundError
+from db import enums
+from single_flight import SingleFlight
+
+PAGE = """<html><head><title>{title}</title></head><body>
+<nav><a href="/">Home</a></nav>
+<article><h1>{title}</h1><span class="info">posted by antirez</span>
+{paragraphs}
+<img src="/img/diagram.png"></article>
+<footer>Copyright</footer></body></html>"""
+
+
+class _ArticleHandler(BaseHTTPRequestHandler):
+    version = "v1"
+    status = 200
+    delay = 0
+    requests = []
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests.append(self.headers.get("If-None-Match"))
+        time.sleep(cls.delay)
+        if cls.status != 200:
+            self.send_error(cls.status)
+            return
+        etag = f'"{cls.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        paragraphs = "".join(f"<p>Revision {cls.version} paragraph {i} about event loops and "
+                             f"single threaded servers, with enough prose to be kept.</p>" for i in range(8))
+        body = PAGE.format(title=f"Redis {cls.version}", paragraphs=paragraphs).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def article_server():
+    _ArticleHandler.version, _ArticleHandler.status, _ArticleHandler.delay = "v1", 200, 0
+    _ArticleHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ArticleHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.db
+@pytest.mark.articles
+def test_article_is_fetched_once_and_revalidated(db, article_server):
+    conn = db.get_connection()
+    publisher_id = db.add_publisher(conn, "antirez", "individual")
+    post_id = db.add_post(conn, f"http://127.0.0.1:{article_server}/redis", "Redis", publisher_id, "",
+                          "2025-01-01T00:00:00+00:00", enums.PublisherCategory.SOFTWARE_ENGINEERING.value)
+    conn.commit()
+    conn.close()
+
+    article = get_article(db, post_id)
+    assert "paragraph 3" in article["html"] and "paragraph 3" in article["text"]
+    assert f"http://127.0.0.1:{article_server}/img/diagram.png" in article["html"]
+    assert "posted by antirez" not in article["html"]        # publisher clean_article applied
+    assert article["title"] == "Redis" and article["source"] == "generic"
+
+    # Fresh: served from the table (as any other worker would see it), no origin request
+    assert get_article(db, post_id)["html"] == article["html"]
+    assert _ArticleHandler.requests == [None]
+
+    # Past its TTL: conditional GET, 304 keeps the stored copy
+    assert get_article(db, post_id, max_age=0)["html"] == article["html"]
+    assert _ArticleHandler.requests == [None, '"v1"']
+
+    # Changed at origin: re-extracted and replaced
+    _ArticleHandler.version = "v2"
+    assert "Revision v2" in get_article(db, post_id, max_age=0)["html"]
+    assert "Revision v2" in get_article(db, post_id)["text"] and len(_ArticleHandler.requests) == 3
+
+    # Origin down: the stale copy is still served
+    _ArticleHandler.status = 500
+    assert "Revision v2" in get_article(db, post_id, max_age=0)["html"]
+
+    with pytest.raises(ArticleNotFoundError):
+        get_article(db, post_id + 1)
+
+
+@pytest.mark.db
+@pytest.mark.articles
+def test_prefetch_stores_recent_posts_without_content(db, article_server):
+    from prefetch_articles import prefetch_articles
+
+    conn = db.get_connection()
+    publisher_id = db.add_publisher(conn, "antirez", "individual")
+    post_ids = [db.add_post(conn, f"http://127.0.0.1:{article_server}/post-{i}", f"Post {i}", publisher_id, "",
+                            "2025-01-01T00:00:00+00:00", enums.PublisherCategory.SOFTWARE_ENGINEERING.value)
+                for i in range(3)]
+    conn.commit()
+
+    assert prefetch_articles(db, conn) == (3, 0)
+    assert len(_ArticleHandler.requests) == 3
+    assert db.get_posts_missing_article_content(conn, 0, 10) == []
+    # Readers now hit the store, and a second run finds nothing left to do
+    assert "paragraph 1" in get_article(db, post_ids[0])["html"]
+    assert prefetch_articles(db, conn) == (0, 0)
+    assert len(_ArticleHandler.requests) == 3
+    conn.close()
+
+
+@pytest.mark.db
+@pytest.mark.articles
+def test_concurrent_readers_share_one_fetch(db, article_server):
+    conn = db.get_connection()
+    publisher_id = db.add_publisher(conn, "antirez", "individual")
+    post_id = db.add_post(conn, f"http://127.0.0.1:{article_server}/redis", "Redis", publisher_id, "",
+                          "2025-01-01T00:00:00+00:00", enums.PublisherCategory.SOFTWARE_ENGINEERING.value)
+    conn.commit()
+    conn.close()
+
+    _ArticleHandler.delay = 0.3
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_article(db, post_id)["html"])) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 8 and len(set(results)) == 1 and "paragraph 3" in results[0]
+    assert _ArticleHandler.requests == [None]
+
+
+def test_single_flight_across_workers(tmp_path):
+    # Two instances stand in for two gunicorn workers sharing only the lock directory
+    workers = [SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))]
+    stored, calls = {}, []
+
+    def build():
+        calls.append(1)
+        time.sleep(0.2)
+        stored["value"] = "built"
+        return "built"
+
+    results = []
+    threads = [threading.Thread(target=lambda w=w: results.append(w.do("tts:1", build, recheck=lambda: stored.get("value"))))
+               for w in workers for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["built"] * 6 and len(calls) == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_single_flight_waiter_gives_up_on_a_hung_leader(tmp_path):
+    flight = SingleFlight(str(tmp_path), wait_seconds=0.2)
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("article:1", lambda: release.wait(5) and "slow"))
+    leader.start()
+    while not flight._calls:
+        time.sleep(0.01)
+
+    start = time.monotonic()
+    assert flight.do("article:1", lambda: "fallback") == "fallback"
+    assert time.monotonic() - start < 2
+    release.set()
+    leader.join()
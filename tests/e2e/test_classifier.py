@@ -0,0 +1,84 @@
+import itertools
+import numpy as np
+import pytest
+import classifier
+from db import enums
+
+
+def _baseline_boosts(text):
+    """The original per-keyword substring check: +boost once per category with any keyword in the text."""
+    text = text.lower()
+    boosts = np.zeros(len(classifier.CATEGORY_NAMES), dtype=np.float32)
+    for cat, kw_list in classifier.keywords_map.items():
+        for kw in kw_list:
+            if kw in text:
+                boosts[classifier.CATEGORY_NAMES.index(cat)] += classifier.KEYWORD_BOOST
+                break
+    return boosts
+
+
+def _baseline_classify(embedder, title, tags="", content=""):
+    """The original classify_with_embeddings, one post at a time with a dict of cosine scores."""
+    content_snippet = content[:100] if content else ""
+    combined_text = f"Title: {title}. Tags: {tags}. Content: {content_snippet}".lower()
+    text_embedding = embedder.encode(combined_text)
+    scores = {}
+    for cat, desc in classifier.categories.items():
+        emb = embedder.encode(desc)
+        scores[cat] = float(text_embedding @ emb / (np.linalg.norm(text_embedding) * np.linalg.norm(emb)))
+    for cat, kw_list in classifier.keywords_map.items():
+        for kw in kw_list:
+            if kw in combined_text:
+                scores[cat] += 0.1
+                break
+    best_cat = max(scores, key=scores.get)
+    top_score, second_score = sorted(scores.values(), reverse=True)[:2]
+    if top_score < 0.25 or (top_score - second_score) < 0.05:
+        return enums.PublisherCategory.GENERAL.value, scores
+    return best_cat, scores
+
+
+# Keywords inside other keywords ("api" / "rest api", "react" / "react native", "java" /
+# "javascript", "testing" / "load testing") and inside ordinary words ("rag" in "storage",
+# "css" in "access", "ios" in "scenarios", "helm" in "overwhelm")
+CORPUS = [
+    ("Designing a REST API for payments", "backend, api"),
+    ("React Native at scale", "mobile, react"),
+    ("Why JavaScript is not Java", "frontend"),
+    ("Load testing and performance testing with k6", "qa"),
+    ("Object storage access patterns", "infrastructure"),
+    ("Scenarios that overwhelm your Helm charts", "kubernetes"),
+    ("Fine-tuning a large language model", "llm, mlops"),
+    ("Building a data pipeline on Spark and Airflow", "etl"),
+    ("OAuth and zero trust authentication", "security"),
+    ("Roadmap prioritization with OKRs", "product strategy"),
+    ("Our engineering culture", ""),
+    ("Go lang services behind gRPC", "golang, grpc"),
+]
+
+
+def test_keyword_boosts_match_per_keyword_substring_checks():
+    keywords = sorted({kw for kw_list in classifier.keywords_map.values() for kw in kw_list})
+    texts = [f"{title} {tags}" for title, tags in CORPUS]
+    # Every ordered pair of keywords, glued together and space separated: covers overlaps
+    # across a keyword boundary as well as keywords contained in longer ones
+    texts += [a + b for a, b in itertools.permutations(keywords, 2)]
+    texts += [f"{a} {b}" for a, b in itertools.combinations(keywords, 2)]
+
+    boosts = classifier._keyword_boosts(texts)
+    expected = np.stack([_baseline_boosts(text) for text in texts])
+    mismatched = [texts[i] for i in np.flatnonzero((boosts != expected).any(axis=1))]
+    assert mismatched == []
+
+
+@pytest.mark.embeddings
+def test_classify_many_matches_baseline_classifier(fake_embedder):
+    categories, scores = classifier.classify_many([classifier.post_text(title, tags) for title, tags in CORPUS])
+
+    for i, (title, tags) in enumerate(CORPUS):
+        expected, expected_scores = _baseline_classify(fake_embedder, title, tags)
+        assert categories[i] == expected, title
+        assert scores[i] == pytest.approx([expected_scores[cat] for cat in classifier.CATEGORY_NAMES], abs=1e-5)
+        assert classifier.classify_with_embeddings(title, tags) == expected
+    # Not everything collapses to General with this embedder, so the comparison has teeth
+    assert len(set(categories)) > 3
@@ -0,0 +1,93 @@
+import pytest
+import sqlite3
+import threading
+from db.pool import retry_on_busy
+
+
+@pytest.mark.db
+def test_connections_use_wal(db):
+    with db.reader() as conn:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        busy = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+    assert mode == "wal"
+    assert busy > 0
+
+
+@pytest.mark.db
+def test_writer_commits_and_rolls_back(db):
+    with db.writer() as conn:
+        db.add_publisher(conn, "committed", "techteam")
+
+    with pytest.raises(RuntimeError):
+        with db.writer() as conn:
+            db.add_publisher(conn, "rolled-back", "techteam")
+            raise RuntimeError("boom")
+
+    with db.reader() as conn:
+        names = [p["publisher_name"] for p in db.get_publishers(conn)]
+    assert names == ["committed"]
+
+
+@pytest.mark.db
+def test_reader_is_read_only(db):
+    with db.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            db.add_publisher(conn, "nope", "techteam")
+
+
+@pytest.mark.db
+def test_readers_not_blocked_by_open_write_transaction(db):
+    with db.writer() as conn:
+        db.add_publisher(conn, "google", "techteam")
+
+    writer_holding = threading.Event()
+    release_writer = threading.Event()
+
+    def hold_write_lock():
+        with db.writer() as conn:
+            db.add_publisher(conn, "uncommitted", "techteam")
+            writer_holding.set()
+            release_writer.wait(5)
+
+    t = threading.Thread(target=hold_write_lock)
+    t.start()
+    assert writer_holding.wait(5)
+    try:
+        with db.reader() as conn:
+            names = [p["publisher_name"] for p in db.get_publishers(conn)]
+        # reader sees the last committed snapshot and does not wait for the writer
+        assert names == ["google"]
+    finally:
+        release_writer.set()
+        t.join()
+
+    stats = db.pool_stats()
+    assert stats["writers_open"] == 1
+    assert stats["acquired"] >= 3
+
+
+@pytest.mark.db
+def test_pool_reuses_connections(db):
+    with db.reader() as first:
+        pass
+    with db.reader() as second:
+        pass
+    assert first is second
+    assert db.pool_stats()["readers_open"] == 1
+
+
+@pytest.mark.db
+def test_retry_on_busy_retries_locked_errors():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        return "ok"
+
+    assert retry_on_busy(flaky, backoff=0) == "ok"
+    assert len(calls) == 3
+
+    with pytest.raises(sqlite3.OperationalError):
+        retry_on_busy(lambda: (_ for _ in ()).throw(sqlite3.OperationalError("no such table: x")), backoff=0)
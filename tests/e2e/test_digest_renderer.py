@@ -0,0 +1,30 @@
+import pytest
+from digest_renderer import DigestRenderer, like_bucket
+
+
+def _post(url, likes=0, publisher="google"):
+    return {"post_url": url, "post_title": "scaling postgres", "publisher": publisher, "like_count": likes}
+
+
+@pytest.mark.notifications
+def test_cards_are_rendered_once_and_shared():
+    renderer = DigestRenderer()
+    first = renderer.render({"Software Engineering": [_post("https://a.com/1", 3), _post("https://a.com/2")]})
+    second = renderer.render({"Data Science": [_post("https://a.com/1", 3)]})
+
+    assert renderer.stats() == {"cards_cached": 2, "hits": 1, "misses": 2}
+    assert first.count("https://a.com/1") == 2 and "https://a.com/2" in first
+    assert "Scaling postgres" in first and "Google" in first
+    assert "&#9829; 3" in first
+    assert "Software Engineering" in first and "Data Science" in second
+    assert "{{" not in first and first.rstrip().endswith("</html>")
+
+
+@pytest.mark.notifications
+def test_like_buckets():
+    assert [like_bucket(n) for n in (0, 7, 12, 57, 134, 2048)] == [0, 7, 10, 50, 100, 2000]
+    renderer = DigestRenderer()
+    renderer.render({"x": [_post("https://a.com/1", 12)]})
+    renderer.render({"x": [_post("https://a.com/1", 17)]})
+    assert renderer.stats()["misses"] == 1
+    assert "&#9829; 10+" in renderer.render({"x": [_post("https://a.com/1", 19)]})
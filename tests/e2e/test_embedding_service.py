@@ -0,0 +1,161 @@
+import socket
+import threading
+import numpy as np
+import pytest
+from embedding_service import EmbeddingClient, EmbeddingServer, EmbeddingServiceError, MicroBatcher
+
+
+class _HashEmbedder:
+    """Deterministic stand-in for the sentence model: one row per text."""
+    model_id = "hash-test"
+    dim = 8
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32, normalize=False):
+        self.calls += 1
+        if any(text == "boom" for text in texts):
+            raise ValueError("cannot encode boom")
+        vectors = np.array([[(hash(text) >> shift) % 97 + 1 for shift in range(self.dim)] for text in texts],
+                           dtype=np.float32)
+        if normalize:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+@pytest.fixture
+def embedding_server(tmp_path):
+    embedder = _HashEmbedder()
+    server = EmbeddingServer(str(tmp_path / "embedder.sock"), embedder)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, embedder
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.embeddings
+def test_client_round_trips_vectors(embedding_server):
+    server, embedder = embedding_server
+    client = EmbeddingClient(server.server_address, connect_timeout=1)
+
+    texts = ["Title: Kafka at scale", "", "naïve ünïcode ✓"]
+    vectors = client.encode(texts)
+    assert vectors.dtype == np.float32 and vectors.shape == (3, 8)
+    np.testing.assert_array_equal(vectors, embedder.encode(texts))
+
+    single = client.encode("Title: Kafka at scale")
+    np.testing.assert_array_equal(single, vectors[0])
+    np.testing.assert_allclose(np.linalg.norm(client.encode(texts, normalize=True), axis=1), 1.0, rtol=1e-6)
+    assert (client.model_id, client.dim) == ("hash-test", 8)
+    assert client.encode([]).shape == (0, 8)
+
+
+@pytest.mark.embeddings
+def test_client_errors_and_reconnects(embedding_server):
+    server, _ = embedding_server
+    client = EmbeddingClient(server.server_address, connect_timeout=1)
+
+    with pytest.raises(EmbeddingServiceError, match="cannot encode boom"):
+        client.encode(["ok", "boom"])
+    # The connection survives a failed request
+    assert client.encode(["ok"]).shape == (1, 8)
+
+    # A connection dropped under the client is reopened transparently
+    client._local.sock.shutdown(socket.SHUT_RDWR)
+    assert client.encode(["again"]).shape == (1, 8)
+
+    with pytest.raises(EmbeddingServiceError, match="not reachable"):
+        EmbeddingClient(server.server_address + ".missing", connect_timeout=0).encode(["x"])
+
+
+@pytest.mark.embeddings
+def test_micro_batcher_coalesces_concurrent_calls():
+    embedder = _HashEmbedder()
+    batcher = MicroBatcher(embedder, max_batch=64, max_wait_ms=50)
+
+    futures = [batcher.submit(f"issue {i}") for i in range(20)] + [batcher.submit(["a", "b"])]
+    vectors = [future.result(timeout=5) for future in futures]
+    np.testing.assert_array_equal(vectors[3], embedder.encode(["issue 3"])[0])
+    assert vectors[-1].shape == (2, 8)
+    assert embedder.calls < 21 and batcher.stats()["requests"] == 21
+
+    # One failing request does not take down the rest of its batch
+    good, bad = batcher.submit("fine"), batcher.submit(["boom"])
+    assert good.result(timeout=5).shape == (8,)
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    assert batcher.encode([]).shape == (0, 8)
+
+
+@pytest.mark.embeddings
+def test_runtime_selection_and_parity_math():
+    from embedding_runtime import cosine_rows, load_sentence_model
+    from embedding_service import LocalEmbedder
+
+    assert LocalEmbedder("all-mpnet-base-v2", runtime="torch").model_id == "all-mpnet-base-v2"
+    assert LocalEmbedder("all-mpnet-base-v2", runtime="onnx-int8").model_id == "all-mpnet-base-v2@onnx-int8"
+    with pytest.raises(ValueError):
+        load_sentence_model("all-mpnet-base-v2", runtime="tensorrt")
+
+    a = np.array([[1.0, 0.0], [1.0, 1.0]], dtype=np.float32)
+    np.testing.assert_allclose(cosine_rows(a, a * 3), [1.0, 1.0], rtol=1e-6)
+    np.testing.assert_allclose(cosine_rows(a, a[::-1]), [np.sqrt(0.5)] * 2, rtol=1e-6)
+
+
+@pytest.mark.embeddings
+def test_cache_serves_repeats_and_persists(tmp_path):
+    from embedding_cache import CachedEmbedder, EmbeddingCache
+
+    path = str(tmp_path / "cache.db")
+    embedder = _HashEmbedder()
+    cached = CachedEmbedder(embedder, EmbeddingCache(path))
+
+    first = cached.encode(["kafka lag", "grpc", "kafka lag"])
+    assert embedder.calls == 1
+    np.testing.assert_array_equal(first, embedder.encode(["kafka lag", "grpc", "kafka lag"]))
+
+    # Whitespace-only differences hit the same entry; normalization is applied on the way out
+    again = cached.encode(["  kafka   lag ", "grpc"], normalize=True)
+    np.testing.assert_allclose(np.linalg.norm(again, axis=1), 1.0, rtol=1e-6)
+    assert cached.stats()["hits"] == 2 and cached.stats()["misses"] == 3
+
+    # A new process (fresh cache handle) reuses the stored vectors
+    calls = embedder.calls
+    reopened = CachedEmbedder(embedder, EmbeddingCache(path))
+    np.testing.assert_array_equal(reopened.encode("grpc"), first[1])
+    assert embedder.calls == calls and reopened.stats()["hit_rate"] == 1.0
+
+    # Other model ids never see these vectors
+    embedder.model_id = "hash-test-v2"
+    reopened.encode("grpc")
+    assert embedder.calls == calls + 1
+
+
+@pytest.mark.embeddings
+def test_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    import embedding_cache
+    from embedding_cache import EmbeddingCache, text_key
+
+    monkeypatch.setattr(embedding_cache, "EVICT_CHECK_EVERY", 1)
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_TOUCH_SECONDS", 10)
+    cache = EmbeddingCache(str(tmp_path / "cache.db"), max_entries=2)
+    vector = np.ones(4, dtype=np.float32)
+    clock = iter(range(1000, 2000, 10))
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: next(clock))
+
+    cache.put_many("m", [(text_key("a"), vector)])
+    cache.put_many("m", [(text_key("b"), vector)])
+    cache.get_many("m", [text_key("a")])          # "a" is now the most recently used
+
+    # A hit within the touch interval is read-only
+    writes = cache._conn.total_changes
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: 1025)
+    cache.get_many("m", [text_key("a")])
+    assert cache._conn.total_changes == writes
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: next(clock))
+    cache.put_many("m", [(text_key("c"), vector)])
+
+    assert set(cache.get_many("m", [text_key(t) for t in "abc"])) == {text_key("a"), text_key("c")}
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,80 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from db import enums
+
+TOPIC = enums.PublisherCategory.SOFTWARE_ENGINEERING.value
+
+
+def _seed(db, conn, count=7):
+    db.add_publisher(conn, "google", "techteam")
+    db.add_publisher(conn, "martin fowler", "individual")
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        publisher_id = 1 if i % 2 == 0 else 2
+        post_id = db.add_post(conn, f"https://example.com/{i}", f"Post {i}", publisher_id, "tags",
+                              (base + timedelta(days=i)).isoformat(), TOPIC)
+        if i != 3:
+            db.update_post_label(conn, post_id, TOPIC)
+
+
+@pytest.mark.db
+def test_keyset_pages_cover_feed_in_order(db):
+    conn = db.get_connection()
+    _seed(db, conn)
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = db.get_feed_page(conn, filters={"labelled": 1}, cursor=cursor, limit=2)
+        seen.extend(row["title"] for row in rows)
+        if cursor is None:
+            break
+
+    assert seen == ["Post 6", "Post 5", "Post 4", "Post 2", "Post 1", "Post 0"]
+
+    rows, _ = db.get_feed_page(conn, filters={"labelled": 1, "publisher_type": "individual"}, limit=10)
+    assert [row["title"] for row in rows] == ["Post 5", "Post 1"]
+    conn.close()
+
+
+@pytest.mark.db
+def test_projection_and_validation(db):
+    conn = db.get_connection()
+    _seed(db, conn, count=2)
+
+    rows, cursor = db.get_feed_page(conn, limit=None)
+    assert cursor is None
+    assert "embedding" not in rows[0]
+    assert rows[0]["like_count"] == 0
+
+    rows, _ = db.get_feed_page(conn, columns=("id", "embedding"), limit=1)
+    assert set(rows[0]) == {"id", "embedding"}
+
+    with pytest.raises(ValueError):
+        db.get_feed_page(conn, columns=("id", "password"))
+    with pytest.raises(ValueError):
+        db.get_feed_page(conn, filters={"title": "x"})
+    with pytest.raises(ValueError):
+        db.get_feed_page(conn, cursor="not-a-cursor")
+    conn.close()
+
+
+@pytest.mark.db
+def test_time_range_paths_use_epoch_indexes(db):
+    conn = db.get_connection()
+    _seed(db, conn, count=2)
+    db.add_notification(conn, "a@x.com", "google ,x", "v1", "https://example.com/0", "Post 0",
+                        "2025-01-01T05:30:00+05:30")
+    db.add_notification(conn, "a@x.com", "google ,x", "v1", "https://example.com/1", "Post 1",
+                        (datetime.now(timezone.utc) + timedelta(days=1)).isoformat())
+    conn.commit()
+
+    matured = db.get_active_notifications(conn, matured_only=True)
+    assert [(n["post_url"], n["maturity_ts"]) for n in matured] == [("https://example.com/0", 1735689600)]
+
+    plan = " ".join(r["detail"] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM posts WHERE labelled = 1 ORDER BY published_ts DESC, id DESC LIMIT 5"))
+    assert "idx_posts_labelled_published_ts" in plan and "TEMP B-TREE" not in plan
+    plan = " ".join(r["detail"] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM notifications WHERE deleted = 0 AND maturity_ts <= 0"))
+    assert "idx_notifications_maturity" in plan
+    conn.close()
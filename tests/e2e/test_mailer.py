@@ -0,0 +1,73 @@
+import socket
+import time
+import pytest
+from email.mime.text import MIMEText
+from aiosmtpd.controller import Controller
+from mailer import DeliveryEngine, SMTPSessionPool
+
+
+class _Collector:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.mail_from, envelope.rcpt_tos))
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = _Collector()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+def _messages(count, offset=0):
+    for i in range(offset, offset + count):
+        msg = MIMEText(f"digest {i}")
+        msg["From"] = "digest@onesearch.blog"
+        msg["To"] = f"user{i}@example.com"
+        yield i, f"user{i}@example.com", msg
+
+
+@pytest.mark.notifications
+def test_engine_reuses_sessions_and_reconnects(smtp_server):
+    controller, handler = smtp_server
+    pool = SMTPSessionPool(controller.hostname, controller.port, size=3, starttls=False)
+    engine = DeliveryEngine(pool, rate=0)
+
+    results = dict(engine.deliver(_messages(30)))
+    assert sorted(results) == list(range(30)) and not any(results.values())
+    assert pool.connects <= 3
+
+    # Connection dropped under every idle session; the next sends must reconnect transparently
+    for session in list(pool._idle.queue):
+        session.sock.shutdown(socket.SHUT_RDWR)
+    results = dict(engine.deliver(_messages(5, offset=30)))
+    assert results == {i: None for i in range(30, 35)}
+    stats = engine.stats()
+    assert stats["reconnects"] >= 1
+    assert stats["sent"] == 5 and stats["p95_ms"] > 0
+    engine.close()
+
+    assert len(handler.messages) == 35
+    assert {rcpt for _, (rcpt,) in handler.messages} == {f"user{i}@example.com" for i in range(35)}
+
+
+@pytest.mark.notifications
+def test_engine_rate_limit(smtp_server):
+    controller, handler = smtp_server
+    engine = DeliveryEngine(SMTPSessionPool(controller.hostname, controller.port, size=4, starttls=False), rate=20)
+
+    start = time.perf_counter()
+    results = list(engine.deliver(_messages(10)))
+    elapsed = time.perf_counter() - start
+    engine.close()
+
+    assert len(results) == 10 and len(handler.messages) == 10
+    assert elapsed >= 9 / 20
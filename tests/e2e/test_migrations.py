@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import pytest
+from db import migrations
+from db.migrations import migrate, latest_version, rebuild_table, POSTS_TABLE_SQL
+from db.sqlite import SQLiteDatabase
+
+LEGACY_DB = "data/tests_legacy.db"
+
+
+@pytest.fixture
+def legacy_db_path():
+    for path in (LEGACY_DB, LEGACY_DB + "-wal", LEGACY_DB + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    conn = sqlite3.connect(LEGACY_DB)
+    # Shape of a database created before the topic expansion / likes rename
+    conn.executescript("""
+        CREATE TABLE publishers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            publisher_name TEXT NOT NULL,
+            publisher_type TEXT NOT NULL,
+            last_scraped_at DATETIME DEFAULT NULL,
+            UNIQUE (publisher_name)
+        );
+        CREATE TABLE posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            publisher_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            tags TEXT,
+            published_at DATETIME NOT NULL,
+            modified_at DATETIME NOT NULL,
+            labelled BOOL DEFAULT 0,
+            topic TEXT NOT NULL CHECK (topic IN ('Software Engineering', 'Software Testing')),
+            UNIQUE (url)
+        );
+        CREATE TABLE subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL,
+            publisher_id INTEGER NOT NULL,
+            joined_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            topic TEXT NOT NULL CHECK (topic IN ('Software Engineering', 'Software Testing')),
+            frequency_in_days INTEGER DEFAULT 3,
+            last_notified_at DATETIME DEFAULT NULL,
+            active BOOL DEFAULT 1,
+            UNIQUE (email, publisher_id, topic)
+        );
+        CREATE TABLE post_likes (
+            post_id INTEGER NOT NULL,
+            jira_account_id TEXT NOT NULL,
+            liked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (post_id, jira_account_id)
+        );
+        INSERT INTO publishers (publisher_name, publisher_type) VALUES ('google', 'techteam');
+        INSERT INTO subscriptions (email, publisher_id, topic) VALUES ('a@b.com', 1, 'Software Testing');
+        INSERT INTO post_likes (post_id, jira_account_id) VALUES (1, 'a@b.com');
+    """)
+    conn.executemany(
+        "INSERT INTO posts (publisher_id, url, title, published_at, modified_at, topic) VALUES (1, ?, ?, ?, ?, ?)",
+        [(f"url{i}", f"post {i}", "2025-01-01T00:00:00+00:00", "2025-01-01T00:00:00+00:00",
+          "Software Testing" if i % 2 else "Software Engineering") for i in range(1, 26)],
+    )
+    conn.commit()
+    conn.close()
+    yield LEGACY_DB
+
+
+@pytest.mark.db
+def test_fresh_database_is_at_latest_version(db):
+    with db.reader() as conn:
+        versions = [r[0] for r in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [m["version"] for m in migrations.MIGRATIONS]
+    assert versions[-1] == latest_version()
+
+
+@pytest.mark.db
+def test_warm_start_applies_nothing(db):
+    assert migrate(db.db_path) == []
+    # a second instance over the same file does not re-run anything either
+    SQLiteDatabase(db.db_path).close()
+    with db.reader() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+    assert count == len(migrations.MIGRATIONS)
+
+
+@pytest.mark.db
+def test_legacy_database_is_upgraded(legacy_db_path, monkeypatch):
+    monkeypatch.setattr(migrations, "REBUILD_BATCH_SIZE", 10)
+    applied = migrate(legacy_db_path)
+    assert applied == [m["version"] for m in migrations.MIGRATIONS]
+
+    db = SQLiteDatabase(legacy_db_path)
+    with db.reader() as conn:
+        posts = conn.execute("SELECT id, topic, created_at, embedding FROM posts ORDER BY id").fetchall()
+        assert len(posts) == 25
+        assert {p["topic"] for p in posts} == {"QA & Testing", "Software Engineering"}
+        assert all(p["created_at"] for p in posts)
+        stamps = conn.execute("SELECT DISTINCT published_ts, modified_ts FROM posts").fetchall()
+        assert [tuple(r) for r in stamps] == [(1735689600, 1735689600)]
+        sub = conn.execute("SELECT topic FROM subscriptions").fetchone()
+        assert sub["topic"] == "QA & Testing"
+        like = conn.execute("SELECT user_email FROM post_likes").fetchone()
+        assert like["user_email"] == "a@b.com"
+        leftovers = conn.execute("SELECT name FROM sqlite_master WHERE name LIKE '%__rebuild'").fetchall()
+        assert leftovers == []
+    db.close()
+
+
+class _Crash(Exception):
+    pass
+
+
+@pytest.mark.db
+def test_rebuild_table_resumes_partial_copy(legacy_db_path, monkeypatch):
+    migrate(legacy_db_path)
+    conn = sqlite3.connect(legacy_db_path, isolation_level=None)
+    cols = ["id", "publisher_id", "url", "title", "tags", "published_at",
+            "modified_at", "labelled", "topic", "embedding", "created_at"]
+
+    # Crash after the first batch has been copied
+    def crash(msg):
+        raise _Crash(msg)
+    monkeypatch.setattr(migrations.logger, "info", crash)
+    with pytest.raises(_Crash):
+        rebuild_table(conn, "posts", POSTS_TABLE_SQL, cols, batch_size=5)
+    monkeypatch.undo()
+    assert conn.execute("SELECT MAX(id) FROM posts__rebuild").fetchone()[0] == 5
+
+    # Writes while no rebuild is running, to copied and uncopied rows alike
+    conn.execute("UPDATE posts SET title = 'edited' WHERE id IN (2, 20)")
+    conn.execute("DELETE FROM posts WHERE id IN (3, 21)")
+
+    rebuild_table(conn, "posts", POSTS_TABLE_SQL, cols, batch_size=5)
+    rows = conn.execute("SELECT id, title FROM posts ORDER BY id").fetchall()
+    leftovers = conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'posts__rebuild%'").fetchall()
+    conn.close()
+    assert [r[0] for r in rows] == [i for i in range(1, 26) if i not in (3, 21)]
+    assert [r[0] for r in rows if r[1] == "edited"] == [2, 20]
+    assert leftovers == []
+
+
+@pytest.mark.db
+def test_topic_migration_resumes_between_table_rebuilds(legacy_db_path, monkeypatch):
+    rebuild = migrations.rebuild_table
+
+    # Die after posts has been swapped in, partway into the subscriptions copy
+    def crash_on_subscriptions(conn, table, *args, **kwargs):
+        if table == "subscriptions":
+            conn.execute("CREATE TABLE subscriptions__rebuild (id INTEGER PRIMARY KEY)")
+            raise _Crash(table)
+        return rebuild(conn, table, *args, **kwargs)
+    monkeypatch.setattr(migrations, "rebuild_table", crash_on_subscriptions)
+    with pytest.raises(_Crash):
+        migrate(legacy_db_path)
+    monkeypatch.undo()
+
+    migrate(legacy_db_path)
+    db = SQLiteDatabase(legacy_db_path)
+    with db.writer() as conn:
+        assert "Frontend Engineering" in migrations.table_sql(conn, "subscriptions")
+        assert conn.execute("SELECT topic FROM subscriptions").fetchone()["topic"] == "QA & Testing"
+        conn.execute("INSERT INTO subscriptions (email, publisher_id, topic) VALUES ('a@b.com', 1, 'Frontend Engineering')")
+        leftovers = conn.execute("SELECT name FROM sqlite_master WHERE name LIKE '%__rebuild%'").fetchall()
+        assert leftovers == []
+    db.close()
@@ -36,4 +36,33 @@ def test_notify(db):
     
     
     
-    
\ No newline at end of file
+    
+
+@pytest.mark.notifications
+def test_notify_fan_out_counts(db):
+    conn = db.get_connection()
+    topic = enums.PublisherCategory.SOFTWARE_ENGINEERING.value
+
+    db.add_publisher(conn, "google", "techteam")
+    for i in range(3):
+        db.add_subscription(conn, f"User{i}@gmail.com", topic, 1, frequency=2)
+    db.add_subscription(conn, "other@gmail.com", enums.PublisherCategory.DATA_SCIENCE.value, 1)
+    for i in range(2):
+        postid = db.add_post(conn, f"url{i}", f"Post {i}", 1, "tags", datetime.now(timezone.utc).isoformat(), topic)
+        db.update_post_label(conn, postid, topic)
+    conn.commit()
+
+    counts = notify(db, conn)
+    assert counts == {"subscriptions": 4, "candidates": 6, "inserted": 6, "duplicates": 0}
+
+    notifications = db.get_notifications_by_email(conn, "user0@gmail.com")
+    assert sorted(n["post_url"] for n in notifications) == ["url0", "url1"]
+    assert notifications[0]["heading"] == f"google ,{topic}"
+    sub = db.get_subscriptions(conn)[0]
+    joined = datetime.fromisoformat(sub["joined_time"]).replace(tzinfo=timezone.utc)
+    assert notifications[0]["maturity_ts"] == int(joined.timestamp()) + 2 * 86400
+
+    # A second run queues nothing new
+    counts = notify(db, conn)
+    assert (counts["inserted"], counts["duplicates"]) == (0, 6)
+    conn.close()
@@ -0,0 +1,144 @@
+import smtplib
+import pytest
+from email import message_from_string
+from datetime import datetime, timezone
+from send_notifications import process_notifications
+
+
+def _queue(db, conn, email="reader@example.com", count=2):
+    maturity_date = datetime.now(timezone.utc).isoformat()
+    db.add_publisher(conn, "TestCo", "techteam")
+    db.add_subscription(conn, email, "Software Engineering", 1, frequency=0)
+    for i in range(count):
+        db.add_notification(conn, email, "TestCo, Software Engineering", "v1",
+                            f"https://testco.com/post-{i}", f"Post {i}", maturity_date)
+    conn.commit()
+
+
+def _states(conn):
+    return [tuple(r) for r in conn.execute(
+        "SELECT status, attempts, deleted, next_retry_at IS NOT NULL FROM notifications ORDER BY id")]
+
+
+@pytest.mark.notifications
+def test_failed_digest_is_retried_with_backoff(db, dummy_smtp):
+    conn = db.get_connection()
+    _queue(db, conn)
+
+    def refuse(from_addr, to_addrs, msg):
+        raise smtplib.SMTPRecipientsRefused({to_addrs: (550, b"mailbox unavailable")})
+    dummy_smtp.sendmail = refuse
+
+    with pytest.raises(RuntimeError):
+        process_notifications(db, conn)
+    assert _states(conn) == [("failed", 1, 0, 1)] * 2
+
+    # Not due yet: nothing is claimed
+    del dummy_smtp.sendmail
+    process_notifications(db, conn)
+    assert dummy_smtp.sent == []
+
+    conn.execute("UPDATE notifications SET next_retry_at = 0")
+    conn.commit()
+    process_notifications(db, conn)
+    assert len(dummy_smtp.sent) == 1
+    assert _states(conn) == [("sent", 2, 1, 0)] * 2
+    conn.close()
+
+
+@pytest.mark.notifications
+def test_crashed_run_resumes_with_same_idempotency_key(db, dummy_smtp):
+    conn = db.get_connection()
+    _queue(db, conn)
+
+    # A run claims the digest and dies before recording the outcome
+    claimed = db.claim_digests(conn)
+    digest_key = claimed[0]["digest_key"]
+    assert {n["digest_key"] for n in claimed} == {digest_key}
+
+    # Still within the lease: another run must not pick it up
+    process_notifications(db, conn)
+    assert dummy_smtp.sent == []
+
+    conn.execute("UPDATE notifications SET claimed_ts = claimed_ts - 3600")
+    conn.commit()
+    process_notifications(db, conn)
+
+    assert len(dummy_smtp.sent) == 1
+    msg = message_from_string(dummy_smtp.sent[0][2])
+    assert msg["Message-ID"].startswith(f"<{digest_key}@")
+    assert [s for s, *_ in _states(conn)] == ["sent", "sent"]
+    conn.close()
+
+
+@pytest.mark.notifications
+def test_released_digests_go_back_to_pending(db):
+    conn = db.get_connection()
+    _queue(db, conn)
+    claimed = db.claim_digests(conn)
+    assert _states(conn) == [("sending", 1, 0, 0)] * 2
+
+    db.complete_digests(conn, released=[claimed[0]["digest_key"]])
+    conn.commit()
+    assert _states(conn) == [("pending", 0, 0, 0)] * 2
+    conn.close()
+
+
+@pytest.mark.notifications
+def test_claim_is_released_when_digest_building_fails(db, dummy_smtp):
+    conn = db.get_connection()
+    _queue(db, conn, count=1)
+    conn.execute("UPDATE notifications SET heading = 'no category separator'")
+    conn.commit()
+
+    with pytest.raises(ValueError):
+        process_notifications(db, conn)
+    assert dummy_smtp.sent == []
+    assert _states(conn) == [("pending", 0, 0, 0)]
+    conn.close()
+
+
+@pytest.mark.notifications
+def test_digests_sent_before_a_render_failure_are_recorded(db, dummy_smtp, monkeypatch):
+    import send_notifications
+    conn = db.get_connection()
+    _queue(db, conn, email="reader0@example.com", count=1)
+    maturity_date = datetime.now(timezone.utc).isoformat()
+    for i in (1, 2):
+        db.add_subscription(conn, f"reader{i}@example.com", "Software Engineering", 1, frequency=0)
+        db.add_notification(conn, f"reader{i}@example.com", "TestCo, Software Engineering", "v1",
+                            "https://testco.com/post-0", "Post 0", maturity_date)
+    conn.commit()
+
+    # The third digest fails to build after the first two were handed to SMTP
+    build_message = send_notifications.build_message
+    built = []
+    def flaky_build(*args, **kwargs):
+        if len(built) == 2:
+            raise ValueError("render failed")
+        built.append(args[0])
+        return build_message(*args, **kwargs)
+    monkeypatch.setattr(send_notifications, "build_message", flaky_build)
+
+    with pytest.raises(ValueError):
+        process_notifications(db, conn)
+    assert len(dummy_smtp.sent) == 2
+
+    states = {r["email"]: r["status"] for r in conn.execute("SELECT email, status FROM notifications")}
+    assert sorted(states.values()) == ["pending", "sent", "sent"]
+    assert {email for email, status in states.items() if status == "sent"} == set(built)
+    conn.close()
+
+
+@pytest.mark.notifications
+def test_stale_claim_out_of_attempts_is_not_reclaimed(db):
+    conn = db.get_connection()
+    _queue(db, conn)
+    db.claim_digests(conn, max_attempts=1)
+
+    # The run holding the claim died; the lease has expired and no attempts remain
+    conn.execute("UPDATE notifications SET claimed_ts = claimed_ts - 3600")
+    conn.commit()
+    assert db.claim_digests(conn, max_attempts=1) == []
+    assert _states(conn) == [("failed", 1, 0, 0)] * 2
+    conn.close()
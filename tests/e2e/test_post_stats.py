@@ -0,0 +1,62 @@
+import pytest
+from datetime import datetime, timezone
+from db import enums
+
+
+def _seed(db, conn):
+    db.add_publisher(conn, "google", "techteam")
+    post_id = db.add_post(conn, "https://example.com/a", "A post", 1, "tags",
+                          datetime.now(timezone.utc).isoformat(), enums.PublisherCategory.SOFTWARE_ENGINEERING.value)
+    db.update_post_label(conn, post_id, enums.PublisherCategory.SOFTWARE_ENGINEERING.value)
+    return post_id
+
+
+@pytest.mark.db
+def test_counters_follow_writes(db):
+    conn = db.get_connection()
+    post_id = _seed(db, conn)
+
+    assert db.like_post(conn, post_id, "a@x.com") == (1, True)
+    assert db.like_post(conn, post_id, "b@x.com") == (2, True)
+    assert db.like_post(conn, post_id, "b@x.com") == (2, False)
+    assert db.record_view(conn, post_id, "anonymous", "dev-1") == 1
+    assert db.record_view(conn, post_id, "anonymous", "dev-1") == 1
+    db.set_fire_count(conn, post_id, 3)
+
+    post = db.get_posts(conn)[0]
+    assert (post["like_count"], post["view_count"], post["fire_count"]) == (2, 1, 3)
+
+    trending = db.get_most_liked_this_month(conn)
+    assert trending[0]["recent_like_count"] == 2
+    assert trending[0]["trending_score"] == 5
+    assert db.get_most_liked_all_time(conn)[0]["like_count"] == 2
+    assert db.get_recommended_by_fire(conn)[0]["fire_count"] == 3
+    assert db.get_like_counts_by_urls(conn, ["https://example.com/a"]) == {"https://example.com/a": 2}
+
+    conn.execute("DELETE FROM post_likes WHERE user_email = 'a@x.com'")
+    conn.commit()
+    assert db.get_posts(conn)[0]["like_count"] == 1
+    conn.close()
+
+
+@pytest.mark.db
+def test_reconcile_fixes_drift_and_decays_recent_likes(db):
+    conn = db.get_connection()
+    post_id = _seed(db, conn)
+    db.like_post(conn, post_id, "a@x.com")
+    db.like_post(conn, post_id, "b@x.com")
+
+    assert db.reconcile_post_stats(conn) == 0
+
+    # One like ages out of the trending window, and a counter drifts
+    conn.execute("UPDATE post_likes SET liked_at = datetime('now', '-30 days') WHERE user_email = 'a@x.com'")
+    conn.execute("UPDATE post_stats SET view_count = 42")
+    conn.commit()
+
+    # Trending counts the window at read time, before any reconcile run
+    assert db.get_most_liked_this_month(conn)[0]["recent_like_count"] == 1
+
+    assert db.reconcile_post_stats(conn) == 1
+    row = conn.execute("SELECT * FROM post_stats WHERE post_id = ?", (post_id,)).fetchone()
+    assert (row["like_count"], row["recent_like_count"], row["view_count"]) == (2, 1, 0)
+    conn.close()
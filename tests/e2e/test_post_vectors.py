@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+from ann_index import IVFFlatIndex
+from db import enums
+from post_vectors import PostVectorIndex, index_path
+
+TOPIC = enums.PublisherCategory.SOFTWARE_ENGINEERING.value
+
+
+def _add(db, conn, i, vector, labelled=True):
+    post_id = db.add_post(conn, f"https://example.com/{i}", f"Post {i}", 1, "tags",
+                          f"2025-01-{i + 1:02d}T00:00:00+00:00", TOPIC)
+    db.save_post_embedding(conn, post_id, np.asarray(vector, dtype=np.float32).tobytes())
+    if labelled:
+        db.update_post_label(conn, post_id, TOPIC)
+    return post_id
+
+
+@pytest.mark.db
+@pytest.mark.embeddings
+def test_index_tracks_changes_and_persists(db):
+    conn = db.get_connection()
+    db.add_publisher(conn, "google", "techteam")
+    a = _add(db, conn, 0, [3, 0, 0])
+    b = _add(db, conn, 1, [0, 2, 0])
+    c = _add(db, conn, 2, [0, 0, 1], labelled=False)
+    conn.commit()
+
+    vectors = PostVectorIndex(index_path(db.db_path))
+    assert vectors.refresh(db, conn) == 3
+    assert sorted(vectors.index.ids.tolist()) == [a, b]
+    assert vectors.refresh(db, conn) == 0
+    vectors.save()
+
+    # Labelling c, re-embedding a and adding d are picked up incrementally
+    db.update_post_label(conn, c, TOPIC)
+    db.save_post_embedding(conn, a, np.array([0, 1, 1], dtype=np.float32).tobytes())
+    d = _add(db, conn, 3, [1, 1, 0])
+    conn.commit()
+
+    # A fresh worker loads the saved index and only replays the changes after it
+    worker = PostVectorIndex(index_path(db.db_path))
+    assert worker.refresh(db, conn) == 3
+    assert sorted(worker.index.ids.tolist()) == [a, b, c, d]
+
+    post_ids, scores, which = worker.search(np.array([[0, 0, 5], [1, 0, 0]], dtype=np.float32), 2)
+    assert post_ids == [c, a] and which.tolist() == [0, 0]
+    exact = worker.score_ids([d, 999], np.array([[0, 0, 5], [1, 0, 0]], dtype=np.float32))
+    assert list(exact) == [d] and exact[d][1] == 1
+    np.testing.assert_allclose(exact[d][0], np.sqrt(0.5), rtol=1e-6)
+
+    rows = db.get_feed_items(conn, [d, 999, a])
+    assert [row["id"] for row in rows] == [d, a] and "embedding" not in rows[0]
+    conn.close()
+
+
+@pytest.mark.embeddings
+def test_ivf_recall_against_brute_force(tmp_path):
+    rng = np.random.default_rng(7)
+    centers = rng.normal(size=(40, 64)).astype(np.float32)
+    data = centers[rng.integers(0, 40, 6000)] + rng.normal(scale=0.3, size=(6000, 64)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    queries = data[rng.choice(6000, 50, replace=False)] + rng.normal(scale=0.05, size=(50, 64)).astype(np.float32)
+
+    index = IVFFlatIndex(nprobe=8, min_train=1000)
+    index.add(np.arange(5000), data[:5000])
+    index.train()
+    index.add(np.arange(5000, 6000), data[5000:])      # incremental inserts after training
+    assert index.nlist > 1 and len(index) == 6000
+
+    ids, _ = index.search(queries, 10)
+    truth = np.argsort(-(data @ (queries / np.linalg.norm(queries, axis=1, keepdims=True)).T), axis=0)[:10].T
+    recall = np.mean([len(set(ids[q]) & set(truth[q])) / 10 for q in range(len(queries))])
+    assert recall >= 0.9
+
+    path = str(tmp_path / "index.npz")
+    index.save(path, seq=42)
+    loaded, extra = IVFFlatIndex.load(path, nprobe=8)
+    assert extra == {"seq": 42}
+    np.testing.assert_array_equal(loaded.search(queries, 10)[0], ids)
+
+
+@pytest.mark.db
+@pytest.mark.embeddings
+def test_embedding_store_appends_and_swaps(db, monkeypatch):
+    import embedding_store
+    from embedding_store import EmbeddingStore, store_path
+
+    monkeypatch.setattr(embedding_store, "EMBEDDING_STORE_MIN_CAPACITY", 1)
+    conn = db.get_connection()
+    db.add_publisher(conn, "google", "techteam")
+    a = _add(db, conn, 0, [1, 0, 0])
+    b = _add(db, conn, 1, [0, 1, 0], labelled=False)
+    conn.commit()
+
+    writer = EmbeddingStore(store_path(db.db_path))
+    assert writer.sync(db, conn) == 2
+    reader = EmbeddingStore(store_path(db.db_path))
+    assert reader.refresh() and isinstance(reader.matrix(), np.memmap)
+    first_generation = reader.generation
+
+    # Label-only change writes nothing; a new post is appended in place
+    db.update_post_label(conn, b, TOPIC)
+    c = _add(db, conn, 2, [0, 0, 1])
+    conn.commit()
+    assert writer.sync(db, conn) == 1
+    assert reader.refresh() and reader.generation == first_generation and len(reader) == 3
+
+    # Re-embedding past capacity compacts into a new generation; latest vector wins
+    db.save_post_embedding(conn, a, np.array([5, 5, 0], dtype=np.float32).tobytes())
+    d = _add(db, conn, 3, [1, 1, 1])
+    conn.commit()
+    assert writer.sync(db, conn) == 2
+    reader.refresh()
+    assert reader.generation == first_generation + 1 and reader.rows == 4
+    found, vectors = reader.get_many([a, c, 999])
+    assert found == [a, c]
+    np.testing.assert_array_equal(vectors, [[5, 5, 0], [0, 0, 1]])
+
+    # The vector index reads these rows from the store instead of decoding BLOBs
+    vectors_index = PostVectorIndex(store=reader)
+    monkeypatch.setattr(db, "get_post_embeddings", lambda *args: pytest.fail("decoded a BLOB"))
+    assert vectors_index.refresh(db, conn) == 4
+    assert sorted(vectors_index.index.ids.tolist()) == [a, b, c, d]
+    conn.close()
+
+
+@pytest.mark.db
+@pytest.mark.embeddings
+def test_quantized_embeddings_convert_and_search(db):
+    from db.migrations import convert_embeddings
+    from embedding_codec import blob_format, decode_vector, encode_blob
+    from embedding_store import EmbeddingStore, store_path
+
+    rng = np.random.default_rng(5)
+    vector = rng.normal(size=64).astype(np.float32)
+    for fmt, size in (("float32", 256), ("float16", 132), ("int8", 72)):
+        raw = encode_blob(vector, fmt)
+        assert len(raw) == size and blob_format(raw) == fmt
+        np.testing.assert_allclose(decode_vector(raw), vector, atol=np.abs(vector).max() / 127)
+    assert decode_vector(b"\x00\x01\x02") is None
+
+    conn = db.get_connection()
+    db.add_publisher(conn, "google", "techteam")
+    ids = [_add(db, conn, i, v) for i, v in enumerate([[3, 0, 0], [0, 2, 0], [1, 1, 0]])]
+    conn.commit()
+    store = EmbeddingStore(store_path(db.db_path))
+    store.sync(db, conn)
+    vectors = PostVectorIndex(index_path(db.db_path), store)
+    vectors.refresh(db, conn)
+    vectors.save()
+
+    # Legacy float32 BLOBs are rewritten in place; a second run has nothing left to do
+    assert convert_embeddings(conn, "int8", batch_size=2) == 3
+    assert convert_embeddings(conn, "int8") == 0
+    assert {blob_format(raw) for raw in db.get_post_embeddings(conn, ids).values()} == {"int8"}
+
+    # Store and index written as float32 are rebuilt in the configured format
+    store = EmbeddingStore(store_path(db.db_path), fmt="int8")
+    assert store.sync(db, conn) == 3 and store.matrix().dtype == np.int8
+    np.testing.assert_allclose(store.get(ids[0]), [3, 0, 0], atol=3 / 127)
+    worker = PostVectorIndex(index_path(db.db_path), store, fmt="int8")
+    assert worker.refresh(db, conn) == 3 and worker.index.vectors.dtype == np.int8
+    post_ids, scores, _ = worker.search(np.array([[1, 0.1, 0]], dtype=np.float32), 3)
+    assert post_ids == [ids[0], ids[2], ids[1]]
+    np.testing.assert_allclose(scores[0], 1 / np.sqrt(1.01), atol=0.02)
+    conn.close()
@@ -0,0 +1,202 @@
+import time
+import threading
+import httpx
+import numpy as np
+import pytest
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from handlers.base import BaseScraper
+from handlers.pipeline import fetch_concurrently, drop_known, ScrapeBudgetExceeded
+
+FEED = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>t</title>
+<item><title>{title}</title><link>https://example.com/{title}</link>
+<pubDate>Mon, 06 Jan 2025 10:00:00 GMT</pubDate><category>infra</category></item>
+</channel></rss>"""
+
+
+class _FeedHandler(BaseHTTPRequestHandler):
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        # /<delay>/<title>
+        _, delay, title = self.path.split("/")
+        body = FEED.format(title=title).encode()
+        if title == "trickle":
+            # Headers at once, then the body a few bytes per `delay`
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                for i in range(0, len(body), 8):
+                    self.wfile.write(body[i:i + 8])
+                    self.wfile.flush()
+                    time.sleep(float(delay))
+            except OSError:
+                pass
+            with cls.lock:
+                cls.active -= 1
+            return
+        time.sleep(float(delay))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with cls.lock:
+            cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feed_server():
+    _FeedHandler.active = _FeedHandler.peak = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FeedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+class _Scraper(BaseScraper):
+    def __init__(self, url):
+        self.url = url
+
+    def get_feed_url(self):
+        return self.url
+
+
+SINCE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.pubs
+def test_feeds_are_fetched_concurrently_within_host_limit(feed_server):
+    jobs = [(i, _Scraper(f"http://127.0.0.1:{feed_server}/0.4/post{i}"), SINCE) for i in range(4)]
+
+    start = time.perf_counter()
+    results = {key: (posts, error) for key, posts, error in fetch_concurrently(jobs, workers=8, per_host=2)}
+    elapsed = time.perf_counter() - start
+
+    assert sorted(results) == [0, 1, 2, 3]
+    assert all(error is None for _, error in results.values())
+    assert results[2][0][0]["url"] == "https://example.com/post2"
+    assert results[2][0][0]["guid"] == "https://example.com/post2"
+    # Two waves of two requests, not four sequential fetches
+    assert _FeedHandler.peak == 2
+    assert 0.8 <= elapsed < 1.4
+
+
+@pytest.mark.pubs
+def test_slow_feeds_hit_request_deadline_and_budget(feed_server, monkeypatch):
+    slow = _Scraper(f"http://localhost:{feed_server}/2/slow")
+    monkeypatch.setattr(slow, "fetch", lambda url: BaseScraper.fetch(slow, url, timeout=1.0))
+    jobs = [
+        ("fast", _Scraper(f"http://127.0.0.1:{feed_server}/0/fast"), SINCE),
+        ("slow", slow, SINCE),
+    ]
+    start = time.perf_counter()
+    results = {}
+    for key, _, error in fetch_concurrently(jobs, budget=0.5):
+        results[key] = (error, time.perf_counter() - start)
+    assert results["fast"][0] is None
+    # Reported as soon as the budget runs out...
+    assert isinstance(results["slow"][0], ScrapeBudgetExceeded) and results["slow"][1] < 1.0
+    # ...but the run only ends once the abandoned request has hit its own deadline
+    assert 0.9 <= time.perf_counter() - start < 1.8
+    assert not any(t.name.startswith("scrape") for t in threading.enumerate())
+
+    # Per-request deadline fails one feed without waiting for the budget
+    scraper = _Scraper(f"http://127.0.0.1:{feed_server}/1/late")
+    monkeypatch.setattr(scraper, "fetch", lambda url: BaseScraper.fetch(scraper, url, timeout=0.3))
+    results = list(fetch_concurrently([("late", scraper, SINCE)], budget=5))
+    assert results[0][2] is not None and "timed out" in str(results[0][2]).lower()
+
+    # A body trickled in under the per-read timeout still hits the total deadline
+    start = time.perf_counter()
+    with pytest.raises(httpx.ReadTimeout):
+        BaseScraper().fetch(f"http://127.0.0.1:{feed_server}/0.1/trickle", timeout=0.5)
+    assert time.perf_counter() - start < 1.0
+
+
+@pytest.mark.pubs
+def test_known_posts_are_dropped_before_classification(db):
+    conn = db.get_connection()
+    db.add_publisher(conn, "google", "techteam")
+    db.add_post(conn, "https://example.com/a", "A", 1, "", "2025-01-02T00:00:00+00:00", "Software Engineering",
+                guid="tag:example.com,2025:a")
+    conn.commit()
+
+    known = db.get_known_post_keys(conn)
+    scraped = [
+        {"url": "https://example.com/a?utm=rss", "guid": "tag:example.com,2025:a"},  # same entry, new URL
+        {"url": "https://example.com/a", "guid": None},
+        {"url": "https://example.com/b", "guid": "tag:example.com,2025:b"},
+        {"url": "https://example.com/b", "guid": "tag:example.com,2025:b"},          # repeated in feed
+        {"url": "https://example.com/c"},
+    ]
+    assert [p["url"] for p in drop_known(scraped, known)] == ["https://example.com/b", "https://example.com/c"]
+    assert drop_known(scraped, known) == []
+    conn.close()
+
+
+@pytest.mark.pubs
+@pytest.mark.embeddings
+def test_scrape_encodes_once_and_stores_the_classified_vector(db, fake_embedder, monkeypatch):
+    import classifier
+    import scrape_pubs
+    from embedding_codec import decode_vector
+
+    embedder = fake_embedder
+    monkeypatch.setattr(scrape_pubs.ScraperFactory, "get_scraper", lambda name: object())
+    monkeypatch.setattr(scrape_pubs, "prefetch_articles", lambda *args, **kwargs: (0, 0))
+    classified = []
+    monkeypatch.setattr(scrape_pubs, "classify_encoded",
+                        lambda texts, embeddings: classified.append(embeddings) or classifier.classify_encoded(texts, embeddings))
+    feeds = {}
+    monkeypatch.setattr(scrape_pubs, "fetch_concurrently",
+                        lambda jobs: ((key, feeds.get(key, []), None) for key, _, _ in jobs))
+
+    conn = db.get_connection()
+    for name in ("google", "netflix"):
+        publisher_id = db.add_publisher(conn, name, "techteam")
+        db.add_subscription(conn, "a@b.com", "Software Engineering", publisher_id)
+    # Encoded from the original "{title} {tags}" text, before embedding_version existed
+    old_id = db.add_post(conn, "https://example.com/old", "Old post", 1, "kafka", "2025-01-02T00:00:00+00:00",
+                         "Software Engineering")
+    db.save_post_embedding(conn, old_id, np.ones(embedder.dim, dtype=np.float32).tobytes())
+    conn.commit()
+    feeds.update({
+        1: [{"url": f"https://example.com/g{i}", "title": f"Kubernetes post {i}", "tags": ["k8s"],
+             "published": "2025-01-03T00:00:00+00:00", "guid": None} for i in range(2)],
+        2: [{"url": "https://example.com/n0", "title": "React at scale", "tags": ["frontend"],
+             "published": "2025-01-03T00:00:00+00:00", "guid": None}],
+    })
+
+    scrape_pubs.scrape_pubs(db, conn)
+
+    # New posts: one batched encode, and the vector classified with is the one stored
+    new_posts = [r for r in conn.execute("SELECT id, url, embedding, embedding_version FROM posts ORDER BY id")
+                 if r["id"] != old_id]
+    assert len(embedder.calls[0]) == 3 and len(classified) == 1
+    classified_by_text = dict(zip(embedder.calls[0], classified[0]))
+    for row in new_posts:
+        post = conn.execute("SELECT title, tags FROM posts WHERE id = ?", (row["id"],)).fetchone()
+        text = classifier.post_text(post["title"], post["tags"])
+        assert np.array_equal(decode_vector(row["embedding"]), classified_by_text[text])
+        assert row["embedding_version"] == classifier.EMBEDDING_TEXT_VERSION
+
+    # The old-format row was re-encoded from the current post text in the same run
+    assert embedder.calls[1:] == [[classifier.post_text("Old post", "kafka")]]
+    old = conn.execute("SELECT embedding, embedding_version FROM posts WHERE id = ?", (old_id,)).fetchone()
+    assert old["embedding_version"] == classifier.EMBEDDING_TEXT_VERSION
+    assert np.array_equal(decode_vector(old["embedding"]), embedder.encode(classifier.post_text("Old post", "kafka")))
+    conn.close()
@@ -46,8 +46,10 @@ def test_send_email_e2e(db, dummy_smtp):
     # ✅ Ensure one email was sent
     assert len(dummy_smtp.sent) == 2
     
-    from_addr, to_addrs, raw_msg = dummy_smtp.sent[0]
-    from_addr2, to_addrs2, raw_msg2 = dummy_smtp.sent[1]
+    # Digests are sent in parallel, so completion order is not fixed
+    sent = sorted(dummy_smtp.sent, key=lambda m: m[1] != email)
+    from_addr, to_addrs, raw_msg = sent[0]
+    from_addr2, to_addrs2, raw_msg2 = sent[1]
 
     assert to_addrs == "manav0611@gmail.com"
     assert to_addrs2 == email2
@@ -1,11 +1,11 @@
 # train_classifier.py
 import pickle
-from sentence_transformers import SentenceTransformer
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import LabelEncoder
 from db import get_database
 import os 
 from logger_config import get_logger
+from embedding_service import get_embedder
 
 env = os.getenv('FLASK_ENV', 'development')
 MODEL_PATH = os.getenv("MODEL_PATH") if env == 'production' else 'data/dev/trained_classifier.pkl'
@@ -17,11 +17,9 @@ def train_classifier():
     db = get_database()
     conn = db.get_connection()
     
-    posts = db.get_posts(conn)
-    posts_filtered = [
-            post for post in posts
-            if post['labelled'] == 1
-        ]
+    posts_filtered, _ = db.get_feed_page(
+        conn, filters={"labelled": 1}, limit=None, columns=("title", "tags", "topic")
+    )
     
     logger.info(f"training on post: {len(posts_filtered)}")
     if len(posts_filtered) < MIN_LABELED_POSTS:
@@ -38,8 +36,7 @@ def train_classifier():
         labels.append(row["topic"])
 
     # Compute embeddings
-    embedding_model = SentenceTransformer('all-mpnet-base-v2')
-    embeddings = embedding_model.encode(texts, convert_to_tensor=False)
+    embeddings = get_embedder().encode(texts)
 
     # Encode labels
     label_encoder = LabelEncoder()